@@ -2,6 +2,7 @@
 #include <stdio.h>
 #include <string.h>
 #include <stdbool.h>
+#include <stdint.h>
 
 #include "librgt.h"
 
@@ -692,4 +693,260 @@ double jaccard (
 
     // Return jaccard index.
     return ((double)inter) / ((double) uni);
-}
\ No newline at end of file
+}
+
+/*
+ * Functions on genomic region arrays.
+ *
+ * These functions work directly on the columns of a GenomicRegionArray: the chromosome of a region is given by its
+ * integer rank (the position of the chromosome name in lexicographic order), positions are 64 bit integers. The
+ * arrays are passed without any copy, the results are written to buffers allocated by the caller.
+ */
+
+/**
+ * Return true, if the position (chromosomeA, positionA) is smaller than the position (chromosomeB, positionB).
+ */
+static inline bool positionBefore(
+    const int64_t chromosomeA,
+    const int64_t positionA,
+    const int64_t chromosomeB,
+    const int64_t positionB
+) {
+    return (chromosomeA < chromosomeB) || ((chromosomeA == chromosomeB) && (positionA < positionB));
+}
+
+/**
+ * Return the final position of the region, letting zero-length regions cover their position as the overlap function
+ * does for its second argument.
+ */
+static inline int64_t widenedFinal(const int64_t initial, const int64_t final) {
+    if (initial == final) {
+        return final + 1;
+    }
+    return final;
+}
+
+
+/**
+ * Compute the intersection of two genomic region arrays using the OVERLAP mode.
+ * Both arrays have to be sorted and merged.
+ *
+ * @param const int64_t *chromosomesA An array of the chromosome ranks of the genomic regions of the first array.
+ * @param const int64_t *initialsA    An array of the initial positions of the genomic regions of the first array.
+ * @param const int64_t *finalsA      An array of the final positions of the genomic regions of the first array.
+ * @param const int64_t sizeA         The number of genomic regions in the first array.
+ * @param const int64_t *chromosomesB An array of the chromosome ranks of the genomic regions of the second array.
+ * @param const int64_t *initialsB    An array of the initial positions of the genomic regions of the second array.
+ * @param const int64_t *finalsB      An array of the final positions of the genomic regions of the second array.
+ * @param const int64_t sizeB         The number of genomic regions in the second array.
+ * @param int64_t *indicesR           Used to return the result. The indices of the genomic regions of the first array
+ *                                    the resulting genomic regions come from.
+ * @param int64_t *initialsR          Used to return the result. The initial positions of the resulting genomic regions.
+ * @param int64_t *finalsR            Used to return the result. The final positions of the resulting genomic regions.
+ * @param const int64_t capacityR     The number of genomic regions the result buffers can hold.
+ *
+ * @return The number of genomic regions in the result. If it exceeds capacityR, only the first capacityR regions
+ *         have been written and the function has to be called again with larger buffers.
+ */
+int64_t intersectGenomicRegionArraysOverlap (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    int64_t *indicesR,
+    int64_t *initialsR,
+    int64_t *finalsR,
+    const int64_t capacityR
+) {
+    int64_t i, j;
+    // First region of the second array which does not end before the current region of the first array.
+    int64_t first_j = 0;
+    // Position in result.
+    int64_t k = 0;
+    for (i = 0; i < sizeA; i++) {
+        // Skip the regions of the second array which end before the current region starts.
+        while ((first_j < sizeB) && !positionBefore(chromosomesA[i], initialsA[i], chromosomesB[first_j],
+                                                     widenedFinal(initialsB[first_j], finalsB[first_j]))) {
+            first_j++;
+        }
+        // All following regions on the same chromosome starting before the end of the current region overlap it.
+        for (j = first_j; (j < sizeB) && (chromosomesB[j] == chromosomesA[i]) && (initialsB[j] < finalsA[i]); j++) {
+            if (k < capacityR) {
+                indicesR[k] = i;
+                initialsR[k] = initialsA[i] > initialsB[j] ? initialsA[i] : initialsB[j];
+                finalsR[k] = finalsA[i] < finalsB[j] ? finalsA[i] : finalsB[j];
+            }
+            k++;
+        }
+    }
+    return k;
+}
+
+
+/**
+ * Compute the total coverage of the intersection of two genomic region arrays using the OVERLAP mode.
+ * Both arrays have to be sorted and merged. For the parameters, see intersectGenomicRegionArraysOverlap.
+ *
+ * @return The total coverage of the intersection.
+ */
+int64_t totalCoverageIntersectGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB
+) {
+    int64_t i, j;
+    int64_t first_j = 0;
+    int64_t total_intersect_coverage = 0;
+    for (i = 0; i < sizeA; i++) {
+        while ((first_j < sizeB) && !positionBefore(chromosomesA[i], initialsA[i], chromosomesB[first_j],
+                                                     widenedFinal(initialsB[first_j], finalsB[first_j]))) {
+            first_j++;
+        }
+        for (j = first_j; (j < sizeB) && (chromosomesB[j] == chromosomesA[i]) && (initialsB[j] < finalsA[i]); j++) {
+            const int64_t initial = initialsA[i] > initialsB[j] ? initialsA[i] : initialsB[j];
+            const int64_t final = finalsA[i] < finalsB[j] ? finalsA[i] : finalsB[j];
+            total_intersect_coverage += final - initial;
+        }
+    }
+    return total_intersect_coverage;
+}
+
+
+/**
+ * Mark the genomic regions of the first array which overlap any genomic region of the second array (ORIGINAL mode).
+ * The first array has to be sorted, the second one sorted and merged, with zero-length regions widened to one
+ * position beforehand. For the other parameters, see intersectGenomicRegionArraysOverlap.
+ *
+ * @param bool *maskR Used to return the result. One flag per genomic region of the first array.
+ *
+ * @return None
+ */
+void overlapGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    bool *maskR
+) {
+    int64_t i;
+    int64_t first_j = 0;
+    for (i = 0; i < sizeA; i++) {
+        while ((first_j < sizeB) && !positionBefore(chromosomesA[i], initialsA[i], chromosomesB[first_j],
+                                                     widenedFinal(initialsB[first_j], finalsB[first_j]))) {
+            first_j++;
+        }
+        maskR[i] = (first_j < sizeB) && (chromosomesB[first_j] == chromosomesA[i]) && (initialsB[first_j] < finalsA[i]);
+    }
+}
+
+
+/**
+ * Mark the genomic regions of the first array which are completely included by one genomic region of the second
+ * array (COMP_INCL mode). Both arrays have to be sorted. For the other parameters, see
+ * intersectGenomicRegionArraysOverlap.
+ *
+ * @param bool *maskR Used to return the result. One flag per genomic region of the first array.
+ *
+ * @return 0 on success, -1 if the working memory could not be allocated.
+ */
+int includedGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    bool *maskR
+) {
+    int64_t i, j;
+    // Number of regions of the second array starting before (before_j) or at (until_j) the current region.
+    int64_t before_j = 0;
+    int64_t until_j = 0;
+    // Largest final position of the regions of the second array up to each region, on its chromosome.
+    int64_t *running = malloc((sizeB > 0 ? sizeB : 1) * sizeof(int64_t));
+    if (running == NULL) {
+        return -1;
+    }
+    for (j = 0; j < sizeB; j++) {
+        if ((j > 0) && (chromosomesB[j] == chromosomesB[j - 1]) && (running[j - 1] > finalsB[j])) {
+            running[j] = running[j - 1];
+        } else {
+            running[j] = finalsB[j];
+        }
+    }
+    for (i = 0; i < sizeA; i++) {
+        while ((before_j < sizeB) && positionBefore(chromosomesB[before_j], initialsB[before_j], chromosomesA[i],
+                                                    initialsA[i])) {
+            before_j++;
+        }
+        if (until_j < before_j) {
+            until_j = before_j;
+        }
+        while ((until_j < sizeB) && !positionBefore(chromosomesA[i], initialsA[i], chromosomesB[until_j],
+                                                    initialsB[until_j])) {
+            until_j++;
+        }
+        // Zero-length regions have to start strictly inside the including region.
+        if (initialsA[i] == finalsA[i]) {
+            j = before_j - 1;
+            maskR[i] = (j >= 0) && (chromosomesB[j] == chromosomesA[i]) && (running[j] > finalsA[i]);
+        } else {
+            j = until_j - 1;
+            maskR[i] = (j >= 0) && (chromosomesB[j] == chromosomesA[i]) && (running[j] >= finalsA[i]);
+        }
+    }
+    free(running);
+    return 0;
+}
+
+
+/**
+ * Compute the number of positions of every genomic region of the first array covered by the genomic regions of the
+ * second array. The first array has to be sorted, the second one sorted and merged, without zero-length regions.
+ * For the other parameters, see intersectGenomicRegionArraysOverlap.
+ *
+ * @param int64_t *coveredR Used to return the result. One number of positions per genomic region of the first array.
+ *
+ * @return None
+ */
+void coveredLengthsGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    int64_t *coveredR
+) {
+    int64_t i, j;
+    int64_t first_j = 0;
+    for (i = 0; i < sizeA; i++) {
+        while ((first_j < sizeB) && !positionBefore(chromosomesA[i], initialsA[i], chromosomesB[first_j],
+                                                     finalsB[first_j])) {
+            first_j++;
+        }
+        coveredR[i] = 0;
+        for (j = first_j; (j < sizeB) && (chromosomesB[j] == chromosomesA[i]) && (initialsB[j] < finalsA[i]); j++) {
+            const int64_t initial = initialsA[i] > initialsB[j] ? initialsA[i] : initialsB[j];
+            const int64_t final = finalsA[i] < finalsB[j] ? finalsA[i] : finalsB[j];
+            coveredR[i] += final - initial;
+        }
+    }
+}
@@ -1,6 +1,9 @@
 #ifndef _LIBRGT_H_
 #define _LIBRGT_H_
 
+#include <stdbool.h>
+#include <stdint.h>
+
 bool overlap(const char *chromA, const int initialA, const int finalA, const char *chromB, const int initialB, const int finalB);
 
 int compareGenomicRegions(const char *chromA, const int initialA, const int finalA, const char *chromB, const int initialB, const int finalB);
@@ -78,4 +81,66 @@ double jaccard (
     const int sizeB
 );
 
+int64_t intersectGenomicRegionArraysOverlap (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    int64_t *indicesR,
+    int64_t *initialsR,
+    int64_t *finalsR,
+    const int64_t capacityR
+);
+
+int64_t totalCoverageIntersectGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB
+);
+
+void overlapGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    bool *maskR
+);
+
+int includedGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    bool *maskR
+);
+
+void coveredLengthsGenomicRegionArrays (
+    const int64_t *chromosomesA,
+    const int64_t *initialsA,
+    const int64_t *finalsA,
+    const int64_t sizeA,
+    const int64_t *chromosomesB,
+    const int64_t *initialsB,
+    const int64_t *finalsB,
+    const int64_t sizeB,
+    int64_t *coveredR
+);
+
 #endif // _LIBRGT_H_
@@ -0,0 +1,327 @@
+"""
+BigWig
+===================
+BigWig writes bigWig files directly with pyBigWig instead of writing a temporary WIG or bedGraph file and converting
+it with the UCSC tools (wigToBigWig, bedGraphToBigWig, bigWigMerge), and reads the statistics of many regions in
+batches.
+
+BigWigWriter collects the entries of every chromosome as NumPy arrays, clips them to the chromosome sizes (like
+wigToBigWig -clip) and writes them in the order of the chromosome sizes, as pyBigWig requires. Contiguous entries with
+the same value are joined to one bedGraph span as soon as they are added, and the entries are kept with 4-byte positions
+and values (the precision of the bigWig format), so a per-base signal takes at most 12 bytes per base until it is
+written.
+
+BigWigReader keeps one pyBigWig handle per file and process. Its stats method reads the values of close regions with
+one pyBigWig call per span of about SPAN_SIZE bases and computes the means or maxima of all bins with numpy reduceat,
+instead of one pyBigWig stats call per region.
+
+"""
+
+###############################################################################
+# Libraries
+###############################################################################
+
+# Python
+from __future__ import print_function
+from __future__ import division
+import os
+import numpy
+import pyBigWig
+
+# Internal
+from .Util import ChromosomeSizes, file_stamp
+from .GenomicRegionArray import GenomicRegionArray, CHROMOSOMES
+
+###############################################################################
+# Constants
+###############################################################################
+
+# BigWigReader.stats reads the bins of a chromosome in spans: a span ends before a gap of more than MERGE_GAP bases
+# and at multiples of SPAN_SIZE; the spans are then processed in batches of about SPAN_SIZE bases
+MERGE_GAP = 1 << 14
+SPAN_SIZE = 1 << 22
+
+###############################################################################
+# Functions
+###############################################################################
+
+
+def collapse(starts, ends, values):
+    """Return the entries (sorted by start) with the contiguous entries of equal values joined to one span.
+
+    *Keyword arguments:*
+
+        - starts -- Array of start positions.
+        - ends -- Array of end positions.
+        - values -- Array of values.
+
+    *Return:*
+
+        - Arrays of starts, ends and values.
+    """
+    if len(starts) < 2:
+        return starts, ends, values
+    first = numpy.ones(len(starts), dtype=bool)
+    first[1:] = (starts[1:] != ends[:-1]) | (values[1:] != values[:-1])
+    last = numpy.ones(len(starts), dtype=bool)
+    last[:-1] = first[1:]
+    return starts[first], ends[last], values[first]
+
+
+def _sum_overlaps(starts, ends, values):
+    """Return the entries (sorted by start) as disjoint spans with the sum of the values of the overlapping entries.
+    Positions without any entry are left out."""
+    if len(starts) < 2 or (starts[1:] >= ends[:-1]).all():
+        return starts, ends, values
+    bounds, index = numpy.unique(numpy.concatenate((starts, ends)), return_inverse=True)
+    delta = numpy.zeros(len(bounds), dtype=numpy.float64)
+    numpy.add.at(delta, index[:len(starts)], values)
+    numpy.add.at(delta, index[len(starts):], -values)
+    depth = numpy.zeros(len(bounds), dtype=numpy.int64)
+    numpy.add.at(depth, index[:len(starts)], 1)
+    numpy.add.at(depth, index[len(starts):], -1)
+    # The segment [bounds[i], bounds[i + 1]) is covered if any entry starts before and ends after it
+    covered = numpy.cumsum(depth)[:-1] > 0
+    return bounds[:-1][covered], bounds[1:][covered], numpy.cumsum(delta)[:-1][covered]
+
+
+def merge(filenames, filename, chrom_sizes):
+    """Write the bigWig file <filename> with the sum of the signals of the bigWig files <filenames>, like bigWigMerge
+    followed by bedGraphToBigWig.
+
+    *Keyword arguments:*
+
+        - filenames -- Paths of the bigWig files.
+        - filename -- Path of the merged bigWig file.
+        - chrom_sizes -- Chromosome sizes file, ChromosomeSizes or list of (chromosome, size).
+    """
+    with BigWigWriter(filename, chrom_sizes, sum_overlaps=True) as writer:
+        for name in filenames:
+            bw = pyBigWig.open(name)
+            if bw is None:
+                raise IOError("Cannot read bigWig file " + name)
+            for chrom in bw.chroms():
+                intervals = bw.intervals(chrom)
+                if intervals:
+                    intervals = numpy.array(intervals, dtype=numpy.float64)
+                    writer.add(chrom, intervals[:, 0].astype(numpy.int64), intervals[:, 1].astype(numpy.int64),
+                               intervals[:, 2])
+            bw.close()
+
+
+def _columns(regions):
+    """Return the chromosome names (object array) and the initial and final positions of the regions."""
+    if hasattr(regions, "as_array"):
+        regions = regions.as_array()
+    if isinstance(regions, GenomicRegionArray):
+        names = numpy.array(CHROMOSOMES.decode(regions.chroms), dtype=object)
+        return names, regions.initials.astype(numpy.int64), regions.finals.astype(numpy.int64)
+    regions = [(r.chrom, r.initial, r.final) if hasattr(r, "chrom") else tuple(r) for r in regions]
+    names = numpy.empty(len(regions), dtype=object)
+    names[:] = [r[0] for r in regions]
+    return (names, numpy.array([r[1] for r in regions], dtype=numpy.int64),
+            numpy.array([r[2] for r in regions], dtype=numpy.int64))
+
+###############################################################################
+# Classes
+###############################################################################
+
+
+class BigWigReader:
+    """
+    Read the statistics of many regions from a bigWig file. Use BigWigReader.load to open every file only once per
+    process.
+
+    *Keyword arguments:*
+
+        - filename -- Path of the bigWig file.
+    """
+
+    # Loaded BigWigReaders by absolute file name and process, with the stamp of the file
+    _loaded = {}
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.bw = pyBigWig.open(filename)
+        if self.bw is None:
+            raise IOError("Cannot read bigWig file " + filename)
+        self.chroms = self.bw.chroms()
+
+    @staticmethod
+    def load(filename):
+        """Return the BigWigReader of the file, opening it only once per process (and again if it changes)."""
+        # A forked process opens its own handle
+        key = (os.path.abspath(filename), os.getpid())
+        stamp = file_stamp(key[0])
+        cached = BigWigReader._loaded.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, BigWigReader(key[0]))
+            BigWigReader._loaded[key] = cached
+        return cached[1]
+
+    def stats(self, regions, n_bins=1, type="mean"):
+        """Return the mean or the maximum of the values in the bins of every region, like the exact pyBigWig stats.
+
+        Bin i of a region covers [initial + i * length // n, initial + (i + 1) * length // n). Bins of less than one
+        base (n > length) cover the base they start at, where pyBigWig may differ.
+
+        *Keyword arguments:*
+
+            - regions -- GenomicRegionSet, GenomicRegionArray or iterable of GenomicRegions or (chromosome, initial,
+              final) tuples.
+            - n_bins -- Number of bins of all regions or of every region.
+            - type -- "mean" or "max".
+
+        *Return:*
+
+            - List with an array (numpy.float64) per region. Bins without values, and the bins of regions on unknown
+              chromosomes or beyond the chromosome ends, are NaN.
+        """
+        if type not in ("mean", "max"):
+            raise ValueError("Unsupported statistic " + str(type))
+        names, initials, finals = _columns(regions)
+        n_bins = numpy.zeros(len(initials), dtype=numpy.int64) + numpy.maximum(n_bins, 0)
+        result = [numpy.full(n, numpy.nan) for n in n_bins.tolist()]
+        if not len(initials):
+            return result
+        order = numpy.argsort(names, kind="stable")
+        blocks = numpy.flatnonzero(numpy.concatenate(([True], names[order][1:] != names[order][:-1], [True])))
+        for b0, b1 in zip(blocks[:-1], blocks[1:]):
+            indices = order[b0:b1]
+            size = self.chroms.get(names[indices[0]])
+            if size is None:
+                continue
+            indices = indices[(initials[indices] >= 0) & (initials[indices] < finals[indices]) &
+                              (finals[indices] <= size) & (n_bins[indices] > 0)]
+            if len(indices):
+                values = self._chrom_stats(names[indices[0]], initials[indices], finals[indices], n_bins[indices],
+                                           type)
+                offsets = numpy.concatenate(([0], numpy.cumsum(n_bins[indices]))).tolist()
+                for j, i in enumerate(indices.tolist()):
+                    result[i] = values[offsets[j]:offsets[j + 1]]
+        return result
+
+    def _chrom_stats(self, chrom, initials, finals, n_bins, type):
+        """Return the concatenated statistics of the bins of valid regions of a chromosome."""
+        lengths = finals - initials
+        owners = numpy.repeat(numpy.arange(len(initials)), n_bins)
+        steps = numpy.arange(len(owners)) - (numpy.cumsum(n_bins) - n_bins)[owners]
+        starts = initials[owners] + steps * lengths[owners] // n_bins[owners]
+        ends = numpy.maximum(initials[owners] + (steps + 1) * lengths[owners] // n_bins[owners], starts + 1)
+
+        # Spans of close bins, in the order of the bin starts
+        order = numpy.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        reach = numpy.maximum.accumulate(ends)
+        first = numpy.ones(len(starts), dtype=bool)
+        first[1:] = (starts[1:] > reach[:-1] + MERGE_GAP) | (starts[1:] // SPAN_SIZE != starts[:-1] // SPAN_SIZE)
+        span_firsts = numpy.flatnonzero(first)
+        span_starts = starts[span_firsts]
+        span_ends = numpy.maximum.reduceat(ends, span_firsts)
+        span_lengths = span_ends - span_starts
+        batches = (numpy.cumsum(span_lengths) - span_lengths) // SPAN_SIZE
+        batch_firsts = numpy.flatnonzero(numpy.concatenate(([True], batches[1:] != batches[:-1], [True])))
+
+        output = numpy.empty(len(starts), dtype=numpy.float64)
+        bin_firsts = numpy.concatenate((span_firsts, [len(starts)]))
+        for s0, s1 in zip(batch_firsts[:-1], batch_firsts[1:]):
+            # The values of the spans of a batch, one after the other, and a padding value for the last bin end
+            values = [self.bw.values(chrom, int(span_starts[k]), int(span_ends[k]), numpy=True) for k in range(s0, s1)]
+            values = numpy.concatenate(values + [numpy.zeros(1)]).astype(numpy.float64)
+            shifts = numpy.concatenate(([0], numpy.cumsum(span_lengths[s0:s1]))) - numpy.append(span_starts[s0:s1], 0)
+            i0, i1 = bin_firsts[s0], bin_firsts[s1]
+            shifts = numpy.repeat(shifts[:-1], numpy.diff(bin_firsts[s0:s1 + 1]))
+            # The reductions of reduceat between every bin start and end; overlapping bins are allowed
+            bounds = numpy.column_stack((starts[i0:i1] + shifts, ends[i0:i1] + shifts)).ravel()
+            present = ~numpy.isnan(values)
+            counts = numpy.add.reduceat(present.astype(numpy.int64), bounds)[::2]
+            if type == "mean":
+                stats = numpy.add.reduceat(numpy.where(present, values, 0), bounds)[::2] / numpy.maximum(counts, 1)
+            else:
+                stats = numpy.maximum.reduceat(numpy.where(present, values, -numpy.inf), bounds)[::2]
+            stats[counts == 0] = numpy.nan
+            output[i0:i1] = stats
+
+        result = numpy.empty(len(output), dtype=numpy.float64)
+        result[order] = output
+        return result
+
+
+class BigWigWriter:
+    """
+    Write a bigWig file from arrays of entries. The file is written by close (or at the end of a with block).
+
+    *Keyword arguments:*
+
+        - filename -- Path of the bigWig file.
+        - chrom_sizes -- Chromosome sizes file, ChromosomeSizes or list of (chromosome, size). Entries on other
+          chromosomes are left out and entries are clipped to the chromosome ends.
+        - sum_overlaps -- Write the sum of overlapping entries (else pyBigWig raises a RuntimeError for them).
+    """
+
+    def __init__(self, filename, chrom_sizes, sum_overlaps=False):
+        if isinstance(chrom_sizes, str):
+            chrom_sizes = ChromosomeSizes.load(chrom_sizes)
+        if isinstance(chrom_sizes, ChromosomeSizes):
+            chrom_sizes = list(zip(chrom_sizes.names, chrom_sizes.sizes.tolist()))
+        self.filename = filename
+        self.chrom_sizes = [(chrom, int(size)) for chrom, size in chrom_sizes]
+        self.sum_overlaps = sum_overlaps
+        self._sizes = dict(self.chrom_sizes)
+        self._entries = {}
+        # The sums of overlapping entries are computed with the full precision of the values
+        self._dtype = numpy.float64 if sum_overlaps else numpy.float32
+        # pyBigWig does not report a file it cannot create
+        open(filename, "wb").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def add(self, chrom, starts, ends, values):
+        """Add the entries [starts[i], ends[i]) with values[i] on <chrom>. NaN values are left out and contiguous
+        entries with the same value are stored as one span."""
+        if chrom not in self._sizes:
+            return
+        starts = numpy.asarray(starts, dtype=numpy.int64)
+        ends = numpy.asarray(ends, dtype=numpy.int64)
+        values = numpy.asarray(values, dtype=numpy.float64)
+        keep = ~numpy.isnan(values)
+        # Clip the entries to the chromosome
+        starts, ends, values = starts[keep].clip(0, None), ends[keep].clip(None, self._sizes[chrom]), values[keep]
+        keep = ends > starts
+        starts, ends, values = starts[keep], ends[keep], values[keep].astype(self._dtype)
+        if len(starts) > 1 and (starts[1:] < starts[:-1]).any():
+            order = numpy.argsort(starts, kind="stable")
+            starts, ends, values = starts[order], ends[order], values[order]
+        starts, ends, values = collapse(starts, ends, values)
+        self._entries.setdefault(chrom, []).append((starts.astype(numpy.uint32), ends.astype(numpy.uint32), values))
+
+    def add_signal(self, chrom, start, values, step=1, span=None):
+        """Add a fixed-step signal: values[i] covers [start + i * step, start + i * step + span) (span defaults to
+        step)."""
+        starts = start + numpy.arange(len(values), dtype=numpy.int64) * step
+        self.add(chrom, starts, starts + (step if span is None else span), values)
+
+    def close(self):
+        """Write the bigWig file."""
+        bw = pyBigWig.open(self.filename, "w")
+        try:
+            bw.addHeader(self.chrom_sizes)
+            for chrom, _ in self.chrom_sizes:
+                if chrom not in self._entries:
+                    continue
+                starts, ends, values = [numpy.concatenate(a) for a in zip(*self._entries.pop(chrom))]
+                order = numpy.argsort(starts, kind="stable")
+                starts, ends = starts[order].astype(numpy.int64), ends[order].astype(numpy.int64)
+                values = values[order].astype(numpy.float64)
+                if self.sum_overlaps:
+                    starts, ends, values = _sum_overlaps(starts, ends, values)
+                starts, ends, values = collapse(starts, ends, values)
+                if len(starts):
+                    bw.addEntries([chrom] * len(starts), starts, ends=ends, values=values)
+        finally:
+            bw.close()
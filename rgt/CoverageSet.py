@@ -11,13 +11,27 @@ from __future__ import division
 
 # Python
 from functools import reduce
+import inspect
+import itertools
+import multiprocessing
 import os
+import shutil
 import sys
+import tempfile
 
 # External
 import pysam
 import numpy as np
-import pyBigWig
+
+# Internal
+from .Util import ChromosomeSizes
+from .BigWig import BigWigWriter, BigWigReader
+from .GenomicRegionSet import GenomicRegionSet
+
+# With single_pass="auto", a chromosome is read in one pass if it has at least SINGLE_PASS_REGIONS regions or if the
+# windows fetched for its regions add up to SINGLE_PASS_FRACTION of its length
+SINGLE_PASS_REGIONS = 5000
+SINGLE_PASS_FRACTION = 0.1
 
 
 class CoverageSet:
@@ -143,6 +157,9 @@ class CoverageSet:
     def write_wig(self, filename):
         """Output coverage in wig format. 
         
+        Every non-zero bin covers <stepsize> positions around its center, offset by the region start as in write_bed
+        and write_bigwig. The positions are 1-based, as the WIG format requires.
+        
         *Keyword arguments:*
         
         - filename -- filepath        
@@ -155,7 +172,7 @@ class CoverageSet:
             i += 1
             for j in range(len(c)):
                 if c[j] != 0:
-                    print(j * self.stepsize + ((self.binsize - self.stepsize) / 2), c[j], file=f)
+                    print(j * self.stepsize + (self.binsize - self.stepsize) // 2 + region.initial + 1, c[j], file=f)
         f.close()
 
     def write_bigwig(self, filename, chrom_file, end=True, save_wig=False):
@@ -164,6 +181,10 @@ class CoverageSet:
         The path to the chromosome size file <chrom_file> is required. This file is tab-separated and assigns
         a chromosome to its size.
         
+        The bigwig file is written directly (see rgt.BigWig). Every non-zero bin covers <stepsize> positions around
+        its center, like in write_bed and write_wig, and contiguous bins with the same coverage form one span. Bins
+        beyond the chromosome ends are clipped.
+        
         *Keyword arguments:*
         
         - filename -- filepath
@@ -177,14 +198,15 @@ class CoverageSet:
         
         """
 
-        tmp_path = filename + '.wig'
-        self.write_wig(tmp_path)
-        t = ['wigToBigWig', "-clip", tmp_path, chrom_file, filename]
-        c = " ".join(t)
-        os.system(c)
+        if save_wig:
+            self.write_wig(filename + '.wig')
 
-        if not save_wig:
-            os.remove(tmp_path)
+        with BigWigWriter(filename, chrom_file) as writer:
+            for region, c in zip(self.genomicRegions, self.coverage):
+                c = np.asarray(c)
+                bins = np.flatnonzero(c)
+                starts = bins * self.stepsize + (self.binsize - self.stepsize) // 2 + region.initial
+                writer.add(region.chrom, starts, starts + self.stepsize, c[bins])
 
     def _init_read_number(self, bamFile):
         """Compute number of reads and number of mapped reads for CoverageSet"""
@@ -254,17 +276,9 @@ class CoverageSet:
 
             self.coverage = []
 
-            bwf = pyBigWig.open(input_file)
-            for i, region in enumerate(self.genomicRegions):
-                # bin_start = max(0, region.initial - readSize)
-                # bin_end = region.final + readSize
-                # steps = int(len(region) / 10)
-                c = bwf.stats(region.chrom, region.initial, region.final, type="mean", nBins=1)
-                # print(c)
-                if c[0] is None:
-                    c = [0]
-                cov[i] = c[0]
-            bwf.close()
+            # The means of all regions in batches
+            means = BigWigReader.load(input_file).stats(self.genomicRegions, 1, type="mean")
+            cov = [0 if np.isnan(c[0]) else float(c[0]) for c in means]
         self.coverage = cov
         self.coverageOrig = cov
 
@@ -278,7 +292,7 @@ class CoverageSet:
 
     def coverage_from_bam(self, bam_file, extension_size=200, binsize=100, stepsize=50, rmdup=False,
                           maxdup=None, mask_file=None, paired_reads=False,
-                          get_strand_info=False, get_sense_info=False, no_gaps=False):
+                          get_strand_info=False, get_sense_info=False, no_gaps=False, single_pass=False, n_jobs=1):
         """Compute coverage based on GenomicRegionSet. 
         
         Iterate over each GenomicRegion in class variable genomicRegions (GenomicRegionSet). The GenomicRegion is divided into consecutive bins with lenth <binsize>.
@@ -295,6 +309,12 @@ class CoverageSet:
         - mask_file -- ignore region described in <mask_file> (tab-separated: chrom, start, end)
         - get_strand_info -- compute strand information for each bin
         - get_sense_info -- compute strand information for each bin when the region and the read are at the same strand
+        - single_pass -- read every chromosome once and assign the reads to all its regions instead of fetching the
+          reads of every region; faster for many (small) regions. Masked reads are then the ones within any region of
+          <mask_file>. With "auto", only the chromosomes with dense regions are read in one pass, the reads of the
+          other regions are fetched one region at a time.
+        - n_jobs -- number of processes computing the coverage of the chromosomes (-1: one per processor), see
+          coverage_from_bam_parallel
         
         
         *Output:*
@@ -337,10 +357,16 @@ class CoverageSet:
 
         if len(self.genomicRegions) == 0:
             return
-        log_aver = False
         self.binsize = binsize
         self.stepsize = stepsize
-        self.coverage = []
+
+        if n_jobs != 1:
+            CoverageSet.coverage_from_bam_parallel(
+                [(self, dict(bam_file=bam_file, extension_size=extension_size, binsize=binsize, stepsize=stepsize,
+                             rmdup=rmdup, maxdup=maxdup, mask_file=mask_file, paired_reads=paired_reads,
+                             get_strand_info=get_strand_info, get_sense_info=get_sense_info, no_gaps=no_gaps,
+                             single_pass=single_pass))], n_jobs)
+            return
 
         bam = pysam.Samfile(bam_file, "rb")
 
@@ -349,6 +375,36 @@ class CoverageSet:
             break
 
         self._init_read_number(bam_file)
+        get_strand_info, get_sense_info = self._strand_flags(get_strand_info, get_sense_info)
+        self._coverage_from_reads(bam, fragment_size, extension_size, rmdup, mask_file, paired_reads,
+                                  get_strand_info, get_sense_info, no_gaps, single_pass)
+
+    def _strand_flags(self, get_strand_info, get_sense_info):
+        """Return the strand flags of coverage_from_bam and reset <cov_strand_all> if one of them is set. The sense
+        information of unstranded regions is the strand information."""
+        if get_strand_info:
+            self.cov_strand_all = []
+        elif get_sense_info:
+            if self.genomicRegions.is_stranded():
+                self.cov_strand_all = []
+            else:
+                get_strand_info = True
+                get_sense_info = False
+                self.cov_strand_all = []
+        return get_strand_info, get_sense_info
+
+    def _coverage_from_reads(self, bam, fragment_size, extension_size, rmdup, mask_file, paired_reads,
+                             get_strand_info, get_sense_info, no_gaps, single_pass):
+        """Compute the coverage of coverage_from_bam from the opened <bam> with the resolved strand flags."""
+        log_aver = False
+        self.coverage = []
+
+        if single_pass:
+            if mask_file is not None and not os.path.exists(mask_file):
+                mask_file = None
+            self._coverage_single_pass(bam, fragment_size, extension_size, rmdup, mask_file, paired_reads,
+                                       get_strand_info, get_sense_info, no_gaps, whole=single_pass != "auto")
+            return
 
         # check whether one should mask
         next_it = True
@@ -361,21 +417,8 @@ class CoverageSet:
 
         chrom_regions = [r.chrom for r in self.genomicRegions.sequences]  # chroms by regions
 
-        if get_strand_info:
-            self.cov_strand_all = []
-        elif get_sense_info:
-            if self.genomicRegions.is_stranded():
-                self.cov_strand_all = []
-            else:
-                get_strand_info = True
-                get_sense_info = False
-                self.cov_strand_all = []
-
         for region in self.genomicRegions:
-            cov = [0] * (len(region) // stepsize)
-
             if get_strand_info or get_sense_info:
-                cov_strand = [[0, 0]] * (len(region) // stepsize)
                 strand_info = {}
 
             positions = []
@@ -440,73 +483,227 @@ class CoverageSet:
 
             # if maxdup == -1: # No limit
             # elif maxdup == 0: # Remove all duplicates
-            # else: # 
+            # else: #
 
             if rmdup:
                 positions = list(set(positions))
+            positions = np.array(positions)
 
-            positions.sort()
-            positions.reverse()
-            i = 0
-            while positions:
-                win_s = max(0, i * stepsize - binsize * 0.5) + region.initial
-                win_e = i * stepsize + binsize * 0.5 + region.initial
-                c = 0
-                if get_strand_info or get_sense_info:
-                    sum_strand_info = [0, 0]
-                # if get_sense_info:
-                #     sum_sense_info = [0,0]
-
-                taken = []
-                while True:
-                    s = positions.pop()
-
-                    taken.append(s)
-                    if s < win_e:  # read within window
-                        c += 1
-                        if get_strand_info or get_sense_info:
-                            sum_strand_info[0] += strand_info[s][0]
-                            sum_strand_info[1] += strand_info[s][1]
-                        # if get_sense_info:
-                        #     try:
-                        #         sum_sense_info[0] += sense_info[s][0]
-                        #         sum_sense_info[1] += sense_info[s][1]
-                        #     except:
-                        #         pass
-                    if s >= win_e or not positions:
-                        taken.reverse()
-                        for s in taken:
-                            if s + extension_size + read_length >= win_s:  # consider read in next iteration
-                                positions.append(s)
-                            else:
-                                break  # as taken decreases monotonously
-                        taken = []
-                        break
-                if i < len(cov):
-                    cov[i] = c
-                    if get_strand_info or get_sense_info:
-                        cov_strand[i] = sum_strand_info
-                    # if get_sense_info:
-                    #     cov_sense[i] = sum_sense_info
-                i += 1
+            strands = None
+            if get_strand_info or get_sense_info:
+                strands = np.array([strand_info.get(pos, (0, 0)) for pos in positions.tolist()],
+                                   dtype=np.int64).reshape(-1, 2)
+            cov, cov_strand = window_counts(positions, region.initial, len(region) // self.stepsize, self.binsize,
+                                            self.stepsize, extension_size, read_length, strands)
 
             if not log_aver:
-                self.coverage.append(np.array(cov))
+                self.coverage.append(cov)
             else:
-                cov = [x + 1 for x in cov]
-                self.coverage.append(np.log(np.array(cov)))
+                self.coverage.append(np.log(cov + 1))
 
             if get_strand_info or get_sense_info:
-                self.cov_strand_all.append(np.array(cov_strand))
+                self.cov_strand_all.append(cov_strand)
             # if get_sense_info:
             #     self.cov_sense_all.append(np.array(cov_sense))
             # print(np.array(cov_sense))
 
-        self.coverageorig = self.coverage[:]
-        self.overall_cov = reduce(lambda x, y: np.concatenate((x, y)),
-                                  [self.coverage[i] for i in range(len(self.genomicRegions))])
+        self._concatenate_coverage()
         if mask: f.close()
 
+    @staticmethod
+    def coverage_from_bam_parallel(tasks, n_jobs=-1):
+        """Compute coverage_from_bam for several CoverageSets with a pool of processes.
+
+        Every task is split into units of one chromosome (the regions of a task with a <mask_file> stay one unit, as
+        the mask file is read along the regions). Each process opens its own AlignmentFile and writes the counts of
+        its unit into memory-mapped arrays, from which the coverage of each CoverageSet is assembled in the order of
+        its regions. The result is the one of coverage_from_bam.
+
+        *Keyword arguments:*
+
+            - tasks -- List of tuples (CoverageSet, dict of keyword arguments of coverage_from_bam).
+            - n_jobs -- Number of processes (-1: one per processor). With 1, the units are computed in this process.
+        """
+        if n_jobs is None or n_jobs == -1:
+            n_jobs = multiprocessing.cpu_count()
+        directory = tempfile.mkdtemp(prefix="rgt_coverage_")
+        try:
+            units, outputs = [], []
+            for t, (cs, kwargs) in enumerate(tasks):
+                args = inspect.getcallargs(cs.coverage_from_bam, **kwargs)
+                if len(cs.genomicRegions) == 0:
+                    continue
+                cs.binsize = args["binsize"]
+                cs.stepsize = args["stepsize"]
+                bam = pysam.Samfile(args["bam_file"], "rb")
+                for read in bam.fetch():
+                    fragment_size = read.rlen + args["extension_size"]
+                    break
+                bam.close()
+                cs._init_read_number(args["bam_file"])
+                get_strand_info, get_sense_info = cs._strand_flags(args["get_strand_info"], args["get_sense_info"])
+                strand = get_strand_info or get_sense_info
+
+                regions = cs.genomicRegions.sequences
+                bins = [max(len(region) // cs.stepsize, 0) for region in regions]
+                offsets = np.concatenate(([0], np.cumsum(bins, dtype=np.int64)))
+                # A memmap needs at least one element
+                counts = os.path.join(directory, "%i.counts" % t)
+                np.memmap(counts, dtype=np.int64, mode="w+", shape=(max(offsets[-1], 1),)).flush()
+                strand_counts = None
+                if strand:
+                    strand_counts = os.path.join(directory, "%i.strands" % t)
+                    np.memmap(strand_counts, dtype=np.int64, mode="w+", shape=(max(offsets[-1], 1), 2)).flush()
+                outputs.append((cs, bins, offsets, counts, strand_counts))
+
+                groups = {}
+                if args["mask_file"] is not None and os.path.exists(args["mask_file"]) and not args["single_pass"]:
+                    groups[None] = list(range(len(regions)))
+                else:
+                    for k, region in enumerate(regions):
+                        groups.setdefault(region.chrom, []).append(k)
+                for indices in groups.values():
+                    units.append(([regions[k] for k in indices], [offsets[k] for k in indices], counts,
+                                  strand_counts, cs.name, cs.binsize, cs.stepsize, fragment_size,
+                                  args["bam_file"], args["extension_size"], args["rmdup"], args["mask_file"],
+                                  args["paired_reads"], get_strand_info, get_sense_info, args["no_gaps"],
+                                  args["single_pass"]))
+
+            if n_jobs <= 1 or len(units) < 2:
+                for unit in units:
+                    _coverage_unit(unit)
+            else:
+                pool = multiprocessing.Pool(min(n_jobs, len(units)))
+                try:
+                    pool.map(_coverage_unit, units)
+                finally:
+                    pool.close()
+                    pool.join()
+
+            for cs, bins, offsets, counts, strand_counts in outputs:
+                counts = np.array(np.memmap(counts, dtype=np.int64, mode="r"))
+                # Regions without bins keep the empty arrays of window_counts
+                cs.coverage = [counts[offsets[k]:offsets[k + 1]] if bins[k] else np.array([])
+                               for k in range(len(bins))]
+                if strand_counts is not None:
+                    strand_counts = np.array(np.memmap(strand_counts, dtype=np.int64, mode="r").reshape(-1, 2))
+                    cs.cov_strand_all = [strand_counts[offsets[k]:offsets[k + 1]] if bins[k] else np.array([])
+                                         for k in range(len(bins))]
+                cs._concatenate_coverage()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _concatenate_coverage(self):
+        """Set <coverageorig> and <overall_cov> from <coverage>."""
+        self.coverageorig = self.coverage[:]
+        # A single array is used as it is, like a reduction over the list
+        self.overall_cov = np.concatenate(self.coverage) if len(self.coverage) > 1 else self.coverage[0]
+
+    def _coverage_single_pass(self, bam, fragment_size, extension_size, rmdup, mask_file, paired_reads,
+                              get_strand_info, get_sense_info, no_gaps, whole=True):
+        """Compute the coverage of coverage_from_bam with one pass over the reads of every chromosome.
+
+        The reads of a chromosome are kept in arrays sorted by position. The reads of a region are the ones which
+        bam.fetch would return for it: a searchsorted on the read positions and a filter on the read ends. The counts
+        of all regions are written into one preallocated array.
+
+        If <whole> is False, only the chromosomes with dense regions (see _dense_regions) are read at once; for the
+        others, the same arrays hold the reads fetched for one region.
+        """
+        regions = self.genomicRegions.sequences
+        strand = get_strand_info or get_sense_info
+        bins = [max(len(region) // self.stepsize, 0) for region in regions]
+        offsets = np.concatenate(([0], np.cumsum(bins, dtype=np.int64)))
+        counts = np.zeros(offsets[-1], dtype=np.int64)
+        strand_counts = np.zeros((offsets[-1], 2), dtype=np.int64) if strand else None
+        masks = _read_mask(mask_file) if mask_file is not None else {}
+
+        chroms = {}
+        for k, region in enumerate(regions):
+            chroms.setdefault(region.chrom, []).append(k)
+        def index(reads):
+            masked = _masked(masks[chrom], reads["mask_positions"]) if chrom in masks else None
+            span = int((reads["ends"] - reads["starts"]).max()) if len(reads["starts"]) else 0
+            return masked, span
+
+        for chrom, indices in chroms.items():
+            at_once = whole or _dense_regions(bam, chrom, [regions[k] for k in indices], fragment_size)
+            if at_once:
+                try:
+                    reads = _chrom_reads(bam, chrom, extension_size, no_gaps)
+                except ValueError as e:
+                    for _ in indices:
+                        print("warning: {}".format(e))
+                    continue
+                masked, span = index(reads)
+
+            for k in indices:
+                region = regions[k]
+                if bins[k] == 0:
+                    continue
+                start, end = int(max(0, region.initial - fragment_size)), int(region.final + fragment_size)
+                if start > end:
+                    print("warning: invalid coordinates: start (%i) > stop (%i)" % (start, end))
+                    continue
+                if not at_once:
+                    try:
+                        reads = _chrom_reads(bam, chrom, extension_size, no_gaps, start, end)
+                    except ValueError as e:
+                        print("warning: {}".format(e))
+                        continue
+                    masked, span = index(reads)
+                # Reads overlapping [start, end), in the order of the file
+                first = np.searchsorted(reads["starts"], start - span, side="left")
+                last = np.searchsorted(reads["starts"], end, side="left")
+                selected = first + np.flatnonzero(reads["ends"][first:last] > start)
+                if len(selected) == 0:
+                    continue
+                read_length = reads["lengths"][selected[-1]]
+                selected = selected[reads["mapped"][selected]]
+                if masked is not None:
+                    selected = selected[~masked[selected]]
+                positions = reads["positions"][selected]
+
+                strands = None
+                if strand:
+                    reverse = reads["reverse"][selected]
+                    eligible = np.ones(len(selected), dtype=bool)
+                    if get_strand_info:
+                        values = np.column_stack((~reverse, reverse))
+                    else:
+                        if paired_reads:
+                            eligible = reads["read1"][selected]
+                        if region.orientation == "+":
+                            values = np.column_stack((reverse, ~reverse))
+                        elif region.orientation == "-":
+                            values = np.column_stack((~reverse, reverse))
+                        else:
+                            eligible[:] = False
+                    # The strand counts of a position are the ones of its first (eligible) read
+                    known, first_reads = np.unique(positions[eligible], return_index=True)
+                    strands = np.zeros((len(positions), 2), dtype=np.int64)
+                    if len(known):
+                        rank = np.minimum(np.searchsorted(known, positions), len(known) - 1)
+                        found = known[rank] == positions
+                        strands[found] = values[eligible][first_reads][rank[found]]
+
+                if rmdup:
+                    positions, unique = np.unique(positions, return_index=True)
+                    if strands is not None:
+                        strands = strands[unique]
+                cov, cov_strand = window_counts(positions, region.initial, bins[k], self.binsize, self.stepsize,
+                                                extension_size, read_length, strands)
+                counts[offsets[k]:offsets[k + 1]] = cov
+                if strand:
+                    strand_counts[offsets[k]:offsets[k + 1]] = cov_strand
+
+        # Regions without bins keep the empty arrays of window_counts
+        self.coverage = [counts[offsets[k]:offsets[k + 1]] if bins[k] else np.array([]) for k in range(len(regions))]
+        if strand:
+            self.cov_strand_all = [strand_counts[offsets[k]:offsets[k + 1]] if bins[k] else np.array([])
+                                   for k in range(len(regions))]
+        self._concatenate_coverage()
+
     def array_transpose(self, flip=False):
         """Transpose the arrays in strand coverage"""
         self.transpose_cov1 = []
@@ -601,20 +798,10 @@ class CoverageSet:
         
         """
 
-        self.coverage = []
-
-        bwf = pyBigWig.open(bigwig_file)
-
-        for gr in self.genomicRegions:
-            steps = int(len(gr) / stepsize)
-            try:
-                ds = bwf.stats(gr.chrom, gr.initial, gr.final, type="mean", nBins=steps)
-                ds = [x if x else 0 for x in ds]
-            except:
-                ds = [0] * steps
-            self.coverage.append(np.array(ds))
-
-        bwf.close()
+        # The bin means of all regions are read in batches; bins without values are 0
+        steps = [int(len(gr) / stepsize) for gr in self.genomicRegions]
+        means = BigWigReader.load(bigwig_file).stats(self.genomicRegions, steps, type="mean")
+        self.coverage = [np.nan_to_num(ds) for ds in means]
 
     def phastCons46way_score(self, stepsize=100):
         """Load the phastCons46way bigwig files to fetch the scores as coverage.
@@ -656,14 +843,7 @@ class CoverageSet:
         return len(reads)
 
     def norm_gc_content(self, cov, genome_path, chrom_sizes):
-        chrom_sizes_dict = {}
-
-        with open(chrom_sizes) as f:
-            for line in f:
-                line = line.strip()
-                line = line.split('\t')
-                c, e = line[0], int(line[1])
-                chrom_sizes_dict[c] = e
+        chrom_sizes_dict = ChromosomeSizes.load(chrom_sizes).as_dict()
 
         gc_cov, gc_avg, _ = get_gc_context(self.stepsize, self.binsize, genome_path, cov, chrom_sizes_dict)
 
@@ -680,6 +860,185 @@ class CoverageSet:
             self.coverage[i] = self.coverage[i].astype(int)
 
 
+def window_counts(positions, initial, n, binsize, stepsize, extension_size, read_length, strands=None):
+    """Return the read counts of the n sliding windows of a region, see CoverageSet.coverage_from_bam.
+
+    Window i covers [max(0, i * stepsize - binsize / 2), i * stepsize + binsize / 2) relative to initial. It counts
+    the read positions before its end which were not dropped by an earlier window; a window drops the positions s
+    with s + extension_size + read_length < its start. Each count is one difference of two searchsorted ranks in the
+    sorted positions, and the strand sums are differences of cumulative sums.
+
+    *Keyword arguments:*
+
+        - positions -- Array of read positions (any order, duplicates count several times).
+        - initial -- Initial position of the region.
+        - n -- Number of windows.
+        - binsize -- Size of the windows.
+        - stepsize -- Distance between the windows.
+        - extension_size -- Extension size of the reads.
+        - read_length -- Read length.
+        - strands -- Optional array (len(positions) x 2) with the forward and reverse counts of every position.
+
+    *Return:*
+
+        - Array of counts and, if strands is given, array (n x 2) of strand counts (else None). Both are empty float
+          arrays if n is 0.
+    """
+    if extension_size + read_length < 0:
+        # A window may then drop positions after its end, which only the sequential sweep handles
+        return _window_counts_loop(positions, initial, n, binsize, stepsize, extension_size, read_length, strands)
+    if n <= 0:
+        return np.array([]), None if strands is None else np.array([])
+
+    order = np.argsort(positions, kind="stable")
+    positions = positions[order]
+    steps = np.arange(n, dtype=np.int64) * stepsize
+    window_starts = np.maximum(0, steps - binsize * 0.5) + initial
+    window_ends = steps + binsize * 0.5 + initial
+
+    # Window i counts the positions in [dropped by window i - 1, before the end of window i)
+    ends = np.searchsorted(positions.astype(np.float64), window_ends, side="left")
+    dropped = np.searchsorted(positions + extension_size + read_length, window_starts, side="left")
+    starts = np.concatenate(([0], dropped[:-1]))
+    counts = ends - starts
+    if strands is None:
+        return counts, None
+    sums = np.concatenate((np.zeros((1, 2), dtype=np.int64), np.cumsum(strands[order], axis=0)))
+    return counts, sums[ends] - sums[starts]
+
+
+def _window_counts_loop(positions, initial, n, binsize, stepsize, extension_size, read_length, strands=None):
+    """Sequential sweep of window_counts, which also handles extension_size + read_length < 0."""
+    strand_info = {}
+    if strands is not None:
+        for pos, strand in zip(positions.tolist(), strands.tolist()):
+            strand_info.setdefault(pos, strand)
+    cov = [0] * n
+    cov_strand = [[0, 0]] * n
+    positions = sorted(positions.tolist(), reverse=True)
+    i = 0
+    while positions:
+        win_s = max(0, i * stepsize - binsize * 0.5) + initial
+        win_e = i * stepsize + binsize * 0.5 + initial
+        c = 0
+        sum_strand_info = [0, 0]
+        taken = []
+        while True:
+            s = positions.pop()
+            taken.append(s)
+            if s < win_e:  # read within window
+                c += 1
+                if strands is not None:
+                    sum_strand_info[0] += strand_info[s][0]
+                    sum_strand_info[1] += strand_info[s][1]
+            if s >= win_e or not positions:
+                taken.reverse()
+                for s in taken:
+                    if s + extension_size + read_length >= win_s:  # consider read in next iteration
+                        positions.append(s)
+                    else:
+                        break  # as taken decreases monotonously
+                break
+        if i < n:
+            cov[i] = c
+            cov_strand[i] = sum_strand_info
+        i += 1
+    return np.array(cov), None if strands is None else np.array(cov_strand)
+
+
+def _coverage_unit(unit):
+    """Compute the coverage of a unit of CoverageSet.coverage_from_bam_parallel and write it into its memmaps."""
+    (regions, offsets, counts, strand_counts, name, binsize, stepsize, fragment_size, bam_file, extension_size,
+     rmdup, mask_file, paired_reads, get_strand_info, get_sense_info, no_gaps, single_pass) = unit
+    region_set = GenomicRegionSet(name)
+    for region in regions:
+        region_set.add(region)
+    cs = CoverageSet(name, region_set)
+    cs.binsize = binsize
+    cs.stepsize = stepsize
+    if get_strand_info or get_sense_info:
+        cs.cov_strand_all = []
+    bam = pysam.Samfile(bam_file, "rb")
+    cs._coverage_from_reads(bam, fragment_size, extension_size, rmdup, mask_file, paired_reads,
+                            get_strand_info, get_sense_info, no_gaps, single_pass)
+    bam.close()
+
+    counts = np.memmap(counts, dtype=np.int64, mode="r+")
+    # Regions without bins have empty arrays
+    for offset, cov in zip(offsets, cs.coverage):
+        counts[offset:offset + len(cov)] = cov
+    counts.flush()
+    if strand_counts is not None:
+        strand_counts = np.memmap(strand_counts, dtype=np.int64, mode="r+").reshape(-1, 2)
+        for offset, cov_strand in zip(offsets, cs.cov_strand_all):
+            if len(cov_strand):
+                strand_counts[offset:offset + len(cov_strand)] = cov_strand
+        strand_counts.flush()
+
+
+def _dense_regions(bam, chrom, regions, fragment_size):
+    """Return whether the regions of a chromosome are dense enough to read the whole chromosome once instead of
+    fetching the reads of every region (see SINGLE_PASS_REGIONS and SINGLE_PASS_FRACTION)."""
+    if len(regions) >= SINGLE_PASS_REGIONS:
+        return True
+    try:
+        length = bam.get_reference_length(chrom)
+    except (KeyError, ValueError):
+        # The missing chromosome is reported once per region by _chrom_reads
+        return True
+    # Overlapping windows count repeatedly, as their reads are fetched repeatedly
+    return sum(len(region) + 2 * fragment_size for region in regions) >= SINGLE_PASS_FRACTION * length
+
+
+def _read_fields(bam, chrom, start, end, no_gaps):
+    """Yield start, end, length, aligned length and flag of the reads which bam.fetch returns."""
+    for read in bam.fetch(chrom, start, end):
+        if no_gaps and len(read.get_blocks()) > 1: continue  # ignore sliced reads
+        # bam.fetch takes the reads without aligned bases as one base long
+        pos, read_end = read.pos, read.reference_end
+        yield pos, read_end if read_end is not None and read_end > pos else pos + 1, read.rlen, read.qlen, read.flag
+
+
+def _chrom_reads(bam, chrom, extension_size, no_gaps, start=None, end=None):
+    """Return arrays with the reads of a chromosome (or of its window from start to end) in the order of the file
+    (sorted by position), for the single pass of CoverageSet.coverage_from_bam.
+
+    The fields of all reads are collected into one numpy array, without a Python object per read and field.
+    """
+    fields = np.fromiter(itertools.chain.from_iterable(_read_fields(bam, chrom, start, end, no_gaps)),
+                         dtype=np.int64).reshape(-1, 5)
+    flags = fields[:, 4]
+    reads = {"starts": fields[:, 0], "ends": fields[:, 1], "lengths": fields[:, 2],
+             "mapped": flags & 0x4 == 0, "reverse": flags & 0x10 != 0, "read1": flags & 0x40 != 0}
+    reads["positions"] = np.where(reads["reverse"], reads["starts"] - extension_size, reads["starts"])
+    reads["mask_positions"] = np.where(reads["reverse"], reads["starts"] - fields[:, 3], reads["starts"])
+    return reads
+
+
+def _read_mask(mask_file):
+    """Return the regions of a mask file (tab-separated: chrom, start, end) as sorted arrays of starts and running
+    maxima of ends per chromosome."""
+    regions = {}
+    with open(mask_file) as f:
+        for line in f:
+            line = line.split("\t")
+            if len(line) < 3:
+                continue
+            regions.setdefault(line[0], []).append((int(line[1]), int(line[2])))
+    masks = {}
+    for chrom, intervals in regions.items():
+        intervals = np.array(sorted(intervals), dtype=np.int64).reshape(-1, 2)
+        masks[chrom] = (intervals[:, 0], np.maximum.accumulate(intervals[:, 1]))
+    return masks
+
+
+def _masked(mask, positions):
+    """Return a boolean array: whether each position is within a region of the mask."""
+    starts, ends = mask
+    index = np.searchsorted(starts, positions, side="right") - 1
+    return (index >= 0) & (positions < ends[np.maximum(index, 0)])
+
+
 def get_gc_context(stepsize, binsize, genome_path, cov_list, chrom_sizes_dict):
     """Get GC content"""
 
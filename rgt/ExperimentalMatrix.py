@@ -41,7 +41,8 @@ class ExperimentalMatrix:
         self.objectsDict = {}
         self.trash = []
 
-    def read(self, file_path, is_bedgraph=False, verbose=False, test=False, add_region_len=False, load_bed=True):
+    def read(self, file_path, is_bedgraph=False, verbose=False, test=False, add_region_len=False, load_bed=True,
+             cache=False):
         """Read Experimental matrix file.
 
         *Keyword arguments:*
@@ -50,6 +51,7 @@ class ExperimentalMatrix:
             - is_bedgraph -- Whether regions are in bedgraph format (default = False).
             - verbose -- Verbose output (default = False).
             - test -- Fetch only 10 regions form each BED files for test.
+            - cache -- Keep the parsed regions in cache files next to the region files (default = False).
 
         *Example of experimental matrix file:*
 
@@ -174,7 +176,7 @@ class ExperimentalMatrix:
         self.remove_name()
         self.load_bed_url(".")
         self.load_bed = load_bed
-        self.load_objects(is_bedgraph, verbose=verbose, test=test)
+        self.load_objects(is_bedgraph, verbose=verbose, test=test, cache=cache)
 
         if add_region_len:
             for i, bed in enumerate(self.get_regionsnames()):
@@ -210,7 +212,7 @@ class ExperimentalMatrix:
         """Returns the 'read' type names."""
         return [n for i, n in enumerate(self.names) if self.types[i] == "reads"]
 
-    def load_objects(self, is_bedgraph, verbose=False, test=False):
+    def load_objects(self, is_bedgraph, verbose=False, test=False, cache=False):
         """Load files and initialize object.
 
         *Keyword arguments:*
@@ -218,6 +220,7 @@ class ExperimentalMatrix:
             - is_bedgraph -- Whether regions are in bedgraph format (default = False).
             - verbose -- Verbose output (default = False).
             - test -- Fetch only 10 regions form each BED files for test.
+            - cache -- Keep the parsed regions in cache files next to the region files (default = False).
         """
         for i, t in enumerate(self.types):
             if verbose:
@@ -230,9 +233,9 @@ class ExperimentalMatrix:
                 regions = GenomicRegionSet(self.names[i])
                 if self.load_bed:
                     if is_bedgraph:
-                        regions.read(os.path.abspath(self.files[self.names[i]]), io=GRSFileIO.BedGraph)
+                        regions.read(os.path.abspath(self.files[self.names[i]]), io=GRSFileIO.BedGraph, cache=cache)
                     else:
-                        regions.read(os.path.abspath(self.files[self.names[i]]))
+                        regions.read(os.path.abspath(self.files[self.names[i]]), cache=cache)
                         regions.sort()
                         if test:
                             regions.sequences = regions.sequences[0:10]
@@ -0,0 +1,132 @@
+"""
+ExternalSort
+===================
+ExternalSort sorts BED-like text files (BED, bedGraph, ...) by chromosome, initial and final position with bounded
+memory: the lines are sorted in chunks, which are written to temporary run files, and the runs are then combined
+with a k-way heap merge. The order is the one of "LC_COLLATE=C sort -k1,1 -k2,2n -k3,3n" and of
+GenomicRegionSet.sort; lines with equal positions keep their order of the input.
+
+"""
+
+###############################################################################
+# Libraries
+###############################################################################
+
+# Python
+from __future__ import print_function
+import os
+import heapq
+import tempfile
+from itertools import islice
+
+###############################################################################
+# Functions
+###############################################################################
+
+
+def line_key(line):
+    """Return the sort key (chromosome, initial, final) of a BED-like line, or None for header, comment, empty or
+    otherwise unparsable lines."""
+    fields = line.split("\t", 3)
+    if len(fields) < 3:
+        return None
+    try:
+        return fields[0], int(fields[1]), int(fields[2])
+    except ValueError:
+        return None
+
+
+def _write_run(lines, temp_dir):
+    """Write the lines to a new temporary file and return its path."""
+    handle, path = tempfile.mkstemp(prefix="rgt_sort_", suffix=".run", dir=temp_dir)
+    with os.fdopen(handle, "w") as f:
+        f.writelines(lines)
+    return path
+
+
+def _read_run(path, run):
+    """Yield the lines of a run file decorated with their sort key, the run and the line number for the merge."""
+    with open(path) as f:
+        for i, line in enumerate(f):
+            yield line_key(line), run, i, line
+
+
+def merge_runs(paths):
+    """Yield the lines of the sorted run files in sorted order. Equal keys are taken from the earlier run first."""
+    for _, _, _, line in heapq.merge(*[_read_run(path, run) for run, path in enumerate(paths)]):
+        yield line
+
+
+def sort_lines(lines, chunk_size=500000, temp_dir=None, max_runs=128):
+    """Sort BED-like lines with at most chunk_size lines in memory.
+
+    Header, comment and unparsable lines (see line_key) are yielded first, in input order, followed by the sorted
+    lines. Lines without a final newline get one.
+
+    *Keyword arguments:*
+
+        - lines -- An iterable of lines (e.g. an open file).
+        - chunk_size -- Number of lines sorted in memory at a time.
+        - temp_dir -- Directory of the temporary run files (default: the system temporary directory).
+        - max_runs -- Maximum number of run files merged at once; more runs are merged in several passes.
+
+    *Return:*
+
+        - A generator of the lines in sorted order.
+    """
+    lines = iter(lines)
+    headers, runs = [], []
+    try:
+        while True:
+            chunk = []
+            read = 0
+            for line in islice(lines, chunk_size):
+                read += 1
+                if not line.endswith("\n"):
+                    line += "\n"
+                if line_key(line) is None:
+                    headers.append(line)
+                else:
+                    chunk.append(line)
+            chunk.sort(key=line_key)
+            finished = read < chunk_size
+            if finished and not runs:
+                # Everything fits into a single chunk
+                for line in headers + chunk:
+                    yield line
+                return
+            if chunk:
+                runs.append(_write_run(chunk, temp_dir))
+            if finished:
+                break
+
+        # Merge the oldest runs first, so that equal keys keep their input order
+        while len(runs) > max_runs:
+            merged = _write_run(merge_runs(runs[:max_runs]), temp_dir)
+            for path in runs[:max_runs]:
+                os.remove(path)
+            runs = [merged] + runs[max_runs:]
+        for line in headers:
+            yield line
+        for line in merge_runs(runs):
+            yield line
+    finally:
+        for path in runs:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def sort_file(lines, filename, chunk_size=500000, temp_dir=None):
+    """Sort BED-like lines (see sort_lines) and write them to a file.
+
+    *Keyword arguments:*
+
+        - lines -- An iterable of lines (e.g. an open file).
+        - filename -- Path of the output file.
+        - chunk_size -- Number of lines sorted in memory at a time.
+        - temp_dir -- Directory of the temporary run files (default: the directory of the output file).
+    """
+    if temp_dir is None:
+        temp_dir = os.path.dirname(os.path.abspath(filename))
+    with open(filename, "w") as f:
+        f.writelines(sort_lines(lines, chunk_size=chunk_size, temp_dir=temp_dir))
@@ -5,8 +5,23 @@ GenomicRegion describes a genomic region.
 
 """
 
+###############################################################################
+# Libraries
+###############################################################################
 
-class GenomicRegion:
+# Python
+try:
+    from sys import intern
+except ImportError:
+    # Python 2: intern is a builtin
+    pass
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class GenomicRegion(object):
     """*Keyword arguments:*
 
             - chrom -- Chromosome.
@@ -16,12 +31,16 @@ class GenomicRegion:
             - orientation -- Orientation of the region, "+" or "-"
             - data -- Extra information
             - proximity -- Close genes
+
+    The attributes are stored in slots and the chromosome names are interned, so that all regions of a chromosome
+    share one string. Other attributes (e.g. sequence) can still be set; they go to a dictionary which is only
+    created for the regions using it.
     """
 
-    # __slots__ = ['chrom', 'initial', 'final', 'name', 'orientation', 'data', 'proximity']
+    __slots__ = ['chrom', 'initial', 'final', 'name', 'orientation', 'data', 'proximity', '__dict__']
 
     def __init__(self, chrom, initial, final, name=None, orientation=None, data=None, proximity=None):
-        self.chrom = str(chrom)  # chrom should be a string, not an integer
+        self.chrom = intern(str(chrom))  # chrom should be a string, not an integer
         if not isinstance(initial, int) or not isinstance(final, int):
             raise ValueError('The initial and final input for GenomicRegion should be integer.')
         self.initial = initial
@@ -197,6 +216,18 @@ class GenomicRegion:
                 else:
                     return 0
 
+    def __lt__(self, region):
+        return self.__cmp__(region) < 0
+
+    def __le__(self, region):
+        return self.__cmp__(region) <= 0
+
+    def __gt__(self, region):
+        return self.__cmp__(region) > 0
+
+    def __ge__(self, region):
+        return self.__cmp__(region) >= 0
+
     def extract_blocks(self, keep_name=False):
         """Extract the block information in self.data into a GenomicRegionSet."""
         z = []
@@ -0,0 +1,1185 @@
+"""
+GenomicRegionArray
+===================
+GenomicRegionArray stores genomic regions column-wise (struct of arrays): integer chromosome codes, int64 initial
+and final positions and optional name/orientation/data/proximity columns. It is the storage engine behind
+GenomicRegionSet; GenomicRegion objects are only built when they are requested.
+
+The module also contains the sweep kernels used by the set operations of GenomicRegionSet. All kernels work on
+sorted arrays and express every per-chromosome sweep as a single vectorized pass over "flat" genome coordinates
+(the lexicographic rank of the chromosome shifted above the position). Streams of sorted arrays, as read chunk by
+chunk from a file, can be merged with merge_chunks.
+
+"""
+
+###############################################################################
+# Libraries
+###############################################################################
+
+# Python
+from __future__ import print_function
+from __future__ import division
+import os
+import multiprocessing
+import tempfile
+import zipfile
+from multiprocessing.pool import ThreadPool
+import numpy
+
+# Internal
+from .GenomicRegion import GenomicRegion
+from .Util import file_stamp, replace_file
+
+###############################################################################
+# Constants
+###############################################################################
+
+# Number of bits reserved for positions in a flat genome coordinate
+CHROM_SHIFT = 40
+
+# Suffix and format version of the region cache files written next to the parsed files
+CACHE_SUFFIX = ".rgtidx"
+CACHE_VERSION = 1
+
+
+###############################################################################
+# Classes
+###############################################################################
+
+class CodeTable:
+    """Interns values (chromosome names, orientations) as small integer codes shared by all GenomicRegionArrays.
+
+    *Keyword arguments:*
+
+        - values -- Values to be registered first, in this order.
+    """
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        self._ranks = None
+        for v in values:
+            self.code(v)
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        """Return the code of the value, registering it if necessary."""
+        try:
+            return self.codes[value]
+        except KeyError:
+            c = len(self.values)
+            self.codes[value] = c
+            self.values.append(value)
+            self._ranks = None
+            return c
+
+    def encode(self, values, dtype=numpy.int32):
+        """Return a numpy array with the codes of the given values."""
+        for v in set(values):
+            self.code(v)
+        return numpy.fromiter(map(self.codes.__getitem__, values), dtype=dtype, count=len(values))
+
+    def decode(self, codes):
+        """Return a list with the values of the given codes."""
+        values = self.values
+        return [values[c] for c in codes.tolist()]
+
+    def ranks(self):
+        """Return an array mapping every code to the rank of its value in lexicographic order."""
+        if self._ranks is None or len(self._ranks) != len(self.values):
+            order = sorted(range(len(self.values)), key=lambda c: self.values[c])
+            ranks = numpy.empty(len(self.values), dtype=numpy.int64)
+            ranks[order] = numpy.arange(len(self.values), dtype=numpy.int64)
+            self._ranks = ranks
+        return self._ranks
+
+
+# Process-wide code tables, so that arrays of different sets can be compared code by code
+CHROMOSOMES = CodeTable()
+ORIENTATIONS = CodeTable([None, "+", "-", "."])
+
+
+class GenomicRegionArray:
+    """*Keyword arguments:*
+
+        - chroms -- Chromosome codes (see CHROMOSOMES)
+        - initials -- Start positions
+        - finals -- End positions
+        - names -- Names of the regions (object array) or None
+        - orientations -- Orientation codes (see ORIENTATIONS) or None
+        - data -- Extra information of the regions (object array) or None
+        - proximity -- Close genes (object array) or None
+    """
+
+    def __init__(self, chroms, initials, finals, names=None, orientations=None, data=None, proximity=None):
+        self.chroms = numpy.asarray(chroms, dtype=numpy.int32)
+        self.initials = numpy.asarray(initials, dtype=numpy.int64)
+        self.finals = numpy.asarray(finals, dtype=numpy.int64)
+        if orientations is None:
+            orientations = numpy.zeros(len(self.chroms), dtype=numpy.int8)
+        self.orientations = numpy.asarray(orientations, dtype=numpy.int8)
+        self.names = names
+        self.data = data
+        self.proximity = proximity
+
+    @staticmethod
+    def from_columns(chroms, initials, finals, names=None, orientations=None, data=None, proximity=None):
+        """Return a GenomicRegionArray built from python lists (chromosome and orientation given as strings)."""
+        return GenomicRegionArray(chroms=CHROMOSOMES.encode(chroms),
+                                  initials=numpy.asarray(initials, dtype=numpy.int64),
+                                  finals=numpy.asarray(finals, dtype=numpy.int64),
+                                  names=_object_column(names),
+                                  orientations=None if orientations is None else
+                                  ORIENTATIONS.encode(orientations, dtype=numpy.int8),
+                                  data=_object_column(data),
+                                  proximity=_object_column(proximity))
+
+    @staticmethod
+    def from_regions(regions):
+        """Return a GenomicRegionArray holding the coordinates and attributes of the given GenomicRegions."""
+        return GenomicRegionArray.from_columns(chroms=[r.chrom for r in regions],
+                                               initials=[r.initial for r in regions],
+                                               finals=[r.final for r in regions],
+                                               names=[r.name for r in regions],
+                                               orientations=[r.orientation for r in regions],
+                                               data=[r.data for r in regions],
+                                               proximity=[r.proximity for r in regions])
+
+    @staticmethod
+    def concatenate(arrays):
+        """Return a GenomicRegionArray containing the regions of all given arrays, in order."""
+        arrays = [a for a in arrays if len(a) > 0]
+        if not arrays:
+            return empty_array()
+        if len(arrays) == 1:
+            return arrays[0]
+
+        def cat(column):
+            cols = [getattr(a, column) for a in arrays]
+            if all(c is None for c in cols):
+                return None
+            return numpy.concatenate([c if c is not None else numpy.full(len(a), None, dtype=object)
+                                      for a, c in zip(arrays, cols)])
+
+        return GenomicRegionArray(chroms=numpy.concatenate([a.chroms for a in arrays]),
+                                  initials=numpy.concatenate([a.initials for a in arrays]),
+                                  finals=numpy.concatenate([a.finals for a in arrays]),
+                                  names=cat("names"),
+                                  orientations=numpy.concatenate([a.orientations for a in arrays]),
+                                  data=cat("data"),
+                                  proximity=cat("proximity"))
+
+    def __len__(self):
+        return len(self.chroms)
+
+    def chrom_names(self):
+        """Return the chromosome names as a list."""
+        return CHROMOSOMES.decode(self.chroms)
+
+    def regions(self):
+        """Return the regions as a list of GenomicRegion objects."""
+        n = len(self)
+        names = self.names.tolist() if self.names is not None else [None] * n
+        data = self.data.tolist() if self.data is not None else [None] * n
+        proximity = self.proximity.tolist() if self.proximity is not None else [None] * n
+        return [GenomicRegion(chrom=c, initial=s, final=e, name=na, orientation=o, data=d, proximity=p)
+                for c, s, e, na, o, d, p in zip(CHROMOSOMES.decode(self.chroms), self.initials.tolist(),
+                                                self.finals.tolist(), names, ORIENTATIONS.decode(self.orientations),
+                                                data, proximity)]
+
+    def region(self, i):
+        """Return the i-th region as a GenomicRegion."""
+        return GenomicRegion(chrom=CHROMOSOMES.values[self.chroms[i]],
+                             initial=int(self.initials[i]), final=int(self.finals[i]),
+                             name=self.names[i] if self.names is not None else None,
+                             orientation=ORIENTATIONS.values[self.orientations[i]],
+                             data=self.data[i] if self.data is not None else None,
+                             proximity=self.proximity[i] if self.proximity is not None else None)
+
+    def take(self, index):
+        """Return a new GenomicRegionArray with the regions selected by an index array or a boolean mask."""
+        return GenomicRegionArray(chroms=self.chroms[index],
+                                  initials=self.initials[index],
+                                  finals=self.finals[index],
+                                  names=self.names[index] if self.names is not None else None,
+                                  orientations=self.orientations[index],
+                                  data=self.data[index] if self.data is not None else None,
+                                  proximity=self.proximity[index] if self.proximity is not None else None)
+
+    def replace(self, initials=None, finals=None):
+        """Return a new GenomicRegionArray sharing the attributes of self but with new coordinates."""
+        return GenomicRegionArray(chroms=self.chroms,
+                                  initials=self.initials if initials is None else initials,
+                                  finals=self.finals if finals is None else finals,
+                                  names=self.names, orientations=self.orientations,
+                                  data=self.data, proximity=self.proximity)
+
+    def annotate(self, names=None, data=None, proximity=None):
+        """Return a new GenomicRegionArray sharing the coordinates of self, with the given lists of names, data or
+        proximity replacing the ones of self."""
+        return GenomicRegionArray(chroms=self.chroms, initials=self.initials, finals=self.finals,
+                                  names=self.names if names is None else _object_column(names),
+                                  orientations=self.orientations,
+                                  data=self.data if data is None else _object_column(data),
+                                  proximity=self.proximity if proximity is None else _object_column(proximity))
+
+    def lengths(self):
+        """Return the lengths of the regions."""
+        return self.finals - self.initials
+
+    def coverage(self):
+        """Return the sum of all lengths of regions."""
+        return int(numpy.sum(self.finals - self.initials))
+
+    def flat_coordinates(self, ranks=None):
+        """Return initials and finals as flat genome coordinates, which sort like GenomicRegion.__cmp__.
+
+        *Keyword arguments:*
+
+            - ranks -- Chromosome ranks to use (default: CHROMOSOMES.ranks()). Arrays compared with each other must
+              use the same ranks.
+        """
+        if ranks is None:
+            ranks = CHROMOSOMES.ranks()
+        offsets = ranks[self.chroms] << CHROM_SHIFT
+        return offsets + self.initials, offsets + self.finals
+
+    def sort_order(self):
+        """Return the indices which sort the regions by chromosome name, initial and final position."""
+        return numpy.lexsort((self.finals, self.initials, CHROMOSOMES.ranks()[self.chroms]))
+
+    def is_sorted(self):
+        """Return True if the regions are sorted by chromosome name, initial and final position."""
+        if len(self) < 2:
+            return True
+        flat_i, flat_f = self.flat_coordinates()
+        d = numpy.diff(flat_i)
+        return bool(numpy.all((d > 0) | ((d == 0) & (numpy.diff(flat_f) >= 0))))
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def _object_column(values):
+    """Return an object array of the values, or None if all of them are None."""
+    if values is None:
+        return None
+    if all(v is None for v in values):
+        return None
+    column = numpy.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def empty_array():
+    """Return an empty GenomicRegionArray."""
+    return GenomicRegionArray(chroms=numpy.empty(0, dtype=numpy.int32),
+                              initials=numpy.empty(0, dtype=numpy.int64),
+                              finals=numpy.empty(0, dtype=numpy.int64))
+
+
+def _widened_finals(flat_i, flat_f):
+    """Let zero-length regions cover their position, as GenomicRegion.overlap does for its argument."""
+    return numpy.where(flat_i == flat_f, flat_f + 1, flat_f)
+
+
+def _expand_ranges(lo, hi):
+    """Return (owner, index) pairs for all indices in the half-open ranges [lo[i], hi[i])."""
+    counts = numpy.maximum(hi - lo, 0)
+    owner = numpy.repeat(numpy.arange(len(lo)), counts)
+    starts = numpy.cumsum(counts) - counts
+    index = numpy.arange(counts.sum()) - numpy.repeat(starts, counts) + numpy.repeat(lo, counts)
+    return owner, index
+
+
+def _segmented_maximum(values, segments):
+    """Return the running maximum of the values, restarted at every position where segments is True (which it
+    has to be at the first position)."""
+    first = numpy.flatnonzero(segments)
+    segment = numpy.cumsum(segments) - 1
+    base = numpy.minimum.reduceat(values, first)[segment]
+    shifted = values - base
+    span = int(shifted.max()) + 1
+    if len(first) < numpy.iinfo(numpy.int64).max // span:
+        # The segment number in the high digits keeps every running maximum inside its segment
+        level = segment * span
+        return numpy.maximum.accumulate(level + shifted) - level + base
+    result = numpy.empty_like(values)
+    for lo, hi in zip(first.tolist(), first[1:].tolist() + [len(values)]):
+        result[lo:hi] = numpy.maximum.accumulate(values[lo:hi])
+    return result
+
+
+def merge_starts(array, ranks=None, keys=None):
+    """Return a boolean mask marking the regions of a sorted array that start a new merged region.
+
+    A region is merged into the previous ones if it starts before the largest final position seen so far on its
+    chromosome, exactly as GenomicRegionSet.merge does.
+
+    *Keyword arguments:*
+
+        - keys -- An integer array with one key per region (see region_keys). If given, a region is only merged
+          into the previous region if both have the same key.
+    """
+    n = len(array)
+    starts = numpy.ones(n, dtype=bool)
+    if n < 2:
+        return starts
+    flat_i, flat_f = array.flat_coordinates(ranks)
+    if keys is None:
+        running = numpy.maximum.accumulate(flat_f)
+        starts[1:] = flat_i[1:] >= running[:-1]
+    else:
+        keys = numpy.asarray(keys)
+        segments = numpy.ones(n, dtype=bool)
+        segments[1:] = (keys[1:] != keys[:-1]) | (array.chroms[1:] != array.chroms[:-1])
+        running = _segmented_maximum(flat_f, segments)
+        starts[1:] = segments[1:] | (flat_i[1:] >= running[:-1])
+    return starts
+
+
+def merge(array, ranks=None, keys=None):
+    """Return a GenomicRegionArray with the overlapping regions of a sorted array merged, or the array itself if
+    there is nothing to merge.
+
+    The merged region keeps the attributes of the first region of its group. See merge_starts for keys.
+    """
+    if len(array) < 2:
+        return array
+    starts = merge_starts(array, ranks, keys)
+    if starts.all():
+        return array
+    first = numpy.flatnonzero(starts)
+    finals = numpy.maximum.reduceat(array.finals, first)
+    return array.take(first).replace(finals=finals)
+
+
+def cluster(array, max_distance, ranks=None):
+    """Return a GenomicRegionArray with the clusters of the regions of a sorted array, as GenomicRegionSet.cluster.
+
+    A region joins the current cluster if the region extended by max_distance (as GenomicRegion.extend does)
+    overlaps the cluster; every cluster keeps the attributes of its first region.
+
+    Like merge, a region joins if its extended initial lies before the largest final position seen so far on its
+    chromosome. Only a region whose extended initial equals that final position depends on the initial of its
+    cluster; these regions (which follow a zero-length region) are resolved one by one.
+    """
+    if max_distance < 0:
+        raise ValueError("The maximum distance of a cluster must not be negative.")
+    if len(array) < 2:
+        return array
+    flat_i, flat_f = array.flat_coordinates(ranks)
+    extended = flat_i - array.initials + numpy.maximum(array.initials - max_distance, 0)
+    running = numpy.maximum.accumulate(flat_f)[:-1]
+    starts = numpy.ones(len(array), dtype=bool)
+    starts[1:] = extended[1:] >= running
+    # The extended region touches the cluster at its final position: it overlaps (see GenomicRegion.overlap) only
+    # if the cluster is a single position and the extended region reaches beyond it
+    pending = numpy.flatnonzero((extended[1:] == running) & (flat_i[:-1] == running) &
+                                (flat_f[1:] + max_distance > running)) + 1
+    if len(pending) > 0:
+        starts[pending] = False
+        known = numpy.flatnonzero(starts)
+        last = -1
+        for i, k in zip(pending.tolist(), known[numpy.searchsorted(known, pending) - 1].tolist()):
+            if flat_i[max(k, last)] != running[i - 1]:
+                starts[i] = True
+                last = i
+    first = numpy.flatnonzero(starts)
+    return array.take(first).replace(finals=numpy.maximum.reduceat(array.finals, first))
+
+
+def merge_sorted(a, b, ranks=None):
+    """Return the regions of two sorted arrays as one sorted array. Equal regions of a come before the ones of b."""
+    if len(a) == 0:
+        return b
+    if len(b) == 0:
+        return a
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    combined = GenomicRegionArray.concatenate([a, b])
+    flat_i, flat_f = combined.flat_coordinates(ranks)
+    # A stable sort (timsort) of two sorted runs is a linear merge
+    order = numpy.argsort(flat_i, kind="stable")
+    flat_i, flat_f = flat_i[order], flat_f[order]
+    if numpy.any((numpy.diff(flat_i) == 0) & (numpy.diff(flat_f) < 0)):
+        # Regions of a and b with the same start are not yet ordered by their end
+        order = numpy.lexsort((combined.finals, combined.initials, ranks[combined.chroms]))
+    return combined.take(order)
+
+
+def unique_regions(array):
+    """Return the sorted indices of the first occurrence of every distinct (chromosome, initial, final, orientation)."""
+    order = numpy.lexsort((array.orientations, array.finals, array.initials, CHROMOSOMES.ranks()[array.chroms]))
+    keep = numpy.ones(len(order), dtype=bool)
+    if len(order) > 1:
+        keep[1:] = ((numpy.diff(array.chroms[order]) != 0) | (numpy.diff(array.initials[order]) != 0) |
+                    (numpy.diff(array.finals[order]) != 0) | (numpy.diff(array.orientations[order]) != 0))
+    return order[keep]
+
+
+def overlapping_ranges(a, b, ranks=None):
+    """Return, for every region of a, the range [lo, hi) of regions of b overlapping it.
+
+    b must be sorted and merged (its initials and finals are then both increasing); a can be in any order.
+    """
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    a_i, a_f = a.flat_coordinates(ranks)
+    b_i, b_f = b.flat_coordinates(ranks)
+    b_f = _widened_finals(b_i, b_f)
+    lo = numpy.searchsorted(b_f, a_i, side="right")
+    hi = numpy.searchsorted(b_i, a_f, side="left")
+    return lo, numpy.maximum(hi, lo)
+
+
+def intersect_overlap(a, b, ranks=None):
+    """Return the overlapping parts of two sorted and merged arrays, with the attributes of a."""
+    lo, hi = overlapping_ranges(a, b, ranks)
+    owner, index = _expand_ranges(lo, hi)
+    initials = numpy.maximum(a.initials[owner], b.initials[index])
+    finals = numpy.minimum(a.finals[owner], b.finals[index])
+    return owner, initials, finals
+
+
+def overlap_mask(a, b, ranks=None):
+    """Return a boolean mask of the regions of a which overlap any region of the sorted array b."""
+    if len(a) == 0 or len(b) == 0:
+        return numpy.zeros(len(a), dtype=bool)
+    lo, hi = overlapping_ranges(a, overlap_targets(b, ranks), ranks)
+    return hi > lo
+
+
+def overlap_targets(b, ranks=None):
+    """Return the sorted array b merged, with zero-length regions widened to one position, as overlap_mask uses it."""
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    b_i, b_f = b.flat_coordinates(ranks)
+    return merge(b.replace(finals=b.finals + (b_f == b_i)), ranks)
+
+
+def inclusion_mask(a, b, ranks=None):
+    """Return a boolean mask of the regions of a which are completely included by one region of the sorted array b."""
+    if len(a) == 0 or len(b) == 0:
+        return numpy.zeros(len(a), dtype=bool)
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    a_i, a_f = a.flat_coordinates(ranks)
+    b_i, b_f = b.flat_coordinates(ranks)
+    running = numpy.maximum.accumulate(b_f)
+    zero = a_i == a_f
+    # The last region of b starting at or before the region of a (strictly before, for zero-length regions)
+    j = numpy.where(zero, numpy.searchsorted(b_i, a_i, side="left"),
+                    numpy.searchsorted(b_i, a_i, side="right")) - 1
+    valid = j >= 0
+    end = numpy.where(valid, running[numpy.maximum(j, 0)], -1)
+    return valid & numpy.where(zero, end > a_f, end >= a_f)
+
+
+def subtract(a, b, whole_region=False, ranks=None):
+    """Return the parts of the sorted array a which are not covered by the sorted array b.
+
+    *Return:*
+
+        - owner -- Index of the region of a every resulting piece comes from
+        - initials, finals -- Coordinates of the pieces
+    """
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    if whole_region:
+        keep = numpy.flatnonzero(~overlap_mask(a, b, ranks))
+        return keep, a.initials[keep], a.finals[keep]
+
+    # Zero-length regions of b do not cover any base pair
+    b = merge(b.take(b.finals > b.initials), ranks)
+    if len(b) == 0:
+        return numpy.arange(len(a)), a.initials, a.finals
+    lo, hi = overlapping_ranges(a, b, ranks)
+    k = hi - lo
+    # A region overlapping k regions of b is cut into (at most) k + 1 pieces
+    owner = numpy.repeat(numpy.arange(len(a)), k + 1)
+    first = numpy.cumsum(k + 1) - (k + 1)
+    t = numpy.arange(len(owner)) - first[owner]
+    last = t == k[owner]
+    j = lo[owner] + t
+    initials = numpy.where(t == 0, a.initials[owner], b.finals[numpy.minimum(j - 1, len(b) - 1)])
+    finals = numpy.where(last, a.finals[owner], b.initials[numpy.minimum(j, len(b) - 1)])
+    keep = finals > initials
+    return owner[keep], initials[keep], finals[keep]
+
+
+def count_overlaps(a, b, ranks=None):
+    """Return the number of regions of the sorted array b overlapping every region of a."""
+    if len(b) == 0:
+        return numpy.zeros(len(a), dtype=numpy.int64)
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    a_i, a_f = a.flat_coordinates(ranks)
+    b_i, b_f = b.flat_coordinates(ranks)
+    b_f = numpy.sort(_widened_finals(b_i, b_f))
+    return numpy.searchsorted(b_i, a_f, side="left") - numpy.searchsorted(b_f, a_i, side="right")
+
+
+def covered_lengths(a, b, ranks=None):
+    """Return the number of positions of every region of a covered by the regions of the sorted array b."""
+    if len(b) == 0:
+        return numpy.zeros(len(a), dtype=numpy.int64)
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    a_i, a_f = a.flat_coordinates(ranks)
+    b_i, b_f = merge(b, ranks).flat_coordinates(ranks)
+    # Prefix sums of the merged coverage; only the first and the last merged region overlapping a region of a can
+    # stick out of it
+    covered = numpy.concatenate([[0], numpy.cumsum(b_f - b_i)])
+    lo = numpy.searchsorted(b_f, a_i, side="right")
+    hi = numpy.maximum(numpy.searchsorted(b_i, a_f, side="left"), lo)
+    any_overlap = hi > lo
+    first, last = numpy.minimum(lo, len(b_i) - 1), numpy.maximum(hi - 1, 0)
+    return numpy.where(any_overlap, covered[hi] - covered[lo] - numpy.maximum(a_i - b_i[first], 0) -
+                       numpy.maximum(b_f[last] - a_f, 0), 0)
+
+
+def intersect_counts(a, b, mode="count", min_fraction=0, ranks=None):
+    """Compare two sorted and merged arrays in one sweep, as GenomicRegionSet.intersect_count does.
+
+    *Keyword arguments:*
+
+        - mode -- "count" to count the regions, "bp" to count the base pairs.
+        - min_fraction -- A region only counts as intersecting if at least this fraction of it is covered by the
+          other array (with "bp", only the intersections of such regions of a count).
+
+    *Return:*
+
+        - A tuple (A-B, B-A, intersection)
+    """
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    # All overlapping pairs and the lengths of their intersections
+    lo, hi = overlapping_ranges(a, b, ranks)
+    owner, index = _expand_ranges(lo, hi)
+    lengths = numpy.maximum(numpy.minimum(a.finals[owner], b.finals[index]) -
+                            numpy.maximum(a.initials[owner], b.initials[index]), 0)
+    if mode == "count":
+        if numpy.all(a.finals > a.initials) and numpy.all(b.finals > b.initials):
+            hit_a = hi > lo
+            hit_b = numpy.bincount(index, minlength=len(b)) > 0
+        else:
+            # Zero-length regions overlap as GenomicRegion.overlap decides, which is not symmetric
+            hit_a, hit_b = overlap_mask(a, b, ranks), overlap_mask(b, a, ranks)
+        if min_fraction:
+            hit_a &= numpy.bincount(owner, weights=lengths, minlength=len(a)) >= min_fraction * a.lengths()
+            hit_b &= numpy.bincount(index, weights=lengths, minlength=len(b)) >= min_fraction * b.lengths()
+        c_ab = int(numpy.count_nonzero(hit_a))
+        return len(a) - c_ab, len(b) - int(numpy.count_nonzero(hit_b)), c_ab
+    elif mode == "bp":
+        if min_fraction:
+            covered = numpy.bincount(owner, weights=lengths, minlength=len(a))
+            lengths = lengths[(covered >= min_fraction * a.lengths())[owner]]
+        inter = int(lengths.sum())
+        return a.coverage() - inter, b.coverage() - inter, inter
+    raise ValueError("Unknown mode: " + str(mode))
+
+
+def region_keys(arrays, strand_specific=False, name_specific=False):
+    """Return one integer key array per array, equal for regions with the same orientation and/or name (with the
+    given options) across all arrays, or None if no option is set."""
+    if not strand_specific and not name_specific:
+        return None
+    keys = [numpy.zeros(len(array), dtype=numpy.int64) for array in arrays]
+    if name_specific:
+        codes = {}
+        for k, array in zip(keys, arrays):
+            names = array.names.tolist() if array.names is not None else [None] * len(array)
+            k += numpy.fromiter((codes.setdefault(n, len(codes)) for n in names), dtype=numpy.int64, count=len(names))
+        for k in keys:
+            k *= len(ORIENTATIONS)
+    if strand_specific:
+        for k, array in zip(keys, arrays):
+            k += array.orientations
+    return keys
+
+
+def keyed_line(arrays, keys, ranks=None):
+    """Lay the regions of the given sorted arrays out on one line, with a separate stretch for every pair of key and
+    chromosome, so that the sweep kernels (and the C functions of librgt) only match regions with equal keys.
+
+    The stretches are ordered by key and chromosome and separated by a gap, so that neither merged nor widened
+    zero-length regions reach into the next one. The kernels have to be called with the returned ranks.
+
+    *Return:*
+
+        - orders -- For every array, the order of its regions on the line
+        - lines -- For every array, its regions in this order with the positions on the line
+        - offsets -- Start of every stretch on the line, see line_offsets
+        - line_ranks -- Chromosome ranks putting all regions on the same line
+    """
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    stretch = numpy.concatenate([k * len(ranks) + ranks[array.chroms] for array, k in zip(arrays, keys)])
+    values, inverse = numpy.unique(stretch, return_inverse=True)
+    finals = numpy.concatenate([array.finals for array in arrays])
+    sizes = numpy.zeros(len(values), dtype=numpy.int64)
+    numpy.maximum.at(sizes, inverse, finals)
+    offsets = numpy.concatenate([[0], numpy.cumsum(sizes + 2)[:-1]]).astype(numpy.int64)
+
+    orders, lines = [], []
+    start = 0
+    for array in arrays:
+        shift = offsets[inverse[start:start + len(array)]]
+        start += len(array)
+        # Within a stretch, the regions keep their sorted order
+        order = numpy.argsort(array.initials + shift, kind="stable")
+        orders.append(order)
+        lines.append(array.take(order).replace(initials=array.initials[order] + shift[order],
+                                               finals=array.finals[order] + shift[order]))
+    return orders, lines, offsets, numpy.zeros(len(ranks), dtype=numpy.int64)
+
+
+def line_offsets(offsets, positions):
+    """Return the offsets of the stretches of keyed_line which the positions on the line belong to."""
+    return offsets[numpy.searchsorted(offsets, positions, side="right") - 1]
+
+
+def overlap_pairs(a, b, ranks=None):
+    """Return all pairs of overlapping regions (as GenomicRegion.overlap) of the array a and the sorted array b.
+
+    *Return:*
+
+        - query, target -- Indices of the regions of a and b, sorted by query and target
+    """
+    empty = numpy.empty(0, dtype=numpy.int64)
+    if len(a) == 0 or len(b) == 0:
+        return empty, empty
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    a_i, a_f = a.flat_coordinates(ranks)
+    b_i, b_f = b.flat_coordinates(ranks)
+    b_f = _widened_finals(b_i, b_f)
+    # The regions of b overlapping a region of a start before its end, after the first region of b reaching into it
+    lo = numpy.searchsorted(numpy.maximum.accumulate(b_f), a_i, side="right")
+    hi = numpy.maximum(numpy.searchsorted(b_i, a_f, side="left"), lo)
+    query, target = _expand_ranges(lo, hi)
+    keep = b_f[target] > a_i[query]
+    return query[keep], target[keep]
+
+
+def overlap_matrix(arrays, metric="jaccard", ranks=None):
+    """Compare every pair of the given sorted arrays in a single sweep over the regions of all of them.
+
+    All arrays are merged and their regions are sorted together once. Every region overlaps exactly the regions of
+    the other arrays which start at or after it and before its end, i.e. a range of the sorted regions; the pairs of
+    all these ranges are accumulated into the K x K matrix at once.
+
+    *Keyword arguments:*
+
+        - metric -- "bp": number of positions covered by both arrays (the diagonal is the coverage of every array);
+          "jaccard": bp / (coverage of i + coverage of j - bp); "count": number of merged regions of array i
+          overlapping array j (the diagonal is the number of merged regions). For "count", zero-length regions
+          cover their position.
+
+    *Return:*
+
+        - A K x K numpy array
+    """
+    if metric not in ("jaccard", "bp", "count"):
+        raise ValueError("Unknown metric: " + str(metric))
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    k = len(arrays)
+    if metric == "count":
+        arrays = [overlap_targets(a, ranks) if len(a) > 0 else a for a in arrays]
+    else:
+        arrays = [merge(a, ranks) for a in arrays]
+
+    owner = numpy.repeat(numpy.arange(k), [len(a) for a in arrays])
+    flat = [a.flat_coordinates(ranks) for a in arrays]
+    empty = [numpy.empty(0, dtype=numpy.int64)]
+    flat_i = numpy.concatenate([f[0] for f in flat] + empty)
+    flat_f = numpy.concatenate([f[1] for f in flat] + empty)
+    order = numpy.argsort(flat_i, kind="stable")
+    owner, flat_i, flat_f = owner[order], flat_i[order], flat_f[order]
+
+    # Pairs (x, y) of overlapping regions with y after x; the regions of one merged array never overlap each other
+    lo = numpy.arange(1, len(flat_i) + 1)
+    hi = numpy.maximum(numpy.searchsorted(flat_i, flat_f, side="left"), lo)
+    x, y = _expand_ranges(lo, hi)
+
+    if metric == "count":
+        # Every region counts once per other array it overlaps
+        hits = numpy.sort(numpy.concatenate([x * k + owner[y], y * k + owner[x]]))
+        hits = hits[numpy.concatenate([[True], numpy.diff(hits) != 0])] if len(hits) > 0 else hits
+        counts = numpy.bincount(owner[hits // k] * k + hits % k, minlength=k * k).reshape(k, k)
+        counts[numpy.diag_indices(k)] = [len(a) for a in arrays]
+        return counts
+
+    lengths = numpy.minimum(flat_f[x], flat_f[y]) - flat_i[y]
+    bp = numpy.bincount(owner[x] * k + owner[y], weights=lengths, minlength=k * k).reshape(k, k)
+    bp = numpy.rint(bp + bp.T).astype(numpy.int64)
+    bp[numpy.diag_indices(k)] = [a.coverage() for a in arrays]
+    if metric == "bp":
+        return bp
+    coverage = numpy.diag(bp)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return bp / (coverage[:, None] + coverage[None, :] - bp)
+
+
+def membership_segments(arrays, ranks=None):
+    """Cut the regions of the given sorted and merged arrays into the segments covered by the same arrays, in a
+    single sweep over the boundaries of all regions.
+
+    Every segment is labelled with the bitmask of the arrays covering it (bit j for arrays[j]) and keeps the
+    attributes of the region of the first of these arrays. Adjacent segments with the same bitmask are joined,
+    unless one of the covering arrays has two bookended regions there, which intersect and subtract keep apart as
+    well. Zero-length regions cover nothing and are ignored.
+
+    *Return:*
+
+        - segments -- GenomicRegionArray with the segments in sorted order
+        - masks -- Bitmask of every segment
+    """
+    if len(arrays) > 62:
+        raise ValueError("At most 62 arrays can be combined.")
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    flats = [array.flat_coordinates(ranks) for array in arrays]
+    positions, deltas, bookends = [], [], []
+    for j, (flat_i, flat_f) in enumerate(flats):
+        covering = flat_f > flat_i
+        flat_i, flat_f = flat_i[covering], flat_f[covering]
+        touching = numpy.intersect1d(flat_i, flat_f)
+        positions += [flat_i, flat_f, touching]
+        deltas += [numpy.full(len(flat_i), 1 << j, dtype=numpy.int64),
+                   numpy.full(len(flat_f), -(1 << j), dtype=numpy.int64),
+                   numpy.zeros(len(touching), dtype=numpy.int64)]
+        bookends += [numpy.zeros(len(flat_i) + len(flat_f), dtype=numpy.int64),
+                     numpy.full(len(touching), 1 << j, dtype=numpy.int64)]
+    positions = numpy.concatenate(positions) if positions else numpy.empty(0, dtype=numpy.int64)
+    if len(positions) == 0:
+        return empty_array(), numpy.empty(0, dtype=numpy.int64)
+    order = numpy.argsort(positions, kind="stable")
+    positions = positions[order]
+    first = numpy.flatnonzero(numpy.concatenate([[True], positions[1:] != positions[:-1]]))
+    # As the regions of every array are disjoint, the running sum of the deltas is the bitmask
+    masks = numpy.cumsum(numpy.add.reduceat(numpy.concatenate(deltas)[order], first))[:-1]
+    bookends = numpy.bitwise_or.reduceat(numpy.concatenate(bookends)[order], first)[:-1]
+    initials, finals = positions[first][:-1], positions[first][1:]
+
+    # Elementary segments between two boundaries; the ones without a bitmask are gaps
+    covered = numpy.flatnonzero(masks != 0)
+    joined = numpy.zeros(len(covered), dtype=bool)
+    joined[1:] = (covered[1:] == covered[:-1] + 1) & (masks[covered[1:]] == masks[covered[:-1]]) & \
+                 (bookends[covered[1:]] & masks[covered[1:]] == 0)
+    starts = numpy.flatnonzero(~joined)
+    masks = masks[covered[starts]]
+    initials = initials[covered[starts]]
+    finals = numpy.maximum.reduceat(finals[covered], starts) if len(starts) > 0 else initials
+
+    # Attributes and chromosome of the region of the first covering array
+    lowest = numpy.log2(masks & -masks).astype(numpy.int64)
+    parts, index = [], []
+    for j in numpy.unique(lowest).tolist():
+        selected = numpy.flatnonzero(lowest == j)
+        flat_i = flats[j][0]
+        owner = numpy.searchsorted(flat_i, initials[selected], side="right") - 1
+        shift = flat_i[owner] - arrays[j].initials[owner]
+        parts.append(arrays[j].take(owner).replace(initials=initials[selected] - shift,
+                                                   finals=finals[selected] - shift))
+        index.append(selected)
+    if not parts:
+        return empty_array(), masks
+    segments = GenomicRegionArray.concatenate(parts)
+    return segments.take(numpy.argsort(numpy.concatenate(index))), masks
+
+
+def combination_counts(arrays, sparse=None, ranks=None):
+    """Return the number of segments (see membership_segments) and the base pairs covered by every combination of
+    the given sorted and merged arrays. The chromosomes are swept one at a time, so that only the segments of one
+    chromosome are held in memory.
+
+    *Keyword arguments:*
+
+        - sparse -- If True, only the combinations which occur are returned; if False, all 2^k combinations of the
+          k arrays. By default, the result is sparse for more than 20 arrays.
+
+    *Return:*
+
+        - masks -- Bitmasks of the combinations (bit j for arrays[j]), increasing
+        - counts -- Number of segments of every combination
+        - lengths -- Base pairs covered by every combination
+    """
+    if sparse is None:
+        sparse = len(arrays) > 20
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    blocks = [dict((c, (lo, hi)) for c, lo, hi in zip(*chrom_blocks(array))) for array in arrays]
+    chroms = sorted(set(c for b in blocks for c in b), key=lambda c: ranks[c])
+    if sparse:
+        masks = numpy.empty(0, dtype=numpy.int64)
+        counts = numpy.empty(0, dtype=numpy.int64)
+        lengths = numpy.empty(0, dtype=numpy.int64)
+    else:
+        masks = numpy.arange(1 << len(arrays), dtype=numpy.int64)
+        counts = numpy.zeros(len(masks), dtype=numpy.int64)
+        lengths = numpy.zeros(len(masks), dtype=numpy.int64)
+    for c in chroms:
+        parts = [array.take(slice(*b[c])) if c in b else empty_array() for array, b in zip(arrays, blocks)]
+        segments, segment_masks = membership_segments(parts, ranks)
+        if sparse:
+            values, inverse = numpy.unique(numpy.concatenate([masks, segment_masks]), return_inverse=True)
+            weights = numpy.concatenate([counts, numpy.ones(len(segment_masks), dtype=numpy.int64)])
+            counts = numpy.bincount(inverse, weights=weights, minlength=len(values)).astype(numpy.int64)
+            weights = numpy.concatenate([lengths, segments.lengths()])
+            lengths = numpy.bincount(inverse, weights=weights, minlength=len(values)).astype(numpy.int64)
+            masks = values
+        else:
+            counts += numpy.bincount(segment_masks, minlength=len(masks))
+            lengths += numpy.bincount(segment_masks, weights=segments.lengths(),
+                                      minlength=len(masks)).astype(numpy.int64)
+    return masks, counts, lengths
+
+
+def _nearest_candidates(a_i, a_f, b_i, b_f, n):
+    """Return (query, target, distance) for all regions of b overlapping or touching a region of a, plus the n
+    nearest regions of b on each side of it. Coordinates are flat; b_i must be sorted."""
+    # Overlapping or touching (distance 0): b_i <= a_f and b_f >= a_i
+    lo = numpy.searchsorted(numpy.maximum.accumulate(b_f), a_i, side="left")
+    hi = numpy.searchsorted(b_i, a_f, side="right")
+    owner, index = _expand_ranges(lo, numpy.maximum(hi, lo))
+    touching = b_f[index] >= a_i[owner]
+    query, target = [owner[touching]], [index[touching]]
+    distance = [numpy.zeros(len(query[0]), dtype=numpy.int64)]
+
+    chrom_first = (a_i >> CHROM_SHIFT) << CHROM_SHIFT
+    chrom_next = chrom_first + (1 << CHROM_SHIFT)
+
+    # Upstream: the regions ending before a_i with the largest finals (first region of b first among equal finals)
+    by_final = numpy.lexsort((-numpy.arange(len(b_f)), b_f))
+    ends = b_f[by_final]
+    hi = numpy.searchsorted(ends, a_i, side="left")
+    lo = numpy.maximum(hi - n, numpy.searchsorted(ends, chrom_first, side="left"))
+    owner, index = _expand_ranges(lo, numpy.maximum(hi, lo))
+    query.append(owner)
+    target.append(by_final[index])
+    distance.append(ends[index] - a_i[owner])
+
+    # Downstream: the regions starting after a_f with the smallest initials
+    lo = numpy.searchsorted(b_i, a_f, side="right")
+    hi = numpy.minimum(lo + n, numpy.searchsorted(b_i, chrom_next, side="left"))
+    owner, index = _expand_ranges(lo, numpy.maximum(hi, lo))
+    query.append(owner)
+    target.append(index)
+    distance.append(b_i[index] - a_f[owner])
+    return numpy.concatenate(query), numpy.concatenate(target), numpy.concatenate(distance)
+
+
+def nearest(a, b, top_n=1, max_distance=None, strand_specific=False, ranks=None):
+    """Return the regions of the sorted array b nearest to every region of a.
+
+    The distance between two regions is the one of GenomicRegion.distance. It is signed in the result: negative for
+    regions of b before the region of a, positive for regions after it and 0 for regions overlapping or touching it.
+
+    *Keyword arguments:*
+
+        - top_n -- Number of nearest regions of b returned per region of a; among equally distant regions, the first
+          ones of b are chosen. If None, all regions at distance 0 and the nearest region on each side are returned.
+        - max_distance -- Ignore the regions of b farther than max_distance.
+        - strand_specific -- Only consider the regions of b with the orientation of the region of a.
+
+    *Return:*
+
+        - query, target -- Indices of the regions of a and b, sorted by query, absolute distance and target
+        - distance -- Signed distances
+    """
+    empty = numpy.empty(0, dtype=numpy.int64)
+    if len(a) == 0 or len(b) == 0 or top_n == 0:
+        return empty, empty, empty
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    a_i, a_f = a.flat_coordinates(ranks)
+    b_i, b_f = b.flat_coordinates(ranks)
+    n = 1 if top_n is None else min(top_n, len(b))
+
+    if strand_specific:
+        parts = []
+        for code in numpy.unique(a.orientations):
+            ia = numpy.flatnonzero(a.orientations == code)
+            ib = numpy.flatnonzero(b.orientations == code)
+            if len(ib) > 0:
+                q, t, d = _nearest_candidates(a_i[ia], a_f[ia], b_i[ib], b_f[ib], n)
+                parts.append((ia[q], ib[t], d))
+        if not parts:
+            return empty, empty, empty
+        query, target, distance = [numpy.concatenate(p) for p in zip(*parts)]
+    else:
+        query, target, distance = _nearest_candidates(a_i, a_f, b_i, b_f, n)
+
+    if max_distance is not None:
+        keep = numpy.abs(distance) <= max_distance
+        query, target, distance = query[keep], target[keep], distance[keep]
+    order = numpy.lexsort((target, numpy.abs(distance), query))
+    query, target, distance = query[order], target[order], distance[order]
+    if top_n is not None:
+        keep = numpy.arange(len(query)) - numpy.searchsorted(query, query, side="left") < top_n
+        query, target, distance = query[keep], target[keep], distance[keep]
+    return query, target, distance
+
+
+def extend(array, left, right):
+    """Return a new GenomicRegionArray with every region extended as GenomicRegion.extend does."""
+    initials = array.initials - left
+    finals = array.finals + right
+    # if left, right are negative, switching the border may be necessary
+    swap = initials > finals
+    initials, finals = numpy.where(swap, finals, initials), numpy.where(swap, initials, finals)
+    return array.replace(initials=numpy.maximum(initials, 0), finals=finals)
+
+
+def extend_stranded(array, upstream, downstream):
+    """Return a new GenomicRegionArray with every region extended upstream and downstream of its orientation.
+    Regions without "+" orientation are treated as "-", as GenomicRegionSet.extend_upstream does."""
+    plus = array.orientations == ORIENTATIONS.code("+")
+    return extend(array, numpy.where(plus, upstream, downstream), numpy.where(plus, downstream, upstream))
+
+
+def _interleave(a, b):
+    """Return a GenomicRegionArray with the regions of a and b (of equal length) alternating: a[0], b[0], a[1]..."""
+    n = len(a)
+    return GenomicRegionArray.concatenate([a, b]).take(numpy.arange(2 * n).reshape(2, n).T.ravel())
+
+
+def flank(array, size):
+    """Return the upstream and downstream flanking regions of the given size of every region, as
+    GenomicRegionSet.flank does: one after the other, named "upstream" and "downstream", keeping only the data."""
+    n = len(array)
+    zeros = numpy.zeros(n, dtype=numpy.int8)
+    upstream = GenomicRegionArray(chroms=array.chroms, initials=numpy.maximum(array.initials - size, 0),
+                                  finals=array.initials, names=numpy.full(n, "upstream", dtype=object),
+                                  orientations=zeros, data=array.data)
+    downstream = GenomicRegionArray(chroms=array.chroms, initials=numpy.maximum(array.finals, 0),
+                                    finals=array.finals + size, names=numpy.full(n, "downstream", dtype=object),
+                                    orientations=zeros, data=array.data)
+    return _interleave(upstream, downstream)
+
+
+def relocate(array, center):
+    """Return a GenomicRegionArray with the zero-length region at the given center of every region, see
+    GenomicRegionSet.relocate_regions. With center "bothends", both ends of a region follow each other."""
+    minus = array.orientations == ORIENTATIONS.code("-")
+    if center == "midpoint":
+        positions = (array.initials + array.finals) // 2
+    elif center == "leftend":
+        positions = array.initials
+    elif center == "rightend":
+        positions = array.finals
+    elif center == "downstream":
+        positions = numpy.where(minus, array.initials, array.finals)
+    elif center == "upstream":
+        positions = numpy.where(minus, array.finals, array.initials)
+    elif center == "bothends":
+        return _interleave(array.replace(finals=array.initials), array.replace(initials=array.finals))
+    else:
+        raise ValueError("Unknown center: " + str(center))
+    return array.replace(initials=positions, finals=positions)
+
+
+def chrom_blocks(array):
+    """Return the chromosome codes and the bounds [lo, hi) of the chromosome blocks of a sorted array."""
+    bounds = numpy.flatnonzero(numpy.diff(array.chroms)) + 1
+    lo = numpy.concatenate([[0], bounds]) if len(array) > 0 else bounds
+    hi = numpy.concatenate([bounds, [len(array)]]) if len(array) > 0 else bounds
+    return array.chroms[lo].tolist(), lo.tolist(), hi.tolist()
+
+
+def _concatenate(parts, offsets, shifts):
+    """Concatenate the results of map_chroms, shifting the indices by the offsets of their chromosomes."""
+    first = parts[0]
+    if isinstance(first, tuple):
+        return tuple(_concatenate([p[i] for p in parts], offsets, shifts[i] if shifts else None)
+                     for i in range(len(first)))
+    if isinstance(first, GenomicRegionArray):
+        return GenomicRegionArray.concatenate(parts)
+    if shifts is not None:
+        column = ("a", "b").index(shifts)
+        parts = [p + offsets[i][column] for i, p in enumerate(parts)]
+    return numpy.concatenate(parts)
+
+
+def map_chroms(function, a, b=None, n_jobs=1, offsets=None):
+    """Compute function(a, b) (or function(a) if b is None) chromosome by chromosome with a pool of n_jobs threads.
+
+    a and b must be sorted. The results for the chromosomes of a are put together in the order of a: numpy arrays
+    and GenomicRegionArrays are concatenated, tuples element by element. The C functions of librgt and most numpy
+    kernels release the GIL, so that the chromosomes are processed concurrently.
+
+    *Keyword arguments:*
+
+        - n_jobs -- Number of threads. With 1 (or None), function(a, b) is computed directly; -1 uses one thread
+          per processor.
+        - offsets -- For tuple results, one entry per element: "a" or "b" if the element holds indices into a or b,
+          which are then shifted to index the whole arrays, else None.
+    """
+    if n_jobs == -1:
+        n_jobs = multiprocessing.cpu_count()
+    chroms, lo, hi = chrom_blocks(a)
+    if n_jobs is None or n_jobs <= 1 or len(chroms) < 2:
+        return function(a) if b is None else function(a, b)
+
+    # Ranks are computed once, before the threads use them
+    CHROMOSOMES.ranks()
+    if b is not None:
+        b_blocks = dict((c, (l, h)) for c, l, h in zip(*chrom_blocks(b)))
+    tasks = []
+    for chrom, a_lo, a_hi in zip(chroms, lo, hi):
+        part = a.take(slice(a_lo, a_hi))
+        if b is None:
+            tasks.append(((part,), (a_lo, 0)))
+        else:
+            b_lo, b_hi = b_blocks.get(chrom, (0, 0))
+            tasks.append(((part, b.take(slice(b_lo, b_hi))), (a_lo, b_lo)))
+
+    # The largest chromosomes are started first
+    order = sorted(range(len(tasks)), key=lambda i: -len(tasks[i][0][0]))
+    pool = ThreadPool(min(n_jobs, len(tasks)))
+    try:
+        results = pool.map(lambda i: function(*tasks[i][0]), order, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    parts = [None] * len(tasks)
+    for i, result in zip(order, results):
+        parts[i] = result
+    return _concatenate(parts, [t[1] for t in tasks], offsets)
+
+
+def sorted_chunks(chunks):
+    """Yield the non-empty arrays of a stream of arrays, checking that the stream is sorted as a whole."""
+    last = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        if not chunk.is_sorted() or (last is not None and chunk.region(0) < last):
+            raise ValueError("The regions of the stream are not sorted.")
+        last = chunk.region(len(chunk) - 1)
+        yield chunk
+
+
+def merge_chunks(chunks):
+    """Yield the regions of a sorted stream of arrays merged as by merge, chunk by chunk.
+
+    The last merged region of a chunk may still grow with the regions of the following chunk, so it is held back
+    and merged again together with that chunk.
+    """
+    pending = None
+    for chunk in sorted_chunks(chunks):
+        if pending is not None:
+            chunk = GenomicRegionArray.concatenate([pending, chunk])
+        merged = merge(chunk)
+        if len(merged) > 1:
+            yield merged.take(numpy.arange(len(merged) - 1))
+        pending = merged.take(numpy.arange(len(merged) - 1, len(merged)))
+    if pending is not None:
+        yield pending
+
+
+def _pack_strings(column):
+    """Return an object column of strings (or None) as utf8 bytes separated by newlines and a mask of the Nones."""
+    if column is None:
+        return numpy.empty(0, dtype=numpy.uint8), numpy.empty(0, dtype=bool)
+    missing = numpy.array([v is None for v in column], dtype=bool)
+    text = "\n".join("" if v is None else v for v in column.tolist())
+    return numpy.frombuffer(text.encode("utf8"), dtype=numpy.uint8), missing
+
+
+def _unpack_strings(buf, missing):
+    """Inverse of _pack_strings."""
+    if len(missing) == 0:
+        return None
+    column = numpy.empty(len(missing), dtype=object)
+    column[:] = buf.tobytes().decode("utf8").split("\n")
+    column[missing] = None
+    return column
+
+
+def _cache_key(filename, key):
+    """Return the key of a cache file: format version, reader, size and modification time of the parsed file."""
+    stamp = file_stamp(filename)
+    if stamp is None:
+        raise OSError("No such file: " + filename)
+    return [str(CACHE_VERSION), key, str(stamp[0]), repr(stamp[1])]
+
+
+def save_cache(array, filename, key, path=None):
+    """Store the array in the cache file (filename + CACHE_SUFFIX) of the parsed file filename. Nothing happens if
+    the cache file cannot be written.
+
+    *Keyword arguments:*
+
+        - array -- The regions parsed from filename.
+        - filename -- Path of the parsed file.
+        - key -- Describes how the file was parsed (e.g. the name of the reader); load_cache only returns the array
+          for the same key.
+        - path -- Path of the cache file, if several cache files are kept for filename.
+    """
+    used, chroms = numpy.unique(array.chroms, return_inverse=True)
+    columns = {"key": numpy.array(_cache_key(filename, key)),
+               "chroms": chroms.astype(numpy.int32),
+               "initials": array.initials,
+               "finals": array.finals,
+               "orientations": array.orientations}
+    for column, values in [("chrom", _object_column(CHROMOSOMES.decode(used))),
+                           ("orientation", _object_column(ORIENTATIONS.values)),
+                           ("name", array.names),
+                           ("data", array.data)]:
+        columns[column + "_strings"], columns[column + "_none"] = _pack_strings(values)
+
+    if path is None:
+        path = filename + CACHE_SUFFIX
+    # A temporary file of its own lets several processes and threads write the same cache file at once
+    try:
+        fd, temp = tempfile.mkstemp(suffix=".tmp", prefix=os.path.basename(path) + ".",
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    except (IOError, OSError):
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            numpy.savez(f, **columns)
+        replace_file(temp, path)
+    except (IOError, OSError):
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+
+def load_cache(filename, key, path=None):
+    """Return the array stored by save_cache for the parsed file filename, or None if there is no cache file or the
+    file has been changed since. A cache file which cannot be read (e.g. a truncated one) is removed."""
+    if path is None:
+        path = filename + CACHE_SUFFIX
+    if not os.path.isfile(path):
+        return None
+    try:
+        with numpy.load(path) as columns:
+            if columns["key"].tolist() != _cache_key(filename, key):
+                return None
+            chrom_names = _unpack_strings(columns["chrom_strings"], columns["chrom_none"])
+            chrom_codes = CHROMOSOMES.encode([] if chrom_names is None else chrom_names.tolist())
+            orientation_codes = ORIENTATIONS.encode(
+                _unpack_strings(columns["orientation_strings"], columns["orientation_none"]).tolist(),
+                dtype=numpy.int8)
+            return GenomicRegionArray(chroms=chrom_codes[columns["chroms"]],
+                                      initials=columns["initials"],
+                                      finals=columns["finals"],
+                                      names=_unpack_strings(columns["name_strings"], columns["name_none"]),
+                                      orientations=orientation_codes[columns["orientations"]],
+                                      data=_unpack_strings(columns["data_strings"], columns["data_none"]))
+    except (IOError, OSError, ValueError, KeyError, EOFError, zipfile.BadZipfile):
+        # A broken cache file (e.g. a truncated one) is a cache miss
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
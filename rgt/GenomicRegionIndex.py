@@ -0,0 +1,116 @@
+"""
+GenomicRegionIndex
+===================
+GenomicRegionIndex is a static interval index over the regions of a GenomicRegionSet. Single-region queries
+(overlapping regions, counts, existence) run in O(log n + k) instead of a scan over the whole set.
+
+Per chromosome, the regions are sorted by initial position and split into a few components (augmented interval
+lists): a region which spans more than MAX_COVERAGE of the following regions is moved to the next component. Within
+each component, a running maximum of the final positions bounds the scan of a query to the regions that can
+actually overlap it.
+
+"""
+
+###############################################################################
+# Libraries
+###############################################################################
+
+# Python
+from __future__ import print_function
+import numpy
+
+# Internal
+from .GenomicRegionArray import CHROMOSOMES
+
+###############################################################################
+# Constants
+###############################################################################
+
+MAX_COVERAGE = 20
+MAX_COMPONENTS = 10
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class GenomicRegionIndex:
+    """*Keyword arguments:*
+
+        - array -- GenomicRegionArray with the regions to be indexed. Query results are indices into this array.
+    """
+
+    def __init__(self, array):
+        self.size = len(array)
+        self.chroms = {}
+        if self.size == 0:
+            return
+
+        order = numpy.lexsort((array.finals, array.initials, array.chroms))
+        chroms = array.chroms[order]
+        bounds = numpy.flatnonzero(numpy.diff(chroms)) + 1
+        for lo, hi in zip(numpy.concatenate([[0], bounds]), numpy.concatenate([bounds, [len(order)]])):
+            index = order[lo:hi]
+            self.chroms[CHROMOSOMES.values[chroms[lo]]] = (numpy.sort(index),
+                                                           self._components(array.initials[index],
+                                                                            array.finals[index], index))
+
+    @staticmethod
+    def _components(initials, finals, index):
+        """Split regions sorted by initial position into components with bounded containment."""
+        components = []
+        while len(initials) > 0:
+            if len(components) < MAX_COMPONENTS - 1 and len(initials) > MAX_COVERAGE:
+                covered = numpy.searchsorted(initials, finals, side="left") - numpy.arange(len(initials)) - 1
+                long_regions = covered > MAX_COVERAGE
+            else:
+                long_regions = numpy.zeros(len(initials), dtype=bool)
+            if long_regions.all():
+                long_regions[:] = False
+            keep = ~long_regions
+            components.append((initials[keep], finals[keep], numpy.maximum.accumulate(finals[keep]), index[keep]))
+            initials, finals, index = initials[long_regions], finals[long_regions], index[long_regions]
+        return components
+
+    def __len__(self):
+        return self.size
+
+    def _candidates(self, chrom, initial, final):
+        """Yield, per component, the overlap mask and the indices of the scanned regions."""
+        try:
+            components = self.chroms[chrom][1]
+        except KeyError:
+            return
+        # Zero-length queries cover their position, as in GenomicRegion.overlap
+        if final == initial:
+            final += 1
+        for initials, finals, max_finals, index in components:
+            lo = numpy.searchsorted(max_finals, initial, side="right")
+            hi = numpy.searchsorted(initials, final, side="left")
+            if hi > lo:
+                yield finals[lo:hi] > initial, index[lo:hi]
+
+    def query(self, chrom, initial, final):
+        """Return the sorted indices of the regions overlapping the interval [initial, final) of chrom."""
+        hits = [index[mask] for mask, index in self._candidates(chrom, initial, final)]
+        if not hits:
+            return numpy.empty(0, dtype=numpy.int64)
+        return numpy.sort(numpy.concatenate(hits))
+
+    def count(self, chrom, initial, final):
+        """Return the number of regions overlapping the interval [initial, final) of chrom."""
+        return sum(int(numpy.count_nonzero(mask)) for mask, index in self._candidates(chrom, initial, final))
+
+    def any(self, chrom, initial, final):
+        """Return True if any region overlaps the interval [initial, final) of chrom."""
+        for mask, index in self._candidates(chrom, initial, final):
+            if mask.any():
+                return True
+        return False
+
+    def chrom_indices(self, chrom):
+        """Return the sorted indices of the regions on the given chromosome."""
+        try:
+            return self.chroms[chrom][0]
+        except KeyError:
+            return numpy.empty(0, dtype=numpy.int64)
@@ -12,25 +12,100 @@ GenomicRegionSet represent a list of GenomicRegions.
 # Python
 from __future__ import print_function
 from __future__ import division
+import os
 import sys
+import gzip
+import warnings
+import heapq
 import random
-from ctypes import *
 from scipy import stats
+import copy
 from copy import deepcopy
 from collections import OrderedDict
+from itertools import islice
 import numpy
 
 # Internal
 from .SequenceSet import *
 from .GeneSet import GeneSet
 from .GenomicRegion import GenomicRegion
-from .Util import GenomeData, OverlapType, LibraryPath
-
-# External
-from pysam import Fastafile
+from .GenomicRegionArray import GenomicRegionArray
+from . import GenomicRegionArray as kernels
+from .GenomicRegionIndex import GenomicRegionIndex
+from .GenomicRegionShuffler import GenomicRegionShuffler
+from . import librgt
+from . import ExternalSort
+from .TwoBitGenome import TwoBitGenome
+from .Util import GenomeData, OverlapType, file_stamp
 
 random.seed(42)
 
+# Number of lines parsed at a time when a whole file is read, which bounds the memory of the parser
+READ_CHUNK_SIZE = 200000
+
+# Whitespace characters which GRSFileIO.Bed.parse_columns leaves to the line-by-line parser
+IRREGULAR_BYTES = numpy.zeros(256, dtype=bool)
+IRREGULAR_BYTES[[ord(" "), ord("\r"), ord("\v"), ord("\f")]] = True
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def open_text(filename):
+    """Open a plain, gzip or bgzip compressed text file for reading."""
+    with open(filename, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(filename, "rt")
+    return open(filename)
+
+
+def shared_strings(values):
+    """Return the list of strings with equal strings replaced by one shared object, e.g. the motif names or scores
+    of a column, so that the regions built from the column do not hold a copy each."""
+    shared = {}
+    return [shared.setdefault(v, v) for v in values]
+
+
+# Gene indices of gene_index by (gene regions file, promoter length)
+_GENE_INDICES = {}
+
+
+def gene_index(organism, promoter_length=1000):
+    """Return the genes of the organism extended by their promoters (upstream, as extend_upstream does) as sorted
+    GenomicRegionArray, together with a list of their upper-case names.
+
+    The index is built once per process and stored in a cache file next to the gene regions file of the organism
+    (under ~/rgtdata), one per promoter length; it is rebuilt when the gene regions file changes.
+    """
+    filename = GenomeData(organism).get_gene_regions()
+    stamp = file_stamp(filename)
+    cached = _GENE_INDICES.get((filename, promoter_length))
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
+
+    key = "genes_promoter" + str(promoter_length)
+    path = filename + "." + key + kernels.CACHE_SUFFIX
+    genes = kernels.load_cache(filename, key, path=path)
+    if genes is None:
+        genes = GenomicRegionArray.concatenate(list(GRSFileIO.Bed.iter_chunks(filename, READ_CHUNK_SIZE)))
+        genes = genes.take(genes.sort_order())
+        genes = kernels.extend_stranded(genes, promoter_length, 0)
+        genes = genes.take(genes.sort_order())
+        kernels.save_cache(genes, filename, key, path=path)
+    names = genes.names.tolist() if genes.names is not None else [None] * len(genes)
+    upper_names = [n.upper() if n else n for n in names]
+    _GENE_INDICES[(filename, promoter_length)] = (stamp, genes, upper_names)
+    return genes, upper_names
+
+
+def _covered_fraction(array, owner, lengths, min_fraction):
+    """Return a boolean mask of the regions of the array whose pieces (owner, lengths) cover at least min_fraction
+    of them."""
+    covered = numpy.bincount(owner, weights=lengths, minlength=len(array))
+    return covered >= min_fraction * array.lengths()
+
 
 ###############################################################################
 # Class
@@ -49,45 +124,144 @@ class GRSFileIO:
 
         @staticmethod
         def read_to_grs(grs, filename):
-            with open(filename) as f:
-                error_line = 0  # Count error line
-                for line in f:
-                    line = line.strip("\n")
-                    line = line.split()
-                    try:
-                        name, orientation, data = None, None, None
-                        size = len(line)
-                        chrom = line[0]
-                        start, end = int(line[1]), int(line[2])
+            grs.load_array(GenomicRegionArray.concatenate(
+                [grs.as_array()] + list(GRSFileIO.Bed.iter_chunks(filename, READ_CHUNK_SIZE))))
+            grs.sort()
 
-                        if start > end:
-                            start, end = end, start
-                        if size > 3:
-                            name = line[3]
+            return grs
 
-                        if size > 5:
-                            orientation = line[5]
-                            data = "\t".join([line[4]] + line[6:])
-                        if size == 5:
-                            data = line[4]
+        @staticmethod
+        def iter_chunks(filename, chunk_size=None):
+            """Yield the regions of the file, in file order, as GenomicRegionArrays with the regions of at most
+            chunk_size lines (all lines at once if chunk_size is None)."""
+            error_line = 0  # Count error line
+            with open_text(filename) as f:
+                while True:
+                    lines = list(islice(f, chunk_size))
+                    if not lines:
+                        break
+                    # The track information is skipped silently, like the first error lines below
+                    header = 0
+                    while header < len(lines) and error_line + header < 2 and \
+                            lines[header].startswith(("track", "browser", "#")):
+                        header += 1
+                    array = GRSFileIO.Bed.parse_columns(lines[header:])
+                    if array is not None:
+                        error_line += header
+                    else:
+                        array, error_line = GRSFileIO.Bed.parse_lines(lines, filename, error_line)
+                    if len(array) > 0:
+                        yield array
+                    if chunk_size is None:
+                        break
 
-                        if start == end:
-                            raise Exception(
-                                "zero-length region: " + grs.chrom + "," + str(grs.initial) + "," + str(grs.final))
-                        g = GenomicRegion(chrom, start, end, name, orientation, data)
+        @staticmethod
+        def parse_columns(lines):
+            """Parse BED lines column by column, without looking at every line in Python.
+
+            Only regular lines are accepted: the same number (at least 3) of tab-separated fields in every line, no
+            other whitespace, no empty lines and no zero-length regions. Return None for any other input, which then
+            has to be parsed by parse_lines.
+            """
+            if not lines:
+                return kernels.empty_array()
+            text = "".join(lines)
+            n = lines[0].count("\t") + 1
+            if n < 3:
+                return None
+            buf = numpy.frombuffer(text.encode("utf8"), dtype=numpy.uint8)
+            tabs = buf == ord("\t")
+            ends = buf == ord("\n")
+            separators = tabs | ends
+            if separators[0] or numpy.any(separators[1:] & separators[:-1]) or numpy.any(IRREGULAR_BYTES[buf]):
+                return None
+            # Every line must have the same number of tabs
+            tabs = numpy.flatnonzero(tabs)
+            ends = numpy.flatnonzero(ends)
+            if len(ends) < len(lines):
+                ends = numpy.append(ends, len(buf))
+            if len(tabs) != (n - 1) * len(lines) or \
+                    numpy.any(numpy.diff(numpy.searchsorted(tabs, ends)) != n - 1):
+                return None
+
+            tokens = text.split()
+            columns = [tokens[k::n] for k in range(n)]
+            initials = GRSFileIO.Bed.parse_positions(columns[1])
+            finals = GRSFileIO.Bed.parse_positions(columns[2])
+            if initials is None or finals is None or numpy.any(initials == finals):
+                return None
+            initials, finals = numpy.minimum(initials, finals), numpy.maximum(initials, finals)
+
+            names, orientations, data = None, None, None
+            if n > 3:
+                names = shared_strings(columns[3])
+            if n > 5:
+                orientations = columns[5]
+                data = shared_strings(columns[4] if n == 6 else list(map("\t".join, zip(columns[4], *columns[6:]))))
+            if n == 5:
+                data = shared_strings(columns[4])
+            return GenomicRegionArray.from_columns(columns[0], initials, finals, names=names,
+                                                   orientations=orientations, data=data)
 
-                        grs.add(g)
-                    except:
-                        if not line:
-                            continue
-                        else:
-                            error_line += 1
-                            if error_line > 2:
-                                # Skip the first error line which contains the track information
-                                print("Error at line", line, filename)
-                grs.sort()
+        @staticmethod
+        def parse_positions(column):
+            """Return a list of integers given as strings as numpy array, or None if any of them is invalid."""
+            try:
+                with warnings.catch_warnings():
+                    # Depending on the version, numpy warns or raises an error if it stops at an invalid value
+                    warnings.simplefilter("ignore")
+                    positions = numpy.fromstring(" ".join(column), dtype=numpy.int64, sep=" ")
+            except ValueError:
+                return None
+            if len(positions) != len(column):
+                return None
+            return positions
 
-            return grs
+        @staticmethod
+        def parse_lines(lines, filename, error_line=0):
+            """Parse BED lines one by one. Return the regions and the updated count of error lines."""
+            chroms, initials, finals, names, orientations, data_list = [], [], [], [], [], []
+            for line in lines:
+                line = line.strip("\n")
+                line = line.split()
+                try:
+                    name, orientation, data = None, None, None
+                    size = len(line)
+                    chrom = line[0]
+                    start, end = int(line[1]), int(line[2])
+
+                    if start > end:
+                        start, end = end, start
+                    if size > 3:
+                        name = line[3]
+
+                    if size > 5:
+                        orientation = line[5]
+                        data = "\t".join([line[4]] + line[6:])
+                    if size == 5:
+                        data = line[4]
+
+                    if start == end:
+                        raise Exception("zero-length region: " + chrom + "," + str(start) + "," + str(end))
+                except:
+                    if not line:
+                        continue
+                    else:
+                        error_line += 1
+                        if error_line > 2:
+                            # Skip the first error line which contains the track information
+                            print("Error at line", line, filename)
+                    continue
+
+                chroms.append(chrom)
+                initials.append(start)
+                finals.append(end)
+                names.append(name)
+                orientations.append(orientation)
+                data_list.append(data)
+
+            return GenomicRegionArray.from_columns(chroms, initials, finals, names=names, orientations=orientations,
+                                                   data=data_list), error_line
 
         @staticmethod
         def write_from_grs(grs, filename, mode="w"):
@@ -95,6 +269,12 @@ class GRSFileIO:
                 for gr in grs:
                     print(gr, file=f)
 
+        @staticmethod
+        def sort_file(filename, output, chunk_size=500000, temp_dir=None):
+            """Sort the lines of the file by position into output with bounded memory, see ExternalSort."""
+            with open_text(filename) as f:
+                ExternalSort.sort_file(f, output, chunk_size=chunk_size, temp_dir=temp_dir)
+
     class Bed12:
         """
         Bed file with "block information", eg exons.
@@ -102,7 +282,18 @@ class GRSFileIO:
 
         @staticmethod
         def read_to_grs(grs, filename):
-            with open(filename) as f:
+            grs.load_array(GenomicRegionArray.concatenate(
+                [grs.as_array()] + list(GRSFileIO.Bed12.iter_chunks(filename, READ_CHUNK_SIZE))))
+            grs.sort()
+
+            return grs
+
+        @staticmethod
+        def iter_chunks(filename, chunk_size=None):
+            """Yield the regions (blocks) of the file, in file order, as GenomicRegionArrays of about chunk_size
+            regions (all regions at once if chunk_size is None)."""
+            regions = []
+            with open_text(filename) as f:
                 error_line = 0  # Count error line
                 for line in f:
                     line = line.strip("\n")
@@ -125,16 +316,13 @@ class GRSFileIO:
                             data = line[4]
 
                         if start == end:
-                            raise Exception(
-                                "zero-length region: " + grs.chrom + "," + str(grs.initial) + "," + str(grs.final))
+                            raise Exception("zero-length region: " + chrom + "," + str(start) + "," + str(end))
                         g = GenomicRegion(chrom, start, end, name, orientation, data)
 
                         if size == 12 and int(line[6]) and int(line[7]) and int(line[9]):
-                            gs = g.extract_blocks()
-                            for gg in gs:
-                                grs.add(gg)
+                            regions.extend(g.extract_blocks())
                         else:
-                            grs.add(g)
+                            regions.append(g)
                     except:
                         if not line:
                             continue
@@ -143,9 +331,13 @@ class GRSFileIO:
                             if error_line > 2:
                                 # Skip the first error line which contains the track information
                                 print("Error at line", line, filename)
-                grs.sort()
 
-            return grs
+                    if chunk_size is not None and len(regions) >= chunk_size:
+                        yield GenomicRegionArray.from_regions(regions)
+                        regions = []
+
+            if regions:
+                yield GenomicRegionArray.from_regions(regions)
 
         @staticmethod
         def write_from_grs(grs, filename, mode="w"):
@@ -191,7 +383,18 @@ class GRSFileIO:
 
         @staticmethod
         def read_to_grs(grs, filename):
-            with open(filename) as f:
+            grs.load_array(GenomicRegionArray.concatenate(
+                [grs.as_array()] + list(GRSFileIO.BedGraph.iter_chunks(filename, READ_CHUNK_SIZE))))
+            grs.sort()
+
+            return grs
+
+        @staticmethod
+        def iter_chunks(filename, chunk_size=None):
+            """Yield the regions of the file, in file order, as GenomicRegionArrays of at most chunk_size regions
+            (all regions at once if chunk_size is None)."""
+            chroms, initials, finals, data_list = [], [], [], []
+            with open_text(filename) as f:
                 for line in f:
                     try:
                         line = line.strip("\n")
@@ -199,34 +402,47 @@ class GRSFileIO:
                         assert len(line) == 4
 
                         chrom, start, end, data = line[0], int(line[1]), int(line[2]), str(line[3])
-
-                        grs.add(GenomicRegion(chrom=chrom, initial=start, final=end, data=data))
                     except:
                         print("Error at line", line, filename)
+                        continue
 
-                grs.sort()
+                    chroms.append(chrom)
+                    initials.append(start)
+                    finals.append(end)
+                    data_list.append(data)
 
-            return grs
+                    if len(chroms) == chunk_size:
+                        yield GenomicRegionArray.from_columns(chroms, initials, finals, data=data_list)
+                        chroms, initials, finals, data_list = [], [], [], []
+
+            if chroms:
+                yield GenomicRegionArray.from_columns(chroms, initials, finals, data=data_list)
 
         @staticmethod
         def write_from_grs(grs, filename, mode="w"):
             raise NotImplementedError
 
+        @staticmethod
+        def sort_file(filename, output, chunk_size=500000, temp_dir=None):
+            """Sort the lines of the file by position into output with bounded memory, see ExternalSort."""
+            with open_text(filename) as f:
+                ExternalSort.sort_file(f, output, chunk_size=chunk_size, temp_dir=temp_dir)
+
     class Fasta:
         # FIXME: this one is a bit strange. It's based on the assumption that the GRS has already been
         # populated with GenomicRegions, and then it adds the corresponding DNA sequence to each of those.
 
         @staticmethod
         def read_to_grs(grs, filename):
-            fasta = Fastafile(filename)
+            regions = list(grs)
+            sequences = TwoBitGenome.load(filename).fetch_many(regions, skip_invalid=True)
 
-            for r in grs:
-                try:
-                    seq = str(fasta.fetch(r.chrom, r.initial, r.final))
-                    strand = r.orientation if r.orientation else "+"
-                    r.sequence = Sequence(seq=seq, name=str(r), strand=strand)
-                except:
+            for r, seq in zip(regions, sequences):
+                if seq is None:
                     print("Warning: region '%s' is skipped" % r)
+                    continue
+                strand = r.orientation if r.orientation else "+"
+                r.sequence = Sequence(seq=seq, name=str(r), strand=strand)
 
         @staticmethod
         def write_from_grs(grs, filename, mode="w"):
@@ -243,19 +459,244 @@ class GenomicRegionSet:
     """*Keyword arguments:*
 
         - name -- Name of the GenomicRegionSet
+
+    The regions are either stored as a list of GenomicRegion objects or column-wise as a GenomicRegionArray. Set
+    operations produce column-wise results; the GenomicRegion objects are only built when the regions are iterated,
+    indexed or accessed through the sequences attribute.
     """
 
     def __init__(self, name):
         self.name = name
-        self.sequences = []
+        self._sequences = []
+        self._array = None
+        self._index = None
+        self._merged = None
         self.sorted = False
 
-    def read(self, filename, io=GRSFileIO.Bed):
-        io.read_to_grs(self, filename)
+    @property
+    def sequences(self):
+        """List of GenomicRegions. Column-wise stored regions are converted into GenomicRegion objects."""
+        if self._sequences is None:
+            self._sequences = self._array.regions()
+            # The index of the array stays valid for the same regions as objects
+            if self._index is not None and self._index[0] is self._array:
+                self._index = (self._sequences, len(self._sequences), self._index[2])
+            self._array = None
+        return self._sequences
+
+    @sequences.setter
+    def sequences(self, regions):
+        self._sequences = regions
+        self._array = None
+        self._index = None
+        self._merged = None
+
+    def as_array(self):
+        """Return the regions as a GenomicRegionArray, without building GenomicRegion objects."""
+        if self._sequences is None:
+            return self._array
+        return GenomicRegionArray.from_regions(self._sequences)
+
+    def load_array(self, array, sorted=False):
+        """Replace the regions by the ones of the given GenomicRegionArray.
+
+        *Keyword arguments:*
+
+            - array -- A GenomicRegionArray.
+            - sorted -- Whether the regions in array are sorted.
+        """
+        self._array = array
+        self._sequences = None
+        self._index = None
+        self._merged = None
+        self.sorted = sorted
+
+    def merged_array(self, n_jobs=1):
+        """Return the regions sorted and merged as a GenomicRegionArray. The set is sorted in place if necessary.
+
+        For column-wise stored regions, the merged regions are kept until the regions are replaced, so that repeated
+        operations on the same set merge it only once.
+
+        *Keyword arguments:*
+
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
+        """
+        if not self.sorted: self.sort()
+        if self._sequences is not None:
+            return kernels.map_chroms(kernels.merge, self.as_array(), n_jobs=n_jobs)
+        if self._merged is None or self._merged[0] is not self._array:
+            self._merged = (self._array, kernels.map_chroms(kernels.merge, self._array, n_jobs=n_jobs))
+        return self._merged[1]
+
+    def _copy(self, name=None):
+        """Return a new GenomicRegionSet with the regions of self.
+
+        The copy shares the column-wise regions of self (copy on write): its GenomicRegion objects are built when
+        they are accessed and never alias the ones of self. GenomicRegion objects of self are copied (keeping their
+        class and attributes).
+        """
+        z = GenomicRegionSet(self.name if name is None else name)
+        if self._sequences is None:
+            z.load_array(self._array, sorted=self.sorted)
+        else:
+            z.sequences = [copy.copy(r) for r in self._sequences]
+            z.sorted = self.sorted
+        return z
+
+    def index(self):
+        """Return the GenomicRegionIndex of the regions, for fast single-region queries.
+
+        The index is built on first use and kept until the set is changed by add, sort, merge, by replacing its
+        regions or by adding or removing GenomicRegions of the sequences list directly (e.g. with += or del). It is
+        kept with the list (or array) it was built from and its length. Changing the coordinates of the GenomicRegion
+        objects directly, or replacing them within the list, does not update it.
+        """
+        regions = self._array if self._sequences is None else self._sequences
+        if self._index is None or self._index[0] is not regions or self._index[1] != len(regions):
+            self._index = (regions, len(regions), GenomicRegionIndex(self.as_array()))
+        return self._index[2]
+
+    def _subset(self, index, name=None):
+        """Return a new GenomicRegionSet containing the regions of self at the given (increasing) indices."""
+        z = GenomicRegionSet(self.name if name is None else name)
+        if self._sequences is None:
+            z.load_array(self._array.take(index), sorted=self.sorted)
+        else:
+            z.sequences = [self._sequences[i] for i in index.tolist()]
+            z.sorted = self.sorted
+        return z
+
+    def read(self, filename, io=GRSFileIO.Bed, cache=False):
+        """Read the regions of a file and add them to the GenomicRegionSet.
+
+        *Keyword arguments:*
+
+            - filename -- Path of the file.
+            - io -- GRSFileIO class of the file format.
+            - cache -- Store the parsed and sorted regions in a cache file next to the file (filename + ".rgtidx")
+              and load them from there the next time, as long as the file is unchanged. Only for GRSFileIO.Bed,
+              GRSFileIO.Bed12 and GRSFileIO.BedGraph.
+        """
+        if not cache:
+            io.read_to_grs(self, filename)
+            return
+
+        array = kernels.load_cache(filename, io.__name__)
+        if array is None:
+            array = GenomicRegionArray.concatenate(list(io.iter_chunks(filename, READ_CHUNK_SIZE)))
+            array = array.take(array.sort_order())
+            kernels.save_cache(array, filename, io.__name__)
+        if len(self) == 0:
+            self.load_array(array, sorted=True)
+        else:
+            self.load_array(GenomicRegionArray.concatenate([self.as_array(), array]))
+            self.sort()
 
     def write(self, filename, mode="w", io=GRSFileIO.Bed):
         io.write_from_grs(self, filename, mode)
 
+    @staticmethod
+    def iter_file(filename, io=GRSFileIO.Bed, chunk_size=100000, as_regions=False):
+        """Read a plain, gzip or bgzip compressed file chunk by chunk, without building a GenomicRegionSet.
+
+        *Keyword arguments:*
+
+            - filename -- Path of the file.
+            - io -- GRSFileIO.Bed, GRSFileIO.Bed12 or GRSFileIO.BedGraph.
+            - chunk_size -- Number of regions per chunk.
+            - as_regions -- Yield single GenomicRegions instead of chunks.
+
+        *Return:*
+
+            - A generator of GenomicRegionArrays (or GenomicRegions), in file order. If the file is sorted, the chunks
+              can be passed to iter_merged, iter_intersect and counts_per_region_stream.
+        """
+        for chunk in io.iter_chunks(filename, chunk_size):
+            if as_regions:
+                for region in chunk.regions():
+                    yield region
+            else:
+                yield chunk
+
+    @staticmethod
+    def sort_file(filename, output, io=GRSFileIO.Bed, chunk_size=500000, temp_dir=None):
+        """Sort a file by position without loading it, e.g. to stream it afterwards with iter_file.
+
+        The lines are sorted in chunks of chunk_size lines, which are written to temporary files and merged. All
+        columns are kept as they are; header lines come first.
+
+        *Keyword arguments:*
+
+            - filename -- Path of the plain, gzip or bgzip compressed input file.
+            - output -- Path of the sorted (plain) output file. It must differ from filename.
+            - io -- GRSFileIO.Bed or GRSFileIO.BedGraph.
+            - chunk_size -- Number of lines sorted in memory at a time.
+            - temp_dir -- Directory of the temporary files (default: the directory of output).
+        """
+        io.sort_file(filename, output, chunk_size=chunk_size, temp_dir=temp_dir)
+
+    @staticmethod
+    def iter_merged(chunks):
+        """Merge a sorted stream of GenomicRegionArrays (e.g. from iter_file) as merge() does.
+
+        *Return:*
+
+            - A generator of GenomicRegionArrays with the merged regions, in order.
+        """
+        return kernels.merge_chunks(chunks)
+
+    def iter_intersect(self, chunks, mode=OverlapType.OVERLAP):
+        """Intersect a sorted stream of GenomicRegionArrays (e.g. from iter_file) with this GenomicRegionSet.
+
+        The result is the same as streamed_set.intersect(self, mode), but only one chunk of the stream is in memory
+        at a time.
+
+        *Keyword arguments:*
+
+            - chunks -- The sorted stream of GenomicRegionArrays.
+            - mode -- OverlapType.OVERLAP, OverlapType.ORIGINAL or OverlapType.COMP_INCL.
+
+        *Return:*
+
+            - A generator of GenomicRegionArrays with the resulting regions, in order.
+        """
+        if len(self) == 0:
+            return
+        if not self.sorted: self.sort()
+        sweeps = librgt if librgt.library() is not None else kernels
+
+        if mode == OverlapType.OVERLAP:
+            y = self.merged_array()
+            for chunk in kernels.merge_chunks(chunks):
+                owner, initials, finals = sweeps.intersect_overlap(chunk, y)
+                yield chunk.take(owner).replace(initials=initials, finals=finals)
+        else:
+            y = self.as_array()
+            for chunk in kernels.sorted_chunks(chunks):
+                if mode == OverlapType.ORIGINAL:
+                    yield chunk.take(sweeps.overlap_mask(chunk, y))
+                elif mode == OverlapType.COMP_INCL:
+                    yield chunk.take(sweeps.inclusion_mask(chunk, y))
+
+    def counts_per_region_stream(self, chunks):
+        """Return a numpy array of counting numbers of the regions of a stream of GenomicRegionArrays (e.g. from
+        iter_file), as counts_per_region does for a GenomicRegionSet. The stream does not need to be sorted.
+
+        *Keyword arguments:*
+
+            - chunks -- The stream of GenomicRegionArrays.
+        """
+        if len(self) == 0: return None
+
+        if not self.sorted: self.sort()
+        # The regions of self are converted once, not once per chunk
+        regions = self.as_array()
+        counts = numpy.zeros(len(self), dtype=numpy.int64)
+        for chunk in chunks:
+            if len(chunk) > 0:
+                counts += kernels.count_overlaps(regions, chunk.take(chunk.sort_order()))
+        return counts
+
     def get_chrom(self):
         """Return all chromosomes."""
         return [r.chrom for r in self]
@@ -277,10 +718,13 @@ class GenomicRegionSet:
             - region -- The GenomicRegion to be added.
         """
         self.sequences.append(region)
+        self._index = None
         self.sorted = False
 
     def __len__(self):
-        return len(self.sequences)
+        if self._sequences is None:
+            return len(self._array)
+        return len(self._sequences)
 
     def __iter__(self):
         return iter(self.sequences)
@@ -295,29 +739,36 @@ class GenomicRegionSet:
 
             - percentage -- input value of left and right can be any positive value or negative value larger than -50 %
         """
-        z = GenomicRegionSet(name=self.name)
-
+        array = self.as_array()
         if percentage:
             if percentage > -50:
-                for s in self:
-                    if w_return:
-                        z.add(s.extend(int(len(s) * left / 100), int(len(s) * right / 100), w_return=True))
-                    else:
-                        s.extend(int(len(s) * left / 100), int(len(s) * right / 100))
+                lengths = array.lengths()
+                left = (lengths * left / 100).astype(numpy.int64)
+                right = (lengths * right / 100).astype(numpy.int64)
             else:
                 print("Percentage for extension must be larger than 50%%.")
                 sys.exit(0)
-        else:
-            for s in self:
-                if w_return:
-                    z.add(s.extend(left, right, w_return=True))
-                else:
-                    s.extend(left, right)
+        return self._load_extended(kernels.extend(array, left, right), w_return)
 
+    def _load_extended(self, array, w_return):
+        """Return the extended regions as a new GenomicRegionSet or replace the regions of self by them.
+
+        GenomicRegion objects of self are extended in place, so they keep their class and attributes.
+        """
+        sorted = self.sorted and array.is_sorted()
         if w_return:
+            z = GenomicRegionSet(name=self.name)
+            z.load_array(array, sorted=sorted)
             return z
+        elif self._sequences is None:
+            self.load_array(array, sorted=sorted)
         else:
-            return
+            for region, initial, final in zip(self._sequences, array.initials.tolist(), array.finals.tolist()):
+                region.initial = initial
+                region.final = final
+            self._index = None
+            self._merged = None
+            self.sorted = sorted
 
     def extend_upstream(self, length=1000, w_return=False):
         """Perform extend step upstream for every element.
@@ -326,22 +777,7 @@ class GenomicRegionSet:
 
             - length -- Extending length
         """
-        z = GenomicRegionSet(name=self.name)
-        for s in self:
-            if w_return:
-                if s.orientation == "+":
-                    z.add(s.extend(left=length, right=0, w_return=True))
-                else:
-                    z.add(s.extend(left=0, right=length, w_return=True))
-            else:
-                if s.orientation == "+":
-                    s.extend(left=length, right=0)
-                else:
-                    s.extend(left=0, right=length)
-        if w_return:
-            return z
-        else:
-            return
+        return self._load_extended(kernels.extend_stranded(self.as_array(), length, 0), w_return)
 
     def extend_downstream(self, length=1000, w_return=False):
         """Perform extend step downstream for every element.
@@ -350,22 +786,7 @@ class GenomicRegionSet:
 
             - length -- Extending length
         """
-        z = GenomicRegionSet(name=self.name)
-        for s in self:
-            if w_return:
-                if s.orientation == "+":
-                    z.add(s.extend(left=0, right=length, w_return=True))
-                else:
-                    z.add(s.extend(left=length, right=0, w_return=True))
-            else:
-                if s.orientation == "+":
-                    s.extend(left=0, right=length)
-                else:
-                    s.extend(left=length, right=0)
-        if w_return:
-            return z
-        else:
-            return
+        return self._load_extended(kernels.extend_stranded(self.as_array(), 0, length), w_return)
 
     def sort(self, key=None, reverse=False):
         """Sort Elements by criteria defined by a GenomicRegion.
@@ -375,10 +796,16 @@ class GenomicRegionSet:
             - key -- given the key for comparison.
             - reverse -- reverse the sorting result.
         """
+        self._index = None
         if key:
             self.sequences.sort(key=key, reverse=reverse)
+            self.sorted = False
+        elif self._sequences is None:
+            if not self._array.is_sorted():
+                self._array = self._array.take(self._array.sort_order())
+            self.sorted = True
         else:
-            self.sequences.sort(cmp=GenomicRegion.__cmp__)
+            self._sequences.sort(key=lambda r: (r.chrom, r.initial, r.final))
             self.sorted = True
 
     def get_sequences(self, genome_fasta, ex=0):
@@ -418,21 +845,27 @@ class GenomicRegionSet:
         return a, b
 
     def gene_association(self, organism, gene_set=None, promoter_length=1000,
-                         thresh_dist=100000, show_dis=False, strand_specific=False):
+                         thresh_dist=100000, show_dis=False, strand_specific=False, n_jobs=1):
         """Associates coordinates to genes given the following rules:
 
             1. If the peak is inside gene (promoter+coding) then this peak is associated with that gene.
-            2. If a peak is inside overlapping genes, then the peak is annotated with both genes.
-            3. If peak is between two genes (not overlapping neither), then both genes are annotated.
-            4. If the distance between peak and gene is greater than a threshold distance, then it is not annotated.
+            2. If a peak is inside overlapping genes, then the peak is annotated with all these genes.
+            3. If peak is between two genes (not overlapping neither), then both genes are annotated: the gene whose
+               end is closest before the peak and the gene whose start is closest after it.
+            4. If the distance between peak and gene is not smaller than a threshold distance, then it is not
+               annotated.
+
+        Every peak is associated on its own, regardless of the other peaks of the set.
 
         *Keyword arguments:*
 
             - gene_set -- List of gene names as a GeneSet object. If None, then consider all genes to be enriched. (default None)
             - organism -- Organism in order to fetch genomic data. (default hg19)
             - promoter_length -- Length of the promoter region. (default 1000)
-            - thresh_dist -- Threshold maximum distance for a coordinate to be considered associated with a gene. (default 50000)
+            - thresh_dist -- Threshold maximum distance for a coordinate to be considered associated with a gene. (default 100000)
             - show_dis -- Show distance to the closest genes in parentheses.
+            - strand_specific -- Only associate genes with the orientation of the coordinate.
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
 
         *Return:*
 
@@ -449,146 +882,46 @@ class GenomicRegionSet:
             return self
 
         else:
-            # If there is overlap within self or y, they should be merged first.
             if not self.sorted: self.sort()
 
-            genome = GenomeData(organism)
-
-            genes = GenomicRegionSet("genes")
-            genes.read(genome.get_gene_regions())
-
+            targets, upper_names = gene_index(organism, promoter_length)
             if gene_set:
-                new_genes = GenomicRegionSet("genes")
-                name_list = [g.upper() for g in gene_set.genes]
-                for g in genes:
-                    if g.name.upper() in name_list: new_genes.add(g)
-                genes = new_genes
-            genes.extend_upstream(length=promoter_length)
-
-            if not genes.sorted: genes.sort()
-
-            last_j = len(genes) - 1
-            j = 0
-            if strand_specific:
-                pre_inter = [0, 0]
-            else:
-                pre_inter = 0
-
-            for s in self:
-                cont_loop = True
-                cont_overlap = False
-                asso_names = {"overlap": [], "close_l": [], "close_r": []}
+                name_set = set(g.upper() for g in gene_set.genes)
+                targets = targets.take(numpy.fromiter((n in name_set for n in upper_names), dtype=bool,
+                                                      count=len(targets)))
+
+            regions = self.as_array()
+            query, target, distance = kernels.map_chroms(
+                lambda a, b: kernels.nearest(a, b, top_n=None, max_distance=thresh_dist - 1,
+                                             strand_specific=strand_specific),
+                regions, targets, n_jobs, offsets=("a", "b", None))
+            gene_names = targets.names.tolist() if targets.names is not None else [None] * len(targets)
+
+            names = ["."] * len(regions)
+            proximity = regions.proximity.tolist() if regions.proximity is not None else [None] * len(regions)
+            bounds = numpy.flatnonzero(numpy.diff(query)) + 1
+            for lo, hi in zip([0] + bounds.tolist(), bounds.tolist() + [len(query)]) if len(query) > 0 else []:
+                q = int(query[lo])
+                overlap = [gene_names[t] for t, d in zip(target[lo:hi].tolist(), distance[lo:hi].tolist()) if d == 0]
+                if overlap:
+                    names[q] = ":".join(overlap)
+                    proximity[q] = 0
+                    continue
 
-                while cont_loop:
-                    if strand_specific and s.orientation != genes[j].orientation:
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
+                # The closest gene before the region, then the one after it
+                close = sorted(zip(distance[lo:hi].tolist(), target[lo:hi].tolist()))
+                ss, dd = [], []
+                for d, t in close:
+                    side = "-" if d < 0 else "+"
+                    if show_dis:
+                        ss.append(gene_names[t] + "(" + side + str(abs(d)) + ")")
                     else:
-                        d = s.distance(genes[j])
-                        if d == 0:
-                            asso_names["overlap"].append(genes[j].name)
-                            if not cont_overlap:
-                                if strand_specific and s.orientation == "+":
-                                    pre_inter[0] = j
-                                elif strand_specific and s.orientation == "-":
-                                    pre_inter[1] = j
-                                elif not strand_specific:
-                                    pre_inter = j
-                            if j == last_j:
-                                cont_loop = False
-                            else:
-                                j += 1
-                                cont_overlap = True
-                        elif asso_names["overlap"] and d != 0:
-                            if strand_specific:
-                                if pre_inter[0] > 0 and pre_inter[1] > 0:
-                                    j = min(pre_inter)
-                                elif pre_inter[0] == 0 and pre_inter[1] > 0:
-                                    j = pre_inter[1]
-                                elif pre_inter[0] > 0 and pre_inter[1] == 0:
-                                    j = pre_inter[0]
-                            elif s.chrom == genes[j].chrom and pre_inter > 0:
-                                j = pre_inter
-                            cont_loop = False
-
-                        elif 0 < d < thresh_dist:
-                            if show_dis:
-                                if s > genes[j]:
-                                    if asso_names["close_l"] and d < asso_names["close_l"][0]:
-                                        asso_names["close_l"] = [d, genes[j].name + "(-" + str(d) + ")"]
-                                    else:
-                                        asso_names["close_l"] = [d, genes[j].name + "(-" + str(d) + ")"]
-
-                                elif s < genes[j]:
-                                    asso_names["close_r"] = [d, genes[j].name + "(+" + str(d) + ")"]
-                                    cont_loop = False
-                            else:
-                                if s > genes[j]:
-
-                                    if asso_names["close_l"] and d < asso_names["close_l"][0]:
-                                        asso_names["close_l"] = [d, genes[j].name + "(-)"]
-                                    else:
-                                        asso_names["close_l"] = [d, genes[j].name + "(-)"]
-                                elif s < genes[j]:
-                                    asso_names["close_r"] = [d, genes[j].name + "(+)"]
-                                    cont_loop = False
-                            if j == last_j:
-                                cont_loop = False
-                            else:
-                                j += 1
-
-                        elif s < genes[j]:
-                            if strand_specific and s.orientation == "+":
-                                if s.chrom == genes[j].chrom and pre_inter[0] > 0:
-                                    j = pre_inter[0]
-                            elif strand_specific and s.orientation == "-":
-                                if s.chrom == genes[j].chrom and pre_inter[1] > 0:
-                                    j = pre_inter[1]
-                            elif s.chrom == genes[j].chrom and pre_inter > 0:
-                                j = pre_inter
-                            cont_loop = False
-
-                        elif s > genes[j]:
-                            if j == last_j:
-                                cont_loop = False
-                            else:
-                                j += 1
-
-                if asso_names["overlap"]:
-                    z.add(GenomicRegion(chrom=s.chrom, initial=s.initial, final=s.final,
-                                        orientation=s.orientation, name=":".join(asso_names["overlap"]),
-                                        data=s.data, proximity=0))
-                elif asso_names["close_l"] and asso_names["close_r"]:
-                    ss = [asso_names["close_l"][1],
-                          asso_names["close_r"][1]]
-                    dd = [str(asso_names["close_l"][0]),
-                          str(asso_names["close_r"][0])]
-                    z.add(GenomicRegion(chrom=s.chrom, initial=s.initial, final=s.final,
-                                        orientation=s.orientation, name=":".join(ss),
-                                        data=s.data, proximity=":".join(dd)))
-                elif asso_names["close_l"] and not asso_names["close_r"]:
-                    z.add(GenomicRegion(chrom=s.chrom, initial=s.initial, final=s.final,
-                                        orientation=s.orientation, name=asso_names["close_l"][1],
-                                        data=s.data, proximity=str(asso_names["close_l"][0])))
-                elif not asso_names["close_l"] and asso_names["close_r"]:
-                    z.add(GenomicRegion(chrom=s.chrom, initial=s.initial, final=s.final,
-                                        orientation=s.orientation, name=asso_names["close_r"][1],
-                                        data=s.data, proximity=str(asso_names["close_r"][0])))
-                    # ss = []
-                    # try: ss.append(asso_names["close_l"][1])
-                    # except: pass
-                    # try: ss.append(asso_names["close_r"][1])
-                    # except: pass
-                    # z.add(GenomicRegion(chrom=s.chrom, initial=s.initial, final=s.final,
-                    #                     orientation=s.orientation, name=":".join(ss),
-                    #                     data=s.data, proximity=s.proximity))
-                else:
-                    z.add(GenomicRegion(chrom=s.chrom, initial=s.initial, final=s.final,
-                                        orientation=s.orientation, name=".",
-                                        data=s.data, proximity=s.proximity))
+                        ss.append(gene_names[t] + "(" + side + ")")
+                    dd.append(str(abs(d)))
+                names[q] = ":".join(ss)
+                proximity[q] = ":".join(dd)
 
+            z.load_array(regions.annotate(names=names, proximity=proximity), sorted=True)
             return z
 
     def filter_by_gene_association(self, gene_set=None, organism="hg19", promoter_length=1000, thresh_dist=50000):
@@ -682,7 +1015,8 @@ class GenomicRegionSet:
 
         return all_genes, mapped_genes, all_proxs, mapped_proxs
 
-    def intersect(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False):
+    def intersect(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False, strand_specific=False,
+                  name_specific=False, min_fraction=0, n_jobs=1):
         """Return the overlapping regions with three different modes.
 
         *Keyword arguments:*
@@ -690,6 +1024,12 @@ class GenomicRegionSet:
             - y -- the GenomicRegionSet which to compare with.
             - mode -- OverlapType.OVERLAP, OverlapType.ORIGINAL or OverlapType.COMP_INCL.
             - rm_duplicates -- remove duplicates within the output GenomicRegionSet
+            - strand_specific -- Only intersect regions with the same orientation.
+            - name_specific -- Only intersect regions with the same name.
+            - min_fraction -- Minimum fraction (0~1) of a region of self which has to be covered by y (with
+              OVERLAP, of the merged region). COMP_INCL ignores it.
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor). Strand or name
+              specific intersections are computed in a single sweep.
 
         *Return:*
         
@@ -728,243 +1068,88 @@ class GenomicRegionSet:
                 Result                                ------
         """
 
-        return self.intersect_c(y, mode, rm_duplicates)
+        if librgt.library() is not None:
+            return self.intersect_c(y, mode, rm_duplicates, strand_specific, name_specific, min_fraction, n_jobs)
+        else:
+            return self.intersect_python(y, mode, rm_duplicates, strand_specific, name_specific, min_fraction, n_jobs)
+
+    def intersect_python(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False, strand_specific=False,
+                         name_specific=False, min_fraction=0, n_jobs=1):
+        return self._intersect(y, mode, rm_duplicates, kernels, strand_specific, name_specific, min_fraction, n_jobs)
+
+    def intersect_c(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False, strand_specific=False,
+                    name_specific=False, min_fraction=0, n_jobs=1):
+        return self._intersect(y, mode, rm_duplicates, librgt, strand_specific, name_specific, min_fraction, n_jobs)
 
-    def intersect_python(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False):
+    def _intersect(self, y, mode, rm_duplicates, sweeps, strand_specific=False, name_specific=False, min_fraction=0,
+                   n_jobs=1):
+        """Intersect with the sweep functions of the given module (GenomicRegionArray or librgt)."""
         z = GenomicRegionSet(self.name)
         if len(self) == 0 or len(y) == 0:
             return z
 
         else:
-            # If there is overlap within self or y, they should be merged first.
-            a = copy.deepcopy(self)
-            b = copy.deepcopy(y)
-            if not a.sorted: a.sort()
-            if not b.sorted: b.sort()
-            if mode == OverlapType.OVERLAP:
-                a.merge()
-                b.merge()
-
-            iter_a = iter(a)
-            s = iter_a.next()
-            last_j = len(b) - 1
-            j = 0
-            cont_loop = True
-            pre_inter = 0
-            cont_overlap = False
-            ####################### OverlapType.OVERLAP ###############################
-            if mode == OverlapType.OVERLAP:
-                while cont_loop:
-                    # When the regions overlap
-                    if s.overlap(b[j]):
-                        z.add(GenomicRegion(chrom=s.chrom,
-                                            initial=max(s.initial, b[j].initial),
-                                            final=min(s.final, b[j].final),
-                                            name=s.name,
-                                            orientation=s.orientation,
-                                            data=s.data,
-                                            proximity=s.proximity))
-
-                        if not cont_overlap:
-                            pre_inter = j
-                        if j == last_j:
-                            try:
-                                s = iter_a.next()
-                            except:
-                                cont_loop = False
-                        else:
-                            j += 1
-                        cont_overlap = True
-
-                    elif s < b[j]:
-                        try:
-                            s = iter_a.next()
-                            if s.chrom == b[j].chrom and pre_inter > 0:
-                                j = pre_inter
-                            cont_overlap = False
-                        except:
-                            cont_loop = False
-
-                    elif s > b[j]:
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
-                            cont_overlap = False
-                    else:
-                        try:
-                            s = iter_a.next()
-                        except:
-                            cont_loop = False
-
-            ####################### OverlapType.ORIGINAL ###############################
-            if mode == OverlapType.ORIGINAL:
-                while cont_loop:
-                    # When the regions overlap
-                    if s.overlap(b[j]):
-                        z.add(s)
-                        try:
-                            s = iter_a.next()
-                        except:
-                            cont_loop = False
-                    elif s < b[j]:
-                        try:
-                            s = iter_a.next()
-                        except:
-                            cont_loop = False
-                    elif s > b[j]:
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
-                    else:
-                        try:
-                            s = iter_a.next()
-                        except:
-                            cont_loop = False
-            ####################### OverlapType.COMP_INCL ###############################
-            if mode == OverlapType.COMP_INCL:
-                while cont_loop:
-                    # When the regions overlap
-                    if s.overlap(b[j]):
-                        if s.initial >= b[j].initial and s.final <= b[j].final:
-                            z.add(s)
-                        if not cont_overlap: pre_inter = j
-                        if j == last_j:
-                            try:
-                                s = iter_a.next()
-                            except:
-                                cont_loop = False
-                        else:
-                            j += 1
-                        cont_overlap = True
+            if not self.sorted: self.sort()
+            if not y.sorted: y.sort()
+            a = self.as_array()
+            b = y.as_array()
+
+            if strand_specific or name_specific:
+                z = self._intersect_keyed(y, mode, sweeps, strand_specific, name_specific, min_fraction)
+            elif mode == OverlapType.OVERLAP:
+                # If there is overlap within self or y, they should be merged first.
+                a = self.merged_array()
+                b = y.merged_array()
+                owner, initials, finals = kernels.map_chroms(sweeps.intersect_overlap, a, b, n_jobs,
+                                                             offsets=("a", None, None))
+                if min_fraction:
+                    keep = _covered_fraction(a, owner, finals - initials, min_fraction)[owner]
+                    owner, initials, finals = owner[keep], initials[keep], finals[keep]
+                z.load_array(a.take(owner).replace(initials=initials, finals=finals), sorted=True)
+            elif mode == OverlapType.ORIGINAL:
+                mask = kernels.map_chroms(sweeps.overlap_mask, a, b, n_jobs)
+                if min_fraction:
+                    mask &= kernels.map_chroms(sweeps.covered_lengths, a, b, n_jobs) >= min_fraction * a.lengths()
+                z = self._subset(numpy.flatnonzero(mask))
+            elif mode == OverlapType.COMP_INCL:
+                z = self._subset(numpy.flatnonzero(kernels.map_chroms(sweeps.inclusion_mask, a, b, n_jobs)))
 
-                    elif s < b[j]:
-                        try:
-                            s = iter_a.next()
-                            if s.chrom == b[j].chrom and pre_inter > 0:
-                                j = pre_inter
-                            cont_overlap = False
-                        except:
-                            cont_loop = False
+            if rm_duplicates: z._remove_duplicates()
+            return z
 
-                    elif s > b[j]:
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
-                            cont_overlap = False
-                    else:
-                        try:
-                            s = iter_a.next()
-                        except:
-                            cont_loop = False
+    def _intersect_keyed(self, y, mode, sweeps, strand_specific, name_specific, min_fraction):
+        """Intersect the sorted sets, matching only regions with the same orientation and/or name.
 
-            if rm_duplicates: z.remove_duplicates()
-            # z.sort()
+        Every orientation and name gets its own stretch of a line (see GenomicRegionArray.keyed_line), so that the
+        usual sweeps, in C or in Python, run once over all regions.
+        """
+        a, b = self.as_array(), y.as_array()
+        keys = kernels.region_keys([a, b], strand_specific=strand_specific, name_specific=name_specific)
+        (a_order, b_order), (a_line, b_line), offsets, ranks = kernels.keyed_line([a, b], keys)
+
+        if mode == OverlapType.OVERLAP:
+            a_line, b_line = kernels.merge(a_line, ranks), kernels.merge(b_line, ranks)
+            owner, initials, finals = sweeps.intersect_overlap(a_line, b_line, ranks)
+            if min_fraction:
+                keep = _covered_fraction(a_line, owner, finals - initials, min_fraction)[owner]
+                owner, initials, finals = owner[keep], initials[keep], finals[keep]
+            shift = kernels.line_offsets(offsets, initials)
+            z = GenomicRegionSet(self.name)
+            z.load_array(a_line.take(owner).replace(initials=initials - shift, finals=finals - shift))
+            z.sort()
             return z
 
-    def intersect_c(self, y, mode=OverlapType.OVERLAP, rm_duplicates=False):
-        # Determine path of shared library
-        Lib = LibraryPath()
-        lib = cdll.LoadLibrary(Lib.get_c_rgt())
-        # C-Binding of intersect overlap function
-        intersect_overlap_c = lib.intersectGenomicRegionSetsOverlap
-        intersect_overlap_c.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int, POINTER(c_char_p),
-                                        POINTER(c_int), POINTER(c_int), c_int, POINTER(POINTER(c_int)),
-                                        POINTER(POINTER(c_int)), POINTER(POINTER(c_int)), POINTER(c_int)]
-        intersect_overlap_c.restype = None
-
-        # C-Binding of intersect original function
-        intersect_original_c = lib.intersectGenomicRegionSetsOriginal
-        intersect_original_c.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int, POINTER(c_char_p),
-                                         POINTER(c_int), POINTER(c_int), c_int, POINTER(POINTER(c_int)),
-                                         POINTER(POINTER(c_int)), POINTER(POINTER(c_int)), POINTER(c_int)]
-        intersect_original_c.restype = None
-
-        # C-Binding of intersect completely function
-        intersect_completely_included_c = lib.intersectGenomicRegionSetsCompletelyIncluded
-        intersect_completely_included_c.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int,
-                                                    POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int,
-                                                    POINTER(POINTER(c_int)), POINTER(POINTER(c_int)),
-                                                    POINTER(POINTER(c_int)), POINTER(c_int)]
-        intersect_completely_included_c.restype = None
-
-        # If one of the sets is empty, the intersection is trivially empty as well
-        result = GenomicRegionSet(self.name)
-        if len(self) == 0 or len(y) == 0:
-            return result
-
-        # Otherwise
+        if mode == OverlapType.ORIGINAL:
+            line_mask = sweeps.overlap_mask(a_line, b_line, ranks)
+            if min_fraction:
+                line_mask &= sweeps.covered_lengths(a_line, b_line, ranks) >= min_fraction * a_line.lengths()
+        elif mode == OverlapType.COMP_INCL:
+            line_mask = sweeps.inclusion_mask(a_line, b_line, ranks)
         else:
-            a = self
-            b = y
-            # Sort sets if necessary
-            if not a.sorted:
-                a.sort()
-            if not b.sorted:
-                b.sort()
-            assert a.sorted
-            assert b.sorted
-
-            # If there is overlap within a or b, they should be merged first.
-            if mode == OverlapType.OVERLAP:
-                a = a.merge(w_return=True)
-                b = b.merge(w_return=True)
-
-            # Convert to ctypes
-            len_self = len(a)
-            len_y = len(b)
-            max_len_result = len_self + len_y
-
-            chromosomes_self_python = [gr.chrom for gr in a.sequences]
-            chromosomes_self_c = (c_char_p * len_self)(*chromosomes_self_python)
-
-            chromosomes_y_python = [gr.chrom for gr in b.sequences]
-            chromosomes_y_c = (c_char_p * len_y)(*chromosomes_y_python)
-
-            initials_self_python = [gr.initial for gr in a.sequences]
-            initials_self_c = (c_int * len_self)(*initials_self_python)
-
-            initials_y_python = [gr.initial for gr in b.sequences]
-            initials_y_c = (c_int * len_y)(*initials_y_python)
-
-            finals_self_python = [gr.final for gr in a.sequences]
-            finals_self_c = (c_int * len_self)(*finals_self_python)
-
-            finals_y_python = [gr.final for gr in b.sequences]
-            finals_y_c = (c_int * len_y)(*finals_y_python)
-
-            indices_c = POINTER(c_int)((c_int * max_len_result)())
-            initials_result_c = POINTER(c_int)((c_int * max_len_result)())
-            finals_result_c = POINTER(c_int)((c_int * max_len_result)())
-            size_result_c = c_int()
-
-            # Call C-function
-            if mode == OverlapType.OVERLAP:
-                intersect_overlap_c(chromosomes_self_c, initials_self_c, finals_self_c, len_self, chromosomes_y_c,
-                                    initials_y_c, finals_y_c, len_y, pointer(indices_c), pointer(initials_result_c),
-                                    pointer(finals_result_c), byref(size_result_c))
-            elif mode == OverlapType.ORIGINAL:
-                intersect_original_c(chromosomes_self_c, initials_self_c, finals_self_c, len_self, chromosomes_y_c,
-                                     initials_y_c, finals_y_c, len_y, pointer(indices_c), pointer(initials_result_c),
-                                     pointer(finals_result_c), byref(size_result_c))
-            elif mode == OverlapType.COMP_INCL:
-                intersect_completely_included_c(chromosomes_self_c, initials_self_c, finals_self_c, len_self,
-                                                chromosomes_y_c, initials_y_c, finals_y_c, len_y, pointer(indices_c),
-                                                pointer(initials_result_c), pointer(finals_result_c),
-                                                byref(size_result_c))
-
-            # Construct result set
-            for i in range(size_result_c.value):
-                ci = indices_c[i]
-                result.add(GenomicRegion(chromosomes_self_c[ci], initials_result_c[i],
-                                         finals_result_c[i], name=a.sequences[ci].name,
-                                         orientation=a.sequences[ci].orientation, data=a.sequences[ci].data,
-                                         proximity=a.sequences[ci].proximity))
-            if rm_duplicates:
-                result.remove_duplicates()
-            return result
+            return GenomicRegionSet(self.name)
+        mask = numpy.zeros(len(a), dtype=bool)
+        mask[a_order] = line_mask
+        return self._subset(numpy.flatnonzero(mask))
 
     def intersect_count(self, regionset, mode_count="count", threshold=False):
         """Return the number of regions in regionset A&B in following order: (A-B, B-A, intersection)
@@ -973,7 +1158,8 @@ class GenomicRegionSet:
 
             - regionset -- the GenomicRegionSet which to compare with.
             - mode_count -- count the number of regions or to measure the length of intersection.
-            - threshold -- Define the cutoff of the proportion of the intersecting region (0~50%)
+            - threshold -- Define the cutoff of the proportion of the intersecting region (0~50%): a region only
+              counts as intersecting if at least this percentage of it is covered by the other set.
 
         *Return:*
         
@@ -986,37 +1172,19 @@ class GenomicRegionSet:
             return len(self), 0, 0
 
         else:
-            a = deepcopy(self)
-            b = deepcopy(regionset)
-            a.merge()
-            b.merge()
-            if mode_count == "count":
-
-                inter = a.intersect(b, mode=OverlapType.ORIGINAL)
-                inter2 = b.intersect(a, mode=OverlapType.ORIGINAL)
-                c_a = len(a) - len(inter)
-                c_b = len(b) - len(inter2)
-                c_ab = len(inter)
-                return c_a, c_b, c_ab
-
-            elif mode_count == "bp":
-                intersect_r = a.intersect(b, mode=OverlapType.OVERLAP)
-                len_inter = intersect_r.total_coverage()
-                allbed1 = a.total_coverage()
-                allbed2 = b.total_coverage()
-                len_12 = allbed1 - len_inter
-                len_21 = allbed2 - len_inter
-                return len_12, len_21, len_inter
+            # Both sets are merged (once, see merged_array) and compared in a single sweep
+            return kernels.intersect_counts(self.merged_array(), regionset.merged_array(), mode=mode_count,
+                                            min_fraction=threshold / 100. if threshold else 0)
 
     def closest(self, y, max_dis=10000, return_list=False, top_N=None):
         """Return a new GenomicRegionSet including the region(s) of y which is closest to any self region. 
-        If there are intersection, return False.
+        Regions of self without any region of y within max_dis are skipped.
         
         *Keyword arguments:*
 
             - y -- the GenomicRegionSet which to compare with
             - max_dis -- maximum distance (default=10000 bp)
-            - return_list -- return a list of the distances
+            - return_list -- return a numpy array of the distances
             - top_N -- return a dictionary with region names as keys and the GenomicRegionSet containing N clostest regions as values. 
 
         *Return:*
@@ -1026,38 +1194,16 @@ class GenomicRegionSet:
         if not self.sorted: self.sort()
         if not y.sorted: y.sort()
 
-        targets = self.window(y=y, adding_length=max_dis)
-
-        chroms = self.get_chrom()
-        uni_chrom = list(set(chroms))
-        target_dict = {}
-        for ch in uni_chrom:
-            target_dict[ch] = targets.any_chrom(chrom=ch)
+        regions, targets = self.as_array(), y.as_array()
+        query, target, distance = kernels.nearest(regions, targets, top_n=top_N if top_N else 1,
+                                                  max_distance=max_dis)
+        distance = numpy.abs(distance)
 
         if not top_N:
-            if return_list: z_list = []
-
             z = GenomicRegionSet(self.name)
-
-            for region in self:
-                distances = []
-                if len(target_dict[region.chrom]) == 0:
-                    continue
-                elif len(target_dict[region.chrom]) == 1:
-                    d = region.distance(target_dict[region.chrom][0])
-                    z.add(target_dict[region.chrom][0])
-                    if return_list: z_list.append(d)
-                else:
-
-                    for r in target_dict[region.chrom]:
-                        d = region.distance(r)
-                        distances.append(d)
-                    min_ind = distances.index(min(distances))
-                    z.add(target_dict[region.chrom][min_ind])
-                    if return_list: z_list.append(distances[min_ind])
-
+            z.load_array(targets.take(target))
             if return_list:
-                return z, z_list
+                return z, distance
             else:
                 return z
 
@@ -1065,35 +1211,18 @@ class GenomicRegionSet:
             res_dict = OrderedDict()
             if return_list: res_dist = OrderedDict()
 
-            for region in self:
+            bounds = numpy.flatnonzero(numpy.diff(query)) + 1
+            for lo, hi in zip([0] + bounds.tolist(), bounds.tolist() + [len(query)]) if len(query) > 0 else []:
+                region = regions.region(query[lo])
                 if region.name:
                     tag = region.name
                 else:
                     tag = region.toString()
 
-                distances = []
-                if len(target_dict[region.chrom]) == 0:
-                    continue
-                elif len(target_dict[region.chrom]) <= top_N:
-                    res_dict[tag] = GenomicRegionSet("closest regions to: " + region.name)
-                    for t in target_dict[region.chrom]:
-                        res_dict[tag].add(t)
-                    if return_list: res_dist[tag] = [region.distance(r) for r in target_dict[region.chrom]]
-                else:
-                    res_dict[tag] = GenomicRegionSet("closest regions to: " + region.name)
-
-                    for r in target_dict[region.chrom]:
-                        d = region.distance(r)
-                        distances.append(d)
-
-                    sel_ind = sorted(range(len(distances)), key=lambda i: distances[i], reverse=False)[:top_N]
-                    for s in sel_ind:
-                        g = GenomicRegion(chrom=region.chrom, initial=target_dict[region.chrom][s].initial,
-                                          final=target_dict[region.chrom][s].final,
-                                          name=target_dict[region.chrom][s].name,
-                                          orientation=target_dict[region.chrom][s].orientation, data=str(distances[s]))
-                        res_dict[tag].add(g)
-                    if return_list: res_dist[tag] = distances[sel_ind]
+                res_dict[tag] = GenomicRegionSet("closest regions to: " + tag)
+                res_dict[tag].load_array(targets.take(target[lo:hi]).annotate(
+                    data=[str(d) for d in distance[lo:hi].tolist()]))
+                if return_list: res_dist[tag] = distance[lo:hi]
 
             if return_list:
                 return res_dict, res_dist
@@ -1104,13 +1233,22 @@ class GenomicRegionSet:
         """
         Remove any duplicate regions, and also returns the sequence list (sorted, by default).
         """
-        self.sequences = list(set(self.sequences))
-
-        if sort:
-            self.sort()
-
+        self._remove_duplicates(sort)
         return self.sequences
 
+    def _remove_duplicates(self, sort=True):
+        """Remove the regions with the same chromosome, initial, final and orientation as a previous one."""
+        if self._sequences is None:
+            array = self._array
+            keep = kernels.unique_regions(array)
+            if not sort:
+                keep.sort()
+            self.load_array(array.take(keep), sorted=sort)
+        else:
+            self.sequences = list(set(self._sequences))
+            if sort:
+                self.sort()
+
     def window(self, y, adding_length=1000):
         """Return the overlapping regions of self and y with adding a specified number (1000, by default) of base pairs
            upstream and downstream of each region in self. In effect, this allows regions in y that are near regions
@@ -1128,18 +1266,19 @@ class GenomicRegionSet:
         if len(self) == 0 or len(y) == 0:
             return GenomicRegionSet('None region')
         # Establish an extended GenomicRegionSet
-        extended_self = deepcopy(self)
-        extended_self.extend(adding_length, adding_length)
+        extended_self = GenomicRegionSet(self.name)
+        extended_self.load_array(kernels.extend(self.as_array(), adding_length, adding_length))
         # Find their intersections
         return extended_self.intersect(y)
 
-    def subtract(self, y, whole_region=False, merge=True):
+    def subtract(self, y, whole_region=False, merge=True, n_jobs=1):
         """Return a GenomicRegionSet excluded the overlapping regions with y.
         
         *Keyword arguments:*
 
             - y -- the GenomicRegionSet which to subtract by
             - whole_region -- subtract the whole region, not partially
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
 
         *Return:*
 
@@ -1153,123 +1292,20 @@ class GenomicRegionSet:
         """
 
         z = GenomicRegionSet(self.name + ' - ' + y.name)
-        if len(self) == 0 or len(y) == 0: return self
+        if len(self) == 0 or len(y) == 0: return self._copy()
 
-        # If there is overlap within self or y, they should be merged first. 
         if not self.sorted:
             self.sort()
+        if not y.sorted:
+            y.sort()
 
-        if merge:
-            a = self.merge(w_return=True)
-            b = y.merge(w_return=True)
-        else:
-            a = self
-            b = y
-
-        iter_a = iter(a)
-        s = iter_a.next()
-        last_j = len(b) - 1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-
-        while cont_loop:
-            # print("Compare: "+s.__repr__()+"\t"+b[j].__repr__())
-
-            # ----------------------
-            # -----  --    ----    -----  ----
-
-            # When the regions overlap
-            if s.overlap(b[j]):
-                if not cont_overlap: pre_inter = j
-                if whole_region:  # Simply jump to next region
-                    try:
-                        s = iter_a.next()
-                        j = pre_inter
-                        cont_overlap = False
-                        continue
-                    except:
-                        cont_loop = False
-
-                # ------        -----      -------       ---        ------    -----  --
-                #   ------        --        ---       --------  ------       -----  -----
-                if s.initial < b[j].initial:
-
-                    # ------        -----      -------
-                    #   ------        --        ---
-                    if s.final > b[j].final:
-                        s1 = GenomicRegion(chrom=s.chrom, initial=s.initial, final=b[j].initial,
-                                           name=s.name, orientation=s.orientation, data=s.data, proximity=s.proximity)
-                        s2 = GenomicRegion(chrom=s.chrom, initial=b[j].final, final=s.final,
-                                           name=s.name, orientation=s.orientation, data=s.data, proximity=s.proximity)
-                        z.add(s1)
-                        s = s2
-                        if j < last_j: j = j + 1
-                        cont_overlap = True
-                        continue
-                    else:
-                        s1 = GenomicRegion(chrom=s.chrom, initial=s.initial, final=b[j].initial,
-                                           name=s.name, orientation=s.orientation, data=s.data, proximity=s.proximity)
-                        z.add(s1)
-                        try:
-                            s = iter_a.next()
-                            j = pre_inter
-                            cont_overlap = False
-                            continue
-                        except:
-                            cont_loop = False
-
-                elif s.final > b[j].final:
-
-                    #     ------  
-                    # ------
-                    s2 = GenomicRegion(chrom=s.chrom, initial=b[j].final, final=s.final,
-                                       name=s.name, orientation=s.orientation, data=s.data, proximity=s.proximity)
-                    s = s2
-                    if j < last_j: j = j + 1
-                    cont_overlap = True
-                    continue
-                else:
-
-                    #     ---       -----  --
-                    #   --------    -----  -----
-                    try:
-                        s = iter_a.next()
-                        j = pre_inter
-                    except:
-                        cont_loop = False
-
-                if j == last_j:
-                    try:
-                        s = iter_a.next()
-                        j = pre_inter
-                    except:
-                        cont_loop = False
-                else:
-                    j = j + 1
-                cont_overlap = True
-
-            elif s < b[j]:
-                z.add(s)
-                try:
-                    s = iter_a.next()
-                    j = pre_inter
-                    cont_overlap = False
-                except:
-                    cont_loop = False
-
-            elif s > b[j]:
-                if j == last_j:
-                    z.add(s)
-                    try:
-                        s = iter_a.next()
-                    except:
-                        cont_loop = False
-                else:
-                    j = j + 1
-                    cont_overlap = False
+        # If there is overlap within self, it should be merged first.
+        a = self.merged_array(n_jobs) if merge else self.as_array()
+        b = y.as_array()
 
+        owner, initials, finals = kernels.map_chroms(lambda a, b: kernels.subtract(a, b, whole_region=whole_region),
+                                                     a, b, n_jobs, offsets=("a", None, None))
+        z.load_array(a.take(owner).replace(initials=initials, finals=finals), sorted=merge or whole_region)
         return z
 
     def subtract_aregion(self, y):
@@ -1321,74 +1357,62 @@ class GenomicRegionSet:
 
         return z
 
-    def merge(self, w_return=False, namedistinct=False, strand_specific=False):
+    def merge(self, w_return=False, namedistinct=False, strand_specific=False, n_jobs=1):
         """Merge the regions within the GenomicRegionSet
 
         *Keyword arguments:*
 
             - w_return -- If TRUE, it returns a GenomicRegionSet; if FALSE, it merges the regions in place.
             - namedistinct -- Merge the regions which have the same names only.
+            - strand_specific -- Merge the regions which have the same orientation only.
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
         """
         if not self.sorted: self.sort()
 
-        if len(self.sequences) in [0, 1]:
+        if len(self) in [0, 1]:
             if w_return:
-                return self
+                return self._copy()
             else:
                 pass
         else:
-            z = GenomicRegionSet(name=self.name)
-            prev_region = self.sequences[0]
-
-            if not namedistinct and not strand_specific:
-                for cur_region in self.sequences[1:]:
-                    if prev_region.overlap(cur_region):
-                        prev_region.initial = min(prev_region.initial, cur_region.initial)
-                        prev_region.final = max(prev_region.final, cur_region.final)
-                    else:
-                        z.add(prev_region)
-                        prev_region = cur_region
-                z.add(prev_region)
-
-            elif namedistinct and not strand_specific:
-                for cur_region in self.sequences[1:]:
-                    if prev_region.overlap(cur_region) and prev_region.name == cur_region.name:
-                        prev_region.initial = min(prev_region.initial, cur_region.initial)
-                        prev_region.final = max(prev_region.final, cur_region.final)
-                    else:
-                        z.add(prev_region)
-                        prev_region = cur_region
-                z.add(prev_region)
-
-            elif not namedistinct and strand_specific:
-                for cur_region in self.sequences[1:]:
-                    if prev_region.overlap(cur_region) and prev_region.orientation == cur_region.orientation:
-                        prev_region.initial = min(prev_region.initial, cur_region.initial)
-                        prev_region.final = max(prev_region.final, cur_region.final)
-                    else:
-                        z.add(prev_region)
-                        prev_region = cur_region
-                z.add(prev_region)
-
-            elif namedistinct and strand_specific:
-                for cur_region in self.sequences[1:]:
-                    if prev_region.overlap(
-                            cur_region) and prev_region.name == cur_region.name and prev_region.orientation == cur_region.orientation:
-                        prev_region.initial = min(prev_region.initial, cur_region.initial)
-                        prev_region.final = max(prev_region.final, cur_region.final)
-                    else:
-                        z.add(prev_region)
-                        prev_region = cur_region
-                z.add(prev_region)
+            if not w_return and self._sequences is not None:
+                # The first GenomicRegion object of every group is kept and extended, as before
+                array = self.as_array()
+                keys = None
+                if namedistinct or strand_specific:
+                    keys = kernels.region_keys([array], strand_specific=strand_specific,
+                                               name_specific=namedistinct)[0]
+                first = numpy.flatnonzero(kernels.merge_starts(array, keys=keys))
+                finals = numpy.maximum.reduceat(array.finals, first).tolist()
+                regions = [self._sequences[i] for i in first.tolist()]
+                for region, final in zip(regions, finals):
+                    region.final = final
+                self.sequences = regions
+                self.sorted = True
+                return
+            if namedistinct or strand_specific:
+                def merge_keys(array):
+                    keys = kernels.region_keys([array], strand_specific=strand_specific, name_specific=namedistinct)
+                    return kernels.merge(array, keys=keys[0])
+
+                merged = kernels.map_chroms(merge_keys, self.as_array(), n_jobs=n_jobs)
+            else:
+                merged = self.merged_array(n_jobs)
 
             if w_return:
+                z = GenomicRegionSet(name=self.name)
+                z.load_array(merged, sorted=True)
+                z._merged = (merged, merged)
                 return z
             else:
-                self.sequences = z.sequences
+                self.load_array(merged, sorted=True)
+                self._merged = (merged, merged)
 
     def combine(self, region_set, change_name=True, output=False):
         """Adding another GenomicRegionSet without merging the overlapping regions.
 
+        If both GenomicRegionSets are sorted, the result is sorted as well (by a linear merge of both).
+
         *Keyword arguments:*
 
             - region_set -- the GenomicRegion which to combine with
@@ -1397,32 +1421,39 @@ class GenomicRegionSet:
         """
         if output:
             a = GenomicRegionSet(name="")
-            for s in self.sequences:
-                a.add(s)
-            for s in region_set.sequences:
-                a.add(s)
             if change_name:
-                if a.name == "":
-                    a.name = region_set.name
-                else:
-                    a.name = a.name + " + " + region_set.name
-            a.sorted = False
-            return a
+                a.name = region_set.name
         else:
-            self.sequences.extend(region_set.sequences)
+            a = self
             if change_name:
                 if self.name == "":
                     self.name = region_set.name
                 else:
                     self.name = self.name + " + " + region_set.name
-            self.sorted = False
 
-    def cluster(self, max_distance):
+        both_sorted = self.sorted and region_set.sorted
+        if self._sequences is None and region_set._sequences is None:
+            if both_sorted:
+                a.load_array(kernels.merge_sorted(self._array, region_set._array), sorted=True)
+            else:
+                a.load_array(GenomicRegionArray.concatenate([self._array, region_set._array]))
+        else:
+            if both_sorted:
+                a.sequences = list(heapq.merge(self.sequences, region_set.sequences,
+                                               key=lambda r: (r.chrom, r.initial, r.final)))
+            else:
+                a.sequences = self.sequences + region_set.sequences
+            a.sorted = both_sorted
+        if output:
+            return a
+
+    def cluster(self, max_distance, n_jobs=1):
         """Cluster the regions with a certain distance and return the result as a new GenomicRegionSet.
         
         *Keyword arguments:*
 
             - max_distance -- the maximum distance between regions within the same cluster
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
         
         *Return:*
 
@@ -1441,20 +1472,11 @@ class GenomicRegionSet:
         if len(self) == 0:
             return GenomicRegionSet('None region')
         elif len(self) == 1:
-            return self
+            return self._copy()
         else:
             z = GenomicRegionSet('Clustered region set')
-            previous = self.sequences[0]
-            for s in self.sequences[1:]:
-                s_ext = deepcopy(s)
-                s_ext.extend(max_distance, max_distance)
-                if s_ext.overlap(previous):
-                    previous.initial = min(previous.initial, s.initial)
-                    previous.final = max(previous.final, s.final)
-                else:
-                    z.add(previous)
-                    previous = s
-            z.add(previous)
+            z.load_array(kernels.map_chroms(lambda a: kernels.cluster(a, max_distance), self.as_array(),
+                                            n_jobs=n_jobs))
             return z
 
     def flank(self, size):
@@ -1477,15 +1499,7 @@ class GenomicRegionSet:
             return GenomicRegionSet("Empty")
         else:
             z = GenomicRegionSet("Flanking intervals")
-            for s in self:
-                s1 = GenomicRegion(name='upstream', chrom=s.chrom,
-                                   initial=max(0, s.initial - size),
-                                   final=s.initial, data=s.data)
-                s2 = GenomicRegion(name='downstream', chrom=s.chrom,
-                                   initial=max(0, s.final),
-                                   final=s.final + size, data=s.data)  # Adding the limit of chromosome length
-                z.add(s1)
-                z.add(s2)
+            z.load_array(kernels.flank(self.as_array(), size))
             return z
 
     def jaccard(self, query):
@@ -1507,82 +1521,100 @@ class GenomicRegionSet:
             similarity: (5+4+2)/[(8+10+4)+(10+10)-(5+4+2)] = 11/31
         """
 
-        # if sys.platform == "darwin":
-        #     return self.jaccard_python(query)
-        # else:
-        return self.jaccard_c(query)
+        if librgt.library() is not None:
+            return self.jaccard_c(query)
+        else:
+            return self.jaccard_python(query)
 
-    def jaccard_python(self, query):
-        a = copy.deepcopy(self)
-        b = copy.deepcopy(query)
-        if a.total_coverage() == 0 and len(a) > 0:
-            print(" ** Warning: \t" + a.name + " has zero length.")
-            return a.name
-        if b.total_coverage() == 0 and len(b) > 0:
-            print(" ** Warning: \t" + b.name + " has zero length.")
-            return b.name
-
-        intersects = a.intersect(b)
-        intersects.merge()
-        inter = intersects.total_coverage()
-
-        a.combine(b, change_name=False)
-        a.merge()
-        uni = a.total_coverage()
-        similarity = inter / uni
-        return similarity
+    @staticmethod
+    def overlap_matrix(region_sets, metric="jaccard"):
+        """Return a numpy matrix comparing every pair of the given GenomicRegionSets, computed in a single sweep.
 
-    def jaccard_c(self, query):
-        # Determine path of shared library
-        Lib = LibraryPath()
-        lib = cdll.LoadLibrary(Lib.get_c_rgt())
+        *Keyword arguments:*
+
+            - region_sets -- A list of K GenomicRegionSets.
+            - metric -- "jaccard" (as jaccard), "bp" (length of the intersection, as intersect_count with
+              mode_count="bp") or "count" (number of merged regions of set i overlapping set j, as intersect_count
+              with mode_count="count").
 
-        # Bind library
-        ctypes_jaccardC = lib.jaccard
+        *Return:*
 
-        # Specify data types
-        ctypes_jaccardC.argtypes = [POINTER(c_char_p), POINTER(c_int), POINTER(c_int), c_int, POINTER(c_char_p),
-                                    POINTER(c_int), POINTER(c_int), c_int]
-        ctypes_jaccardC.restype = c_double
+            - A K x K numpy array. The diagonal holds 1 ("jaccard"), the total coverage ("bp") or the number of
+              merged regions ("count") of every set.
+        """
+        return kernels.overlap_matrix([region_set.merged_array() for region_set in region_sets], metric=metric)
 
-        if not self.sorted:
-            self.sort()
-        if not query.sorted:
-            query.sort()
+    @staticmethod
+    def combinations(region_sets):
+        """Return the regions covered by exactly the same combination of the given GenomicRegionSets, for all
+        combinations at once.
+
+        The regions of a combination are the ones which intersecting (OverlapType.OVERLAP) the first set of the
+        combination with the others of it and subtracting the remaining sets would give, with the attributes of the
+        regions of the first set.
+
+        *Keyword arguments:*
+
+            - region_sets -- A list of K GenomicRegionSets (K <= 62).
 
-        assert self.sorted
-        assert query.sorted
+        *Return:*
+
+            - A dictionary from the bitmask of every occurring combination (bit j for region_sets[j]) to a sorted
+              GenomicRegionSet.
+        """
+        segments, masks = kernels.membership_segments([region_set.merged_array() for region_set in region_sets])
+        order = numpy.argsort(masks, kind="stable")
+        values, first = numpy.unique(masks[order], return_index=True)
+        result = {}
+        for mask, lo, hi in zip(values.tolist(), first.tolist(), first[1:].tolist() + [len(order)]):
+            z = GenomicRegionSet(" + ".join(region_sets[j].name for j in range(len(region_sets)) if mask >> j & 1))
+            z.load_array(segments.take(order[lo:hi]), sorted=True)
+            result[mask] = z
+        return result
+
+    @staticmethod
+    def combination_counts(region_sets, sparse=None):
+        """Return the number of regions and the base pairs covered by exactly every combination of the given
+        GenomicRegionSets (see combinations), sweeping one chromosome at a time.
+
+        *Keyword arguments:*
 
-        # Convert to ctypes
-        chroms_self_python = [gr.chrom for gr in self.sequences]
-        chroms_self_c = (c_char_p * len(chroms_self_python))(*chroms_self_python)
-        # print('Converted self.chroms to c', str(chroms_self_python[:4]), '...')
+            - region_sets -- A list of K GenomicRegionSets (K <= 62).
+            - sparse -- If True, only the occurring combinations are returned, otherwise all 2^K. By default, the
+              result is sparse for K > 20.
 
-        chroms_query_python = [gr.chrom for gr in query.sequences]
-        chroms_query_c = (c_char_p * len(chroms_query_python))(*chroms_query_python)
-        # print('Converted query.chroms to c', str(chroms_query_python[:4]), '...')
+        *Return:*
 
-        initials_self_python = [gr.initial for gr in self.sequences]
-        initials_self_c = (c_int * len(initials_self_python))(*initials_self_python)
-        # print('Converted self.initials to c', str(initials_self_python[:4]), '...')
+            - masks -- numpy array of the bitmasks of the combinations (bit j for region_sets[j])
+            - counts -- numpy array of the number of regions of every combination
+            - lengths -- numpy array of the base pairs of every combination
+        """
+        return kernels.combination_counts([region_set.merged_array() for region_set in region_sets], sparse=sparse)
 
-        initials_query_python = [gr.initial for gr in query.sequences]
-        initials_query_c = (c_int * len(initials_query_python))(*initials_query_python)
-        # print('Converted query.initials to c', str(initials_query_python[:4]), '...')
+    def jaccard_python(self, query):
+        def total_intersect_coverage(a, b):
+            owner, initials, finals = kernels.intersect_overlap(a, b)
+            return int(numpy.sum(finals - initials))
 
-        finals_self_python = [gr.final for gr in self.sequences]
-        finals_self_c = (c_int * len(finals_self_python))(*finals_self_python)
-        # print('Converted self.finals to c', str(finals_self_python[:4]), '...')
+        return self._jaccard(query, total_intersect_coverage)
 
-        finals_query_python = [gr.final for gr in query.sequences]
-        finals_query_c = (c_int * len(finals_query_python))(*finals_query_python)
-        # print('Converted query.finals to c', str(finals_query_python[:4]), '...')
+    def _jaccard(self, query, total_intersect_coverage):
+        if self.total_coverage() == 0 and len(self) > 0:
+            print(" ** Warning: \t" + self.name + " has zero length.")
+            return self.name
+        if query.total_coverage() == 0 and len(query) > 0:
+            print(" ** Warning: \t" + query.name + " has zero length.")
+            return query.name
 
-        # print('Converted to ctypes')
+        a = self.merged_array()
+        b = query.merged_array()
+        inter = total_intersect_coverage(a, b)
+        uni = a.coverage() + b.coverage() - inter
+        similarity = inter / uni
+        return similarity
 
-        # Call C-function
-        return ctypes_jaccardC(chroms_self_c, initials_self_c, finals_self_c, len(self), chroms_query_c,
-                               initials_query_c, finals_query_c, len(query))
+    def jaccard_c(self, query):
+        return self._jaccard(query, librgt.total_intersect_coverage)
 
     def within_overlap(self):
         """Check whether there is overlapping within or not."""
@@ -1597,6 +1629,8 @@ class GenomicRegionSet:
 
     def total_coverage(self):
         """Return the sum of all lengths of regions."""
+        if self._sequences is None:
+            return self._array.coverage()
         length = 0
         for s in self:
             try:
@@ -1616,23 +1650,16 @@ class GenomicRegionSet:
             - chrom_Y -- Include chromosome Y
             - chrom_M -- Include mitochondrial chromosome
         """
-        genome = GenomeData(organism)
-        chromosome_file = open(genome.get_chromosome_sizes(), 'r')
-        for line in chromosome_file:
-            if "random" not in line and "_" not in line:
-                if not chrom_X and "chrX" in line: continue
-                if not chrom_Y and "chrY" in line: continue
-                if not chrom_M and "chrM" in line: continue
-                chrom_region = GenomicRegion(chrom=line.split("\t")[0],
-                                             initial=0,
-                                             final=int(line.split("\t")[1]))
-                self.add(chrom_region)
-                continue
-        chromosome_file.close()
+        table = GenomeData(organism).get_chromosome_sizes_table()
+        selected = table.select(chrom_X=chrom_X, chrom_Y=chrom_Y, chrom_M=chrom_M)
+        finals = table.sizes[selected]
+        chroms = GenomicRegionArray.from_columns([c for c, s in zip(table.names, selected) if s],
+                                                 numpy.zeros(len(finals), dtype=numpy.int64), finals)
+        self.load_array(GenomicRegionArray.concatenate([self.as_array(), chroms]))
 
     def random_regions(self, organism, total_size=None, multiply_factor=1,
                        overlap_result=True, overlap_input=True,
-                       chrom_X=False, chrom_M=False, filter_path=None):
+                       chrom_X=False, chrom_M=False, filter_path=None, seed=None):
         """Return a GenomicRegionSet which contains the random regions generated by given entries and given number
            on the given organism.
         
@@ -1647,111 +1674,52 @@ class GenomicRegionSet:
             - chrom_X -- The result covers chromosome X or not. (True/False)
             - chrom_M -- The result covers mitochondria chromosome or not. (True/False)
             - filter_path -- Given the path of filter BED file
+            - seed -- Seed of the random generator (see GenomicRegionShuffler)
         
         *Return:*
 
             - z -- A GenomicRegionSet which contains the random regions
         """
+        return next(self.random_shuffles(organism, 1, total_size=total_size, multiply_factor=multiply_factor,
+                                         overlap_result=overlap_result, overlap_input=overlap_input,
+                                         chrom_X=chrom_X, chrom_M=chrom_M, filter_path=filter_path, seed=seed))
 
-        def list_max(chrom_list, result_map):
-            """Generate a list containing maximum length for each chromosome."""
-            map_max = []  # Store the minimum length corresponding to chrom_list
-            for ch in chrom_list:
-                map_max.append(max([len(s) for s in result_map.any_chrom(ch)]))
-            return map_max
-
-        def randoming(length, result_map, chrom_list, map_max, choices):
-            """Return a new GenomicRegion as the result of randomization."""
-            cont_loop = True
-            candidate_chrom = [chrom_list[i] for i, l in enumerate(map_max) if l > length]
-
-            while True:
-                ch = weighted_choice(choices)
-                if ch in candidate_chrom:
-                    break
-
-            while cont_loop:
-                # try:
-                regions = result_map.any_chrom(ch, len_min=length)
-                sample = random.choice(regions)
-                if len(sample) < length:
-                    print("1", end="")
-                    continue
-                else:
-                    # print("2", end="")
-                    random_posi = random.randint(sample.initial, sample.final - length)
-                    # print(sample.toString())
-                    # print(random_posi)
-                    cont_loop = False
-
-                # except:
-                # print("3", end="")
-                #    continue
+    def random_shuffles(self, organism, n, total_size=None, multiply_factor=1,
+                        overlap_result=True, overlap_input=True,
+                        chrom_X=False, chrom_M=False, filter_path=None, seed=None):
+        """Yield n GenomicRegionSets of random regions, as random_regions does. The allowed space of the genome is
+        computed once and, if overlap_result is True, all regions are drawn in a single batch.
 
-            return GenomicRegion(chrom=sample.chrom, initial=random_posi, final=random_posi + length)
-
-            # raise Exception("There is no further space for randomization on the genome.")
-
-        def weighted_choice(choices):
-            total = sum(w for c, w in choices)
-            r = random.uniform(0, total)
-            upto = 0
-            for c, w in choices:
-                if upto + w > r:
-                    return c
-                upto += w
-            assert False, "Shouldn't get here"
-
-        ############################################
-        # input_map = copy.deepcopy(self)
+        *Keyword arguments:*
 
-        input_map = self
-        input_num = len(self)
-        input_list = [len(x) for x in self.sequences]
-        result_list = []
+            - n -- Number of random GenomicRegionSets.
+            - The other arguments are the ones of random_regions.
+        """
+        lengths = self.as_array().lengths()
         # Total number and lengths of random regions
         if total_size:
-            for i in range(int(total_size)):
-                result_list.append(input_list[i % input_num])
+            lengths = numpy.resize(lengths, int(total_size))
         elif multiply_factor > 0:
-            for i in range(int(multiply_factor * input_num)):
-                result_list.append(input_list[i % input_num])
+            lengths = numpy.resize(lengths, int(multiply_factor * len(lengths)))
+        else:
+            lengths = lengths[:0]
 
         # Maps
         # Fetching the chromosome length from data
         chrom_map = GenomicRegionSet("chrom_map")
         chrom_map.get_genome_data(organism, chrom_X=chrom_X, chrom_M=chrom_M)
-        chrom_list = chrom_map.get_chrom()
         if filter_path:
             filter_map = GenomicRegionSet('filter')
             filter_map.read(filter_path)
             chrom_map = chrom_map.subtract(filter_map)
+        if not overlap_input:
+            chrom_map = chrom_map.subtract(self)
 
-        if overlap_input:
-            result_map = chrom_map
-        else:
-            result_map = chrom_map.subtract(input_map)
-
-        z = GenomicRegionSet(name="random regions")
-        map_max = list_max(chrom_list, result_map)
-
-        # Generate pk which stores the total length of all regions in each chromosome
-        choices = []
-        for ch in chrom_list:
-            cov = result_map.any_chrom(ch)
-            pk = sum([len(s) for s in cov])
-
-            choices.append([ch, pk])
-
-        for length in result_list:
-            new_region = randoming(length, result_map, chrom_list, map_max, choices)
-            z.add(new_region)
-            if not overlap_result:
-                result_map = result_map.subtract_aregion(new_region)
-                map_max[chrom_list.index(new_region.chrom)] = max(
-                    [len(s) for s in result_map.any_chrom(new_region.chrom)])
-                choices[chrom_list.index(new_region.chrom)][1] -= len(new_region)
-        return z
+        shuffler = GenomicRegionShuffler(chrom_map.as_array(), seed=seed)
+        for array in shuffler.shuffles(lengths, n, overlap=overlap_result):
+            z = GenomicRegionSet(name="random regions")
+            z.load_array(array)
+            yield z
 
     def trim_by(self, background):
         """Trim a GenomicRegionSet by a given background, another GenomicRegionSet."""
@@ -1775,8 +1743,6 @@ class GenomicRegionSet:
             - if extra=True, returns (possibility, ration, p-value, intersected_query)
             - if extra=False, returns p-value
         """
-        chrom_map = GenomicRegionSet("Genome")
-        chrom_map.get_genome_data(organism=organism)
         if self.total_coverage() == 0 and len(self) > 0:
             print(" ** Warning: \t" + self.name + " has zero length.")
             if extra:
@@ -1790,7 +1756,9 @@ class GenomicRegionSet:
             ss = self.intersect(background, OverlapType.OVERLAP)
             possibility = ss.total_coverage() / background.total_coverage()
         else:
-            possibility = self.total_coverage() / chrom_map.total_coverage()  # The average likelihood
+            table = GenomeData(organism).get_chromosome_sizes_table()
+            genome_length = int(table.sizes[table.select()].sum())
+            possibility = self.total_coverage() / genome_length  # The average likelihood
 
         nquery = query.relocate_regions(center='midpoint', left_length=0, right_length=0)
         intersect_regions = nquery.intersect(self, mode=OverlapType.ORIGINAL)
@@ -1823,14 +1791,16 @@ class GenomicRegionSet:
 
             - A list of regions which belongs to given chromosome.
         """
+        sequences = self.sequences
+        res = [sequences[i] for i in self.index().chrom_indices(chrom).tolist()]
         if not len_min and not len_max:
-            res = [s for s in self if s.chrom == chrom]
+            pass
         elif len_min > 0 and not len_max:
-            res = [s for s in self if s.chrom == chrom and len(s) >= len_min]
+            res = [s for s in res if len(s) >= len_min]
         elif len_max > 0 and not len_min:
-            res = [s for s in self if s.chrom == chrom and len(s) <= len_max]
+            res = [s for s in res if len(s) <= len_max]
         else:
-            res = [s for s in self if s.chrom == chrom and len_min <= len(s) <= len_max]
+            res = [s for s in res if len_min <= len(s) <= len_max]
 
         if return_list:
             return res
@@ -1859,48 +1829,8 @@ class GenomicRegionSet:
             - right_length -- Define the length to extend on the right side
         """
         new_regions = GenomicRegionSet("relocated_" + self.name)
-        for r in self.sequences:
-            # Define the position
-            if center == 'midpoint':
-                mp = int(0.5 * (r.initial + r.final))
-                nr = GenomicRegion(chrom=r.chrom, initial=mp, final=mp, name=r.name,
-                                   orientation=r.orientation, data=r.data, proximity=r.proximity)
-
-            elif center == 'leftend':
-                nr = GenomicRegion(chrom=r.chrom, initial=r.initial, final=r.initial, name=r.name,
-                                   orientation=r.orientation, data=r.data, proximity=r.proximity)
-            elif center == 'rightend':
-                nr = GenomicRegion(chrom=r.chrom, initial=r.final, final=r.final, name=r.name,
-                                   orientation=r.orientation, data=r.data, proximity=r.proximity)
-            elif center == 'downstream':
-                if r.orientation == "-":
-                    nr = GenomicRegion(chrom=r.chrom, initial=r.initial, final=r.initial, name=r.name,
-                                       orientation=r.orientation, data=r.data, proximity=r.proximity)
-                else:
-                    nr = GenomicRegion(chrom=r.chrom, initial=r.final, final=r.final, name=r.name,
-                                       orientation=r.orientation, data=r.data, proximity=r.proximity)
-            elif center == 'upstream':
-                if r.orientation == "-":
-                    nr = GenomicRegion(chrom=r.chrom, initial=r.final, final=r.final, name=r.name,
-                                       orientation=r.orientation, data=r.data, proximity=r.proximity)
-                else:
-                    nr = GenomicRegion(chrom=r.chrom, initial=r.initial, final=r.initial, name=r.name,
-                                       orientation=r.orientation, data=r.data, proximity=r.proximity)
-            elif center == 'bothends':
-                nrL = GenomicRegion(chrom=r.chrom, initial=r.initial, final=r.initial, name=r.name,
-                                    orientation=r.orientation, data=r.data, proximity=r.proximity)  # newbed on left end
-                nrR = GenomicRegion(chrom=r.chrom, initial=r.final, final=r.final, name=r.name,
-                                    orientation=r.orientation, data=r.data,
-                                    proximity=r.proximity)  # newbed on right end
-
-            if center == 'bothends':
-                new_regions.add(nrL)
-                new_regions.add(nrR)
-            else:
-                new_regions.add(nr)
-
         # Extend the region
-        new_regions.extend(left_length, right_length)
+        new_regions.load_array(kernels.extend(kernels.relocate(self.as_array(), center), left_length, right_length))
         return new_regions
 
     def maximum_length(self):
@@ -1921,12 +1851,7 @@ class GenomicRegionSet:
 
             - region -- A GenomicRegion to be checked.
         """
-        for s in self:
-            if s.overlap(region):
-                return True
-            else:
-                continue
-        return False
+        return self.index().any(region.chrom, region.initial, region.final)
 
     def complement(self, organism, chrom_X=True, chrom_Y=False, chrom_M=False):
         """Return the complement GenomicRegionSet for the given organism.
@@ -1954,9 +1879,9 @@ class GenomicRegionSet:
 
             - region -- A GenomicRegion defining the interval for counting.
         """
-        query = GenomicRegionSet("query")
-        query.add(region)
-        return len(self.intersect(query))
+        hits = self.as_array().take(self.index().query(region.chrom, region.initial, region.final))
+        # Overlapping regions of self are merged, as in intersect
+        return int(numpy.count_nonzero(kernels.merge_starts(hits.take(hits.sort_order()))))
 
     def count_by_regionset(self, regionset):
         """Return the number of intersection regions with the given GenomicRegionSet.
@@ -1967,76 +1892,34 @@ class GenomicRegionSet:
         """
         return len(self.intersect(regionset, mode=OverlapType.ORIGINAL))
 
-    def counts_per_region(self, regionset):
-        """Return a list of counting numbers of the given GenomicRegionSet based on the self.
+    def counts_per_region(self, regionset, n_jobs=1):
+        """Return a numpy array of counting numbers of the given GenomicRegionSet based on the self.
         
         *Keyword arguments:*
 
-            - regionset -- A GenomicRegionSet defining the interval for counting.
+            - regionset -- A GenomicRegionSet defining the interval for counting, or a list of GenomicRegionSets
+              which are all counted against self in one call.
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
 
-        .. note:: The length of the result list is the same as self GenomicRegionSet
+        .. note:: The length of the result array is the same as self GenomicRegionSet. For a list of
+                  GenomicRegionSets, the result has one row per GenomicRegionSet.
         """
+        return self._per_region(kernels.count_overlaps, regionset, n_jobs)
+
+    def _per_region(self, kernel, regionset, n_jobs=1):
+        """Apply a kernel(self array, sorted array, ranks) to one or a list of GenomicRegionSets."""
         if len(self) == 0: return None
-        if len(regionset) == 0: return [0] * len(self)
 
-        # a = copy.deepcopy(con_self)
-        # b = copy.deepcopy(regionset)
         if not self.sorted: self.sort()
-        if not regionset.sorted: regionset.sort()
-        counts = []
-
-        iter_a = iter(self)
-        s = iter_a.next()
-        last_j = len(regionset) - 1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-        c = 0
-        while cont_loop:
-            # When the regions overlap
-            # print(str(s)+"\t\t"+str(b[j]))
-            if s.overlap(regionset[j]):
-                c += 1
-                if not cont_overlap: pre_inter = j
-                if j == last_j:
-                    try:
-                        s = iter_a.next()
-                        counts.append(c)
-                        c = 0
-                        j = pre_inter
-                    except:
-                        cont_loop = False
-                        counts.append(c)
-                else:
-                    j += 1
-                cont_overlap = True
-
-            elif s < regionset[j]:
-                try:
-                    s = iter_a.next()
-                    counts.append(c)
-                    c = 0
-                    j = pre_inter
-                    cont_overlap = False
-                except:
-                    cont_loop = False
-                    counts.append(c)
-
-            elif s > regionset[j]:
-                if j == last_j:
-                    try:
-                        s = iter_a.next()
-                        counts.append(c)
-                        c = 0
-
-                    except:
-                        cont_loop = False
-                        counts.append(c)
-                else:
-                    j = j + 1
-                    cont_overlap = False
-        return counts
+        regions = self.as_array()
+        ranks = kernels.CHROMOSOMES.ranks()
+        results = []
+        for y in ([regionset] if isinstance(regionset, GenomicRegionSet) else regionset):
+            if not y.sorted: y.sort()
+            results.append(kernels.map_chroms(lambda a, b: kernel(a, b, ranks), regions, y.as_array(), n_jobs))
+        if isinstance(regionset, GenomicRegionSet):
+            return results[0]
+        return numpy.array(results).reshape(len(results), len(regions))
 
     def covered_by_aregion(self, region):
         """Return a GenomicRegionSet which includes all the regions covered by a given region.
@@ -2049,9 +1932,7 @@ class GenomicRegionSet:
 
             - A GenomicRegionSet containing the regions within the defined interval.
         """
-        region_set = GenomicRegionSet("Query")
-        region_set.add(region)
-        return self.intersect(region_set, mode=OverlapType.ORIGINAL)
+        return self._subset(self.index().query(region.chrom, region.initial, region.final))
 
     def replace_region_name(self, regions, combine=False):
         """Replace the region names by the given GenomicRegionSet.
@@ -2074,7 +1955,7 @@ class GenomicRegionSet:
             if not regions.sorted: regions.sort()
 
             iter_a = iter(self)
-            s = iter_a.next()
+            s = next(iter_a)
             last_j = len(regions) - 1
             j = 0
             cont_loop = True
@@ -2088,13 +1969,13 @@ class GenomicRegionSet:
                     else:
                         s.name = regions[j].name
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                     except:
                         cont_loop = False
 
                 elif s < regions[j]:
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                     except:
                         cont_loop = False
                 elif s > regions[j]:
@@ -2104,7 +1985,7 @@ class GenomicRegionSet:
                         j = j + 1
                 else:
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                     except:
                         cont_loop = False
             return
@@ -2136,7 +2017,7 @@ class GenomicRegionSet:
             if not regions.sorted: regions.sort()
 
             iter_a = iter(self)
-            s = iter_a.next()
+            s = next(iter_a)
             last_j = len(regions) - 1
             j = 0
             cont_loop = True
@@ -2151,13 +2032,13 @@ class GenomicRegionSet:
                     elif reverse and regions[j].orientation == "-":
                         s.orientation = "+"
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                     except:
                         cont_loop = False
 
                 elif s < regions[j]:
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                     except:
                         cont_loop = False
                 elif s > regions[j]:
@@ -2167,7 +2048,7 @@ class GenomicRegionSet:
                         j = j + 1
                 else:
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                     except:
                         cont_loop = False
             return
@@ -2217,75 +2098,25 @@ class GenomicRegionSet:
                 z.add(gr)
         return z
 
-    def coverage_per_region(self, regionset):
-        """Return a list of coverage of the given GenomicRegionSet based on the self GenomicRegionSet.
+    def coverage_per_region(self, regionset, n_jobs=1):
+        """Return a numpy array of coverage of the given GenomicRegionSet based on the self GenomicRegionSet.
+
+        The coverage of a region is the fraction of its positions covered by any region of regionset (0 for
+        zero-length regions).
 
         *Keyword arguments:*
 
-            - regionset -- A GenomicRegionSet as the signal for calculate the coverage.
+            - regionset -- A GenomicRegionSet as the signal for calculate the coverage, or a list of
+              GenomicRegionSets which are all compared with self in one call.
+            - n_jobs -- Number of threads processing the chromosomes (-1: one per processor)
 
-        .. note:: The length of the result list is the same as self GenomicRegionSet.
+        .. note:: The length of the result array is the same as self GenomicRegionSet. For a list of
+                  GenomicRegionSets, the result has one row per GenomicRegionSet.
         """
-        if len(self) == 0: return None
-        if len(regionset) == 0: return [0] * len(self)
+        def coverage(regions, y, ranks):
+            return kernels.covered_lengths(regions, y, ranks) / numpy.maximum(regions.lengths(), 1)
 
-        if not self.sorted: self.sort()
-        if not regionset.sorted: regionset.sort()
-        coverages = []
-
-        iter_a = iter(self)
-        s = iter_a.next()
-        last_j = len(regionset) - 1
-        j = 0
-        cont_loop = True
-        pre_inter = 0
-        cont_overlap = False
-        c = GenomicRegionSet("coverage")
-
-        while cont_loop:
-            # When the regions overlap
-            # print(str(s)+"\t\t"+str(b[j]))
-            if s.overlap(regionset[j]):
-
-                c.add(regionset[j])
-                if not cont_overlap: pre_inter = j
-                if j == last_j:
-                    coverages.append(c.total_coverage() / len(s))
-                    try:
-                        s = iter_a.next()
-                        c = GenomicRegionSet("coverage")
-                        j = pre_inter
-                    except:
-                        cont_loop = False
-                else:
-                    j += 1
-                cont_overlap = True
-
-            elif s < regionset[j]:
-                overlapping = False
-                coverages.append(c.total_coverage() / len(s))
-                try:
-                    s = iter_a.next()
-                    c = GenomicRegionSet("coverage")
-                    j = pre_inter
-                    cont_overlap = False
-                except:
-                    cont_loop = False
-
-            elif s > regionset[j]:
-                overlapping = False
-                if j == last_j:
-                    coverages.append(c.total_coverage() / len(s))
-                    try:
-                        s = iter_a.next()
-                        c = GenomicRegionSet("coverage")
-
-                    except:
-                        cont_loop = False
-                else:
-                    j = j + 1
-                    cont_overlap = False
-        return coverages
+        return self._per_region(coverage, regionset, n_jobs)
 
     def extract_blocks(self, keep_name=False):
         """Extract the exon information from self.data and add them into the self GenomicRegionSet."""
@@ -2364,9 +2195,9 @@ class GenomicRegionSet:
         c = a.subtract(b)
         # Iteration
         iter_a = iter(a)
-        sa = iter_a.next()
+        sa = next(iter_a)
         iter_c = iter(c)
-        sc = iter_c.next()
+        sc = next(iter_c)
         # Loop
         z = GenomicRegionSet("sample")
         q_coll = GenomicRegionSet(sa.toString())
@@ -2376,12 +2207,12 @@ class GenomicRegionSet:
             if sa.overlap(sc):
                 q_coll.add(sc)
                 try:
-                    sc = iter_c.next()
+                    sc = next(iter_c)
                 except:
                     if len(q_coll):
                         z.add(random_choose(col_regionset=q_coll))
                     try:
-                        sa = iter_a.next()
+                        sa = next(iter_a)
                     except:
                         cont_loop = False
             elif sa < sc:
@@ -2389,7 +2220,7 @@ class GenomicRegionSet:
                     z.add(random_choose(col_regionset=q_coll))
                 q_coll = GenomicRegionSet(sa.toString())
                 try:
-                    sa = iter_a.next()
+                    sa = next(iter_a)
                 except:
                     cont_loop = False
 
@@ -2398,7 +2229,7 @@ class GenomicRegionSet:
                     z.add(random_choose(col_regionset=q_coll))
                 q_coll = GenomicRegionSet(sa.toString())
                 try:
-                    sc = iter_c.next()
+                    sc = next(iter_c)
                 except:
                     cont_loop = False
 
@@ -2452,93 +2283,55 @@ class GenomicRegionSet:
         return z
 
     def get_distance(self, y, ignore_overlap=False, strand_specific=False, thresh_dist=50000):
-        """Return a list of distances between the closest regions from two region sets."""
+        """Return a list of distances between the closest regions from two region sets.
+
+        Every entry is [name of the region of self, distance, name of the region of y]. The distance is "0" for all
+        regions of y overlapping (or touching) the region of self; otherwise the closest region of y on each side is
+        reported, if it is closer than thresh_dist, with a distance prefixed by "-" (before) or "+" (after). The
+        closest region before is the one whose end is closest, and every region of self is compared with y on its
+        own.
+
+        *Keyword arguments:*
+
+            - ignore_overlap -- Ignore the overlapping regions and report the closest regions on each side instead.
+            - strand_specific -- Only compare regions with the same orientation.
+            - thresh_dist -- Threshold distance for the closest regions.
+        """
         if not self.sorted: self.sort()
         if not y.sorted: y.sort()
 
-        last_j = len(y) - 1
-        j = 0
-        if strand_specific:
-            pre_inter = [0, 0]
+        regions, targets = self.as_array(), y.as_array()
+        query, target, distance = kernels.nearest(regions, targets, top_n=None, strand_specific=strand_specific)
+        if ignore_overlap:
+            keep = distance != 0
+            query, target, distance = query[keep], target[keep], distance[keep]
         else:
-            pre_inter = 0
+            # Regions with overlaps only report them
+            overlapping = numpy.zeros(len(regions), dtype=bool)
+            overlapping[query[distance == 0]] = True
+            keep = (distance == 0) | ~overlapping[query]
+            query, target, distance = query[keep], target[keep], distance[keep]
+        keep = numpy.abs(distance) < thresh_dist
+        query, target, distance = query[keep], target[keep], distance[keep]
+        # Report the region before self ahead of the one after it
+        order = numpy.lexsort((distance, query))
+        query, target, distance = query[order], target[order], distance[order]
+
+        names = regions.names.tolist() if regions.names is not None else [None] * len(regions)
+        target_names = targets.names.tolist() if targets.names is not None else [None] * len(targets)
         res = []
-        for s in self:
-            cont_loop = True
-            cont_overlap = False
-            asso_names = {"overlap": [], "close_l": [], "close_r": []}
-            while cont_loop:
-                if strand_specific and s.orientation != y[j].orientation:
-                    if j == last_j:
-                        cont_loop = False
-                    else:
-                        j += 1
-                else:
-                    d = s.distance(y[j])
-                    if d == 0:
-                        asso_names["overlap"].append([s.name, str(0), y[j].name])
-                        if not cont_overlap:
-                            if strand_specific and s.orientation == "+":
-                                pre_inter[0] = j
-                            elif strand_specific and s.orientation == "-":
-                                pre_inter[1] = j
-                            elif not strand_specific:
-                                pre_inter = j
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
-                            cont_overlap = True
-                    elif asso_names["overlap"] and d != 0:
-                        if strand_specific:
-                            if pre_inter[0] > 0 and pre_inter[1] > 0:
-                                j = min(pre_inter)
-                            elif pre_inter[0] == 0 and pre_inter[1] > 0:
-                                j = pre_inter[1]
-                            elif pre_inter[0] > 0 and pre_inter[1] == 0:
-                                j = pre_inter[0]
-                        elif s.chrom == y[j].chrom and pre_inter > 0:
-                            j = pre_inter
-                        cont_loop = False
-                    elif 0 < d < thresh_dist:
-                        if s > y[j]:
-                            asso_names["close_l"] = [[s.name, "-" + str(d), y[j].name]]
-                        elif s < y[j]:
-                            asso_names["close_r"] = [[s.name, "+" + str(d), y[j].name]]
-                            cont_loop = False
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
-                    elif s < y[j]:
-                        if strand_specific and s.orientation == "+":
-                            if s.chrom == y[j].chrom and pre_inter[0] > 0:
-                                j = pre_inter[0]
-                        elif strand_specific and s.orientation == "-":
-                            if s.chrom == y[j].chrom and pre_inter[1] > 0:
-                                j = pre_inter[1]
-                        elif s.chrom == y[j].chrom and pre_inter > 0:
-                            j = pre_inter
-                        cont_loop = False
-                    elif s > y[j]:
-                        if j == last_j:
-                            cont_loop = False
-                        else:
-                            j += 1
-
-            if asso_names["overlap"] and not ignore_overlap:
-                last_one = ["x", 0, "x"]
-                for line in asso_names["overlap"]:
-                    if line[2] == last_one[2]:
-                        continue
-                    else:
-                        res += [line]
-                        last_one = line
-            if asso_names["close_l"]:
-                res += asso_names["close_l"]
-            if asso_names["close_r"]:
-                res += asso_names["close_r"]
-
+        last = None
+        for q, t, d in zip(query.tolist(), target.tolist(), distance.tolist()):
+            if d == 0:
+                # Overlapping regions of y with the same name are reported once
+                if last == (q, target_names[t]):
+                    continue
+                last = (q, target_names[t])
+                res.append([names[q], "0", target_names[t]])
+            elif d < 0:
+                res.append([names[q], "-" + str(-d), target_names[t]])
+            else:
+                res.append([names[q], "+" + str(d), target_names[t]])
         return res
 
     def cut_regions(self, y, keep="upstream"):
@@ -2615,7 +2408,7 @@ class GenomicRegionSet:
             names = []
             convert_dic = {"A": "T", "T": "A", "C": "G", "G": "C"}
             iter_a = iter(self)
-            s = iter_a.next()
+            s = next(iter_a)
             last_j = len(target) - 1
             j = 0
             cont_loop = True
@@ -2638,7 +2431,7 @@ class GenomicRegionSet:
                         if s.orientation == target[j].orientation:
                             names.append(target[j].name)
                             try:
-                                s = iter_a.next()
+                                s = next(iter_a)
                                 # j = pre_j
                             except:
                                 cont_loop = False
@@ -2658,7 +2451,7 @@ class GenomicRegionSet:
                             n = target[j].name
                         names.append(n)
                         try:
-                            s = iter_a.next()
+                            s = next(iter_a)
                             # j = pre_j
                         except:
                             cont_loop = False
@@ -2671,7 +2464,7 @@ class GenomicRegionSet:
                 elif s < target[j]:
                     names.append(".")
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                         # j = pre_j
                     except:
                         cont_loop = False
@@ -2685,7 +2478,7 @@ class GenomicRegionSet:
                 else:
                     names.append(".")
                     try:
-                        s = iter_a.next()
+                        s = next(iter_a)
                         # j = pre_j
                     except:
                         cont_loop = False
@@ -2727,15 +2520,20 @@ class GenomicRegionSet:
             return z
 
         else:
-            pull_regions = []
-            for i, s in enumerate(self):
-                # pull_regions.append([s])
-                # print(s.data)
-                for ss in y:
-                    if s.overlap(ss, strandness=strandness):
-                        # pull_regions[i].append(ss)
-                        # print(ss.data)
-                        pull_regions.append([s, ss])
+            # All overlapping pairs, in the order of self and y
+            a, b = self.as_array(), y.as_array()
+            b_order = b.sort_order()
+            b = b.take(b_order)
+            if strandness:
+                keys = kernels.region_keys([a, b], strand_specific=True)
+                (a_order, t_order), (a_line, b_line), _, ranks = kernels.keyed_line([a, b], keys)
+                query, target = kernels.overlap_pairs(a_line, b_line, ranks)
+                query, target = a_order[query], t_order[target]
+            else:
+                query, target = kernels.overlap_pairs(a, b)
+            target = b_order[target]
+            order = numpy.lexsort((target, query))
+            pull_regions = [[self[i], y[j]] for i, j in zip(query[order].tolist(), target[order].tolist())]
 
             # print(len(pull_regions))
             for cc in pull_regions:
@@ -26,11 +26,12 @@ class GenomicVariant(GenomicRegion):
     .. note:: all necessary information are contained in a VCF file.
     """
 
+    __slots__ = ['pos', 'id', 'ref', 'alt', 'qual', 'filter', 'info', 'format', 'genotype', 'samples']
+
     def __init__(self, chrom, pos, ref, alt, qual, filter=None, id=None, info=None, format=None, genotype=None,
                  samples=None):
         GenomicRegion.__init__(self, chrom, pos, pos + 1)
 
-        self.chrom = str(chrom)
         self.pos = int(pos)
         self.id = id
         self.ref = ref
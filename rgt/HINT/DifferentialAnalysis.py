@@ -2,7 +2,7 @@ from __future__ import print_function
 
 import os
 import numpy as np
-from pysam import Samfile, Fastafile
+from pysam import Samfile
 from math import ceil, floor
 from Bio import motifs
 import matplotlib
@@ -22,6 +22,7 @@ from multiprocessing import Pool
 from rgt.Util import ErrorHandler, AuxiliaryFunctions, GenomeData, HmmData
 from rgt.GenomicRegionSet import GenomicRegionSet
 from rgt.HINT.biasTable import BiasTable
+from rgt.TwoBitGenome import TwoBitGenome
 
 """
 Perform differential footprints analysis based on the prediction of transcription factor binding sites.
@@ -98,7 +99,7 @@ def get_raw_signal(arguments):
     bam2 = Samfile(reads_file2, "rb")
 
     genome_data = GenomeData(organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     signal_1 = np.zeros(window_size)
     signal_2 = np.zeros(window_size)
@@ -163,7 +164,7 @@ def get_bc_signal(arguments):
     bam2 = Samfile(reads_file2, "rb")
 
     genome_data = GenomeData(organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     signal_1 = np.zeros(window_size)
     signal_2 = np.zeros(window_size)
@@ -310,7 +311,7 @@ def bias_correction(chrom, start, end, bam, bias_table, genome_file_name, forwar
     defaultKmerValue = 1.0
 
     # Initialization
-    fastaFile = Fastafile(genome_file_name)
+    fastaFile = TwoBitGenome.load(genome_file_name)
     fBiasDict = bias_table[0]
     rBiasDict = bias_table[1]
     k_nb = len(fBiasDict.keys()[0])
@@ -402,7 +403,6 @@ def bias_correction(chrom, start, end, bam, bias_table, genome_file_name, forwar
         r_last = ar[i - (window / 2) + 1]
 
     # Termination
-    fastaFile.close()
     return bc_signal
 
 
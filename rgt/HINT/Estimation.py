@@ -6,7 +6,7 @@ from math import floor
 
 from Bio import motifs
 # External
-from pysam import Samfile, Fastafile
+from pysam import Samfile
 
 from rgt.GenomicRegionSet import GenomicRegionSet
 from rgt.Util import AuxiliaryFunctions, GenomeData, HmmData
@@ -55,7 +55,7 @@ def estimate_bias_kmer(args):
     # Initializing bam and fasta
     bamFile = Samfile(args.reads_file, "rb")
     genome_data = GenomeData(args.organism)
-    fastaFile = Fastafile(genome_data.get_genome())
+    fastaFile = genome_data.get_genome_sequence()
     regions = GenomicRegionSet("regions")
     regions.read(args.regions_file)
 
@@ -145,7 +145,6 @@ def estimate_bias_kmer(args):
 
     # Closing files
     bamFile.close()
-    fastaFile.close()
 
     # Creating bias dictionary
     alphabet = ["A", "C", "G", "T"]
@@ -188,7 +187,7 @@ def estimate_bias_pwm(args):
     # Initializing bam and fasta
     bamFile = Samfile(args.reads_file, "rb")
     genome_data = GenomeData(args.organism)
-    fastaFile = Fastafile(genome_data.get_genome())
+    fastaFile = genome_data.get_genome_sequence()
     regions = GenomicRegionSet("regions")
     regions.read(args.regions_file)
 
@@ -264,7 +263,6 @@ def estimate_bias_pwm(args):
 
     # Closing files
     bamFile.close()
-    fastaFile.close()
 
     # Output pwms
     os.system("mkdir -p " + os.path.join(args.output_location, "pfm"))
@@ -415,7 +413,7 @@ def create_signal(args, regions):
 
     bam_file = Samfile(args.reads_file, "rb")
     genome_data = GenomeData(args.organism)
-    fasta_file = Fastafile(genome_data.get_genome())
+    fasta_file = genome_data.get_genome_sequence()
 
     for region in regions:
         # Fetching observed reads
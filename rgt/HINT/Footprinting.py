@@ -19,7 +19,7 @@ from sklearn.externals import joblib
 
 # Test
 import numpy as np
-from pysam import Fastafile, Samfile
+from pysam import Samfile
 from scipy.stats import scoreatpercentile
 
 
@@ -238,7 +238,7 @@ def atac_seq(args):
     regions.merge()
 
     bam = Samfile(args.input_files[0], "rb")
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     if args.paired_end:
         for region in original_regions:
@@ -808,13 +808,7 @@ def post_processing(footprints, original_regions, fp_min_size, fp_ext, genome_da
     footprints_overlap.merge()
 
     # Fetching chromosome sizes
-    chrom_sizes_file_name = genome_data.get_chromosome_sizes()
-    chrom_sizes_file = open(chrom_sizes_file_name, "r")
-    chrom_sizes_dict = dict()
-    for chrom_sizes_entry_line in chrom_sizes_file:
-        chrom_sizes_entry_vec = chrom_sizes_entry_line.strip().split("\t")
-        chrom_sizes_dict[chrom_sizes_entry_vec[0]] = int(chrom_sizes_entry_vec[1])
-    chrom_sizes_file.close()
+    chrom_sizes_dict = genome_data.get_chromosome_sizes_table().as_dict()
 
     # Evaluating TC
     for f in footprints_overlap.sequences:
@@ -955,7 +949,7 @@ def atac_test(args):
     regions.merge()
 
     bam = Samfile(args.input_files[0], "rb")
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     if not args.unstrand_specific:
         for region in regions:
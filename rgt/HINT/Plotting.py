@@ -5,7 +5,7 @@ from __future__ import print_function
 ###################################################################################################
 import os
 import numpy as np
-from pysam import Samfile, Fastafile
+from pysam import Samfile
 from Bio import motifs
 import matplotlib
 
@@ -101,7 +101,7 @@ def seq_logo(args):
          ("T", [0.0] * args.window_size), ("N", [0.0] * args.window_size)])
 
     genome_data = GenomeData(args.organism)
-    fasta_file = Fastafile(genome_data.get_genome())
+    fasta_file = genome_data.get_genome_sequence()
     bam = Samfile(args.reads_file, "rb")
     regions = GenomicRegionSet("Peaks")
     regions.read(args.region_file)
@@ -182,7 +182,7 @@ def bias_raw_bc_line(args):
                                   table_file_name_R=bias_table_list[1])
 
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
     pwm_dict = dict([("A", [0.0] * args.window_size), ("C", [0.0] * args.window_size),
                      ("G", [0.0] * args.window_size), ("T", [0.0] * args.window_size),
                      ("N", [0.0] * args.window_size)])
@@ -409,7 +409,7 @@ def raw_bc_line(args):
                                   table_file_name_R=bias_table_list[1])
 
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
     pwm_dict = dict([("A", [0.0] * args.window_size), ("C", [0.0] * args.window_size),
                      ("G", [0.0] * args.window_size), ("T", [0.0] * args.window_size),
                      ("N", [0.0] * args.window_size)])
@@ -542,7 +542,7 @@ def bias_raw_bc_strand_line(args):
                                   table_file_name_R=bias_table_list[1])
 
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
     pwm_dict = dict([("A", [0.0] * args.window_size), ("C", [0.0] * args.window_size),
                      ("G", [0.0] * args.window_size), ("T", [0.0] * args.window_size),
                      ("N", [0.0] * args.window_size)])
@@ -702,7 +702,7 @@ def bias_raw_bc_strand_line2(args):
                                   table_file_name_R=bias_table_list[1])
 
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
     pwm_dict = dict([("A", [0.0] * args.window_size), ("C", [0.0] * args.window_size),
                      ("G", [0.0] * args.window_size), ("T", [0.0] * args.window_size),
                      ("N", [0.0] * args.window_size)])
@@ -926,7 +926,7 @@ def strand_line(args):
                                       table_file_name_R=bias_table_list[1])
 
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     num_sites = 0
     mpbs_regions = GenomicRegionSet("Motif Predicted Binding Sites")
@@ -1081,7 +1081,7 @@ def unstrand_line(args):
                                       table_file_name_R=bias_table_list[1])
 
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     num_sites = 0
     mpbs_regions = GenomicRegionSet("Motif Predicted Binding Sites")
@@ -1339,7 +1339,7 @@ def fragment_size_bc_line(args):
     genomic_signal.load_sg_coefs(11)
     bam = Samfile(args.reads_file, "rb")
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     bias_table = BiasTable()
     bias_table_list = args.bias_table.split(",")
@@ -1562,7 +1562,7 @@ class Plot:
                                           table_file_name_R=bias_table_list[1])
 
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
 
         num_sites = 0
         mpbs_regions = GenomicRegionSet("Motif Predicted Binding Sites")
@@ -1711,7 +1711,7 @@ class Plot:
                                        table_file_name_R=bias_table_list[1])
 
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
         pwm_dict = dict([("A", [0.0] * self.window_size), ("C", [0.0] * self.window_size),
                          ("G", [0.0] * self.window_size), ("T", [0.0] * self.window_size),
                          ("N", [0.0] * self.window_size)])
@@ -1952,7 +1952,7 @@ class Plot:
 
     def line4(self):
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
 
         mpbs_regions = GenomicRegionSet("Motif Predicted Binding Sites")
         mpbs_regions.read(self.motif_file)
@@ -2092,7 +2092,7 @@ class Plot:
 
     def atac_dnase_bc_line(self, reads_file1, reads_file2, bias_table1, bias_table2):
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
         pwm_dict = dict([("A", [0.0] * self.window_size), ("C", [0.0] * self.window_size),
                          ("G", [0.0] * self.window_size), ("T", [0.0] * self.window_size),
                          ("N", [0.0] * self.window_size)])
@@ -2311,7 +2311,7 @@ class Plot:
 
     def atac_dnase_raw_line(self, reads_file1, reads_file2):
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
         pwm_dict = dict([("A", [0.0] * self.window_size), ("C", [0.0] * self.window_size),
                          ("G", [0.0] * self.window_size), ("T", [0.0] * self.window_size),
                          ("N", [0.0] * self.window_size)])
@@ -2566,7 +2566,7 @@ class Plot:
         genomic_signal.load_sg_coefs(11)
         bam = Samfile(self.reads_file, "rb")
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
 
         bias_table = BiasTable()
         bias_table_list = bias_table_files.split(",")
@@ -2842,7 +2842,7 @@ class Plot:
 
     def strand_line_by_size(self, bias_tables):
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
 
         mpbs_regions = GenomicRegionSet("Motif Predicted Binding Sites")
         mpbs_regions.read(self.motif_file)
@@ -3296,7 +3296,7 @@ class Plot:
 
     def unstrand_line_by_size(self, bias_tables):
         genome_data = GenomeData(self.organism)
-        fasta = Fastafile(genome_data.get_genome())
+        fasta = genome_data.get_genome_sequence()
 
         mpbs_regions = GenomicRegionSet("Motif Predicted Binding Sites")
         mpbs_regions.read(self.motif_file)
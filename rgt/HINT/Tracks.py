@@ -1,12 +1,13 @@
 import os
 from argparse import SUPPRESS
 import numpy as np
-from pysam import Samfile, Fastafile
+from pysam import Samfile
 from scipy.stats import scoreatpercentile
 
 # Internal
 from rgt.Util import GenomeData, HmmData, ErrorHandler
 from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.BigWig import BigWigWriter
 from rgt.HINT.biasTable import BiasTable
 from rgt.HINT.signalProcessing import GenomicSignal
 
@@ -74,7 +75,13 @@ def get_raw_tracks(args):
     regions.merge()
     reads_file = GenomicSignal()
 
-    with open(output_fname, "a") as output_f:
+    # With --bigWig, the signal is written to the bigWig file directly
+    if args.bigWig:
+        output_f = _bigwig_writer(args, "{}.bw".format(args.output_prefix))
+    else:
+        output_f = open(output_fname, "a")
+
+    with output_f:
         for region in regions:
             # Raw counts
             signal = [0.0] * (region.final - region.initial)
@@ -94,16 +101,7 @@ def get_raw_tracks(args):
                 std = np.std(signal)
                 signal = reads_file.hon_norm_atac(signal, perc, std)
 
-            output_f.write("fixedStep chrom=" + region.chrom + " start=" + str(region.initial + 1) + " step=1\n" +
-                           "\n".join([str(e) for e in np.nan_to_num(signal)]) + "\n")
-    output_f.close()
-
-    if args.bigWig:
-        genome_data = GenomeData(args.organism)
-        chrom_sizes_file = genome_data.get_chromosome_sizes()
-        bw_filename = os.path.join(args.output_location, "{}.bw".format(args.output_prefix))
-        os.system(" ".join(["wigToBigWig", output_fname, chrom_sizes_file, bw_filename, "-verbose=0"]))
-        os.remove(output_fname)
+            _write_signal(output_f, region, np.nan_to_num(signal))
 
 
 def get_bc_tracks(args):
@@ -121,7 +119,7 @@ def get_bc_tracks(args):
 
     bam = Samfile(args.input_files[0], "rb")
     genome_data = GenomeData(args.organism)
-    fasta = Fastafile(genome_data.get_genome())
+    fasta = genome_data.get_genome_sequence()
 
     hmm_data = HmmData()
     if args.bias_table:
@@ -138,8 +136,12 @@ def get_bc_tracks(args):
         fname_forward = os.path.join(args.output_location, "{}_forward.wig".format(args.output_prefix))
         fname_reverse = os.path.join(args.output_location, "{}_reverse.wig".format(args.output_prefix))
 
-        f_forward = open(fname_forward, "a")
-        f_reverse = open(fname_reverse, "a")
+        if args.bigWig:
+            f_forward = _bigwig_writer(args, "{}_forward.bw".format(args.output_prefix))
+            f_reverse = _bigwig_writer(args, "{}_reverse.bw".format(args.output_prefix))
+        else:
+            f_forward = open(fname_forward, "a")
+            f_reverse = open(fname_reverse, "a")
         for region in regions:
             signal_f, signal_r = reads_file.get_bc_signal_by_fragment_length(
                 ref=region.chrom, start=region.initial, end=region.final, bam=bam, fasta=fasta, bias_table=bias_table,
@@ -157,30 +159,20 @@ def get_bc_tracks(args):
                 std = np.std(signal_r)
                 signal_r = reads_file.hon_norm_atac(signal_r, perc, std)
 
-            f_forward.write("fixedStep chrom=" + region.chrom + " start=" + str(region.initial + 1) + " step=1\n" +
-                            "\n".join([str(e) for e in np.nan_to_num(signal_f)]) + "\n")
-
-            f_reverse.write("fixedStep chrom=" + region.chrom + " start=" + str(region.initial + 1) + " step=1\n" +
-                            "\n".join([str(-e) for e in np.nan_to_num(signal_r)]) + "\n")
+            _write_signal(f_forward, region, np.nan_to_num(signal_f))
+            _write_signal(f_reverse, region, -np.nan_to_num(signal_r))
 
         f_forward.close()
         f_reverse.close()
 
-        if args.bigWig:
-            genome_data = GenomeData(args.organism)
-            chrom_sizes_file = genome_data.get_chromosome_sizes()
-
-            bw_filename = os.path.join(args.output_location, "{}_forward.bw".format(args.output_prefix))
-            os.system(" ".join(["wigToBigWig", fname_forward, chrom_sizes_file, bw_filename, "-verbose=0"]))
-            os.remove(fname_forward)
-
-            bw_filename = os.path.join(args.output_location, "{}_reverse.bw".format(args.output_prefix))
-            os.system(" ".join(["wigToBigWig", fname_reverse, chrom_sizes_file, bw_filename, "-verbose=0"]))
-            os.remove(fname_reverse)
-
     else:
         output_fname = os.path.join(args.output_location, "{}.wig".format(args.output_prefix))
-        with open(output_fname, "a") as output_f:
+        if args.bigWig:
+            output_f = _bigwig_writer(args, "{}.bw".format(args.output_prefix))
+        else:
+            output_f = open(output_fname, "a")
+
+        with output_f:
             for region in regions:
                 signal = reads_file.get_bc_signal_by_fragment_length(ref=region.chrom, start=region.initial,
                                                                      end=region.final,
@@ -195,13 +187,19 @@ def get_bc_tracks(args):
                     std = np.std(signal)
                     signal = reads_file.hon_norm_atac(signal, perc, std)
 
-                output_f.write("fixedStep chrom=" + region.chrom + " start=" + str(region.initial + 1) + " step=1\n" +
-                               "\n".join([str(e) for e in np.nan_to_num(signal)]) + "\n")
-        output_f.close()
+                _write_signal(output_f, region, np.nan_to_num(signal))
 
-        if args.bigWig:
-            genome_data = GenomeData(args.organism)
-            chrom_sizes_file = genome_data.get_chromosome_sizes()
-            bw_filename = os.path.join(args.output_location, "{}.bw".format(args.output_prefix))
-            os.system(" ".join(["wigToBigWig", output_fname, chrom_sizes_file, bw_filename, "-verbose=0"]))
-            os.remove(output_fname)
+
+def _bigwig_writer(args, filename):
+    """Return a BigWigWriter for the file <filename> in the output location, with the chromosomes of the organism."""
+    genome_data = GenomeData(args.organism)
+    return BigWigWriter(os.path.join(args.output_location, filename), genome_data.get_chromosome_sizes())
+
+
+def _write_signal(output_f, region, signal):
+    """Write the per-base signal of the region as a fixedStep WIG section or to the BigWigWriter."""
+    if isinstance(output_f, BigWigWriter):
+        output_f.add_signal(region.chrom, region.initial, signal)
+    else:
+        output_f.write("fixedStep chrom=" + region.chrom + " start=" + str(region.initial + 1) + " step=1\n" +
+                       "\n".join([str(e) for e in signal]) + "\n")
@@ -4,12 +4,13 @@
 from math import log, ceil, floor, isnan
 import numpy as np
 from numpy import exp, array, abs, int, mat, linalg, convolve, nan_to_num
-from pysam import Samfile, Fastafile
+from pysam import Samfile
 from pysam import __version__ as ps_version
 from scipy.stats import scoreatpercentile
 
 # Internal
 from rgt.Util import AuxiliaryFunctions
+from rgt.TwoBitGenome import TwoBitGenome
 from rgt.HINT.pileupRegion import PileupRegion
 
 """
@@ -229,7 +230,7 @@ class GenomicSignal:
         defaultKmerValue = 1.0
 
         # Initialization
-        fastaFile = Fastafile(genome_file_name)
+        fastaFile = TwoBitGenome.load(genome_file_name)
         fBiasDict = bias_table[0]
         rBiasDict = bias_table[1]
         k_nb = len(fBiasDict.keys()[0])
@@ -311,7 +312,6 @@ class GenomicSignal:
             rLast = ar[i - (window / 2) + 1]
 
         # Termination
-        fastaFile.close()
         return bias_corrected_signal
 
     def bias_correction_atac(self, bias_table, genome_file_name, chrName, start, end,
@@ -322,7 +322,7 @@ class GenomicSignal:
         defaultKmerValue = 1.0
 
         # Initialization
-        fastaFile = Fastafile(genome_file_name)
+        fastaFile = TwoBitGenome.load(genome_file_name)
         fBiasDict = bias_table[0]
         rBiasDict = bias_table[1]
         k_nb = len(fBiasDict.keys()[0])
@@ -419,7 +419,6 @@ class GenomicSignal:
             rLast = ar[i - (window / 2) + 1]
 
         # Termination
-        fastaFile.close()
         return bias_corrected_signal_forward, bias_corrected_signal_reverse
 
     def bias_correction_atac2(self, bias_table, genome_file_name, chrName, start, end,
@@ -430,7 +429,7 @@ class GenomicSignal:
         defaultKmerValue = 1.0
 
         # Initialization
-        fastaFile = Fastafile(genome_file_name)
+        fastaFile = TwoBitGenome.load(genome_file_name)
         fBiasDict = bias_table[0]
         rBiasDict = bias_table[1]
         k_nb = len(fBiasDict.keys()[0])
@@ -523,7 +522,6 @@ class GenomicSignal:
             rLast = ar[i - (window / 2) + 1]
 
         # Termination
-        fastaFile.close()
         return bc_signal
 
     def hon_norm_atac(self, sequence, mean, std):
@@ -670,7 +668,7 @@ class GenomicSignal:
             defaultKmerValue = 1.0
 
             # Initialization
-            fasta = Fastafile(genome_file_name)
+            fasta = TwoBitGenome.load(genome_file_name)
             fBiasDict = bias_table[0]
             rBiasDict = bias_table[1]
             k_nb = len(fBiasDict.keys()[0])
@@ -2,8 +2,8 @@
 from __future__ import print_function
 import copy
 
-# External
-import pysam
+# Internal
+from .TwoBitGenome import TwoBitGenome
 
 """
 Sequence
@@ -172,10 +172,11 @@ class SequenceSet:
                     print(ss, file=f)
 
     def read_regions(self, regionset, genome_fasta, ex=0):
-        genome = pysam.Fastafile(genome_fasta)
+        genome = TwoBitGenome.load(genome_fasta)
+        regions = list(regionset)
+        sequences = genome.fetch_many([(r.chrom, r.initial - ex, r.final + ex) for r in regions])
 
-        for region in regionset:
-            seq = genome.fetch(region.chrom, region.initial - ex, region.final + ex)
+        for region, seq in zip(regions, sequences):
             seq = seq.upper()
 
             if region.orientation == "-":
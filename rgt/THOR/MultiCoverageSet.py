@@ -37,19 +37,20 @@ VERBOSE = None
 
 
 class MultiCoverageSet(DualCoverageSet):
-    def _help_init(self, path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, dim, regions, norm_regionset, strand_cov):
+    def _help_init(self, path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, dim, regions, norm_regionset, strand_cov, n_jobs=1):
         """Return self.covs and self.inputs as CoverageSet"""
         self.exts = exts
+        tasks = []
         self.covs = [CoverageSet('file' + str(i), regions) for i in range(dim)]
         for i, c in enumerate(self.covs):
-            c.coverage_from_bam(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup, binsize=binsize,\
-                                stepsize=stepsize, get_strand_info = strand_cov)
+            tasks.append((c, dict(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup, binsize=binsize,
+                                  stepsize=stepsize, get_strand_info=strand_cov)))
         self.covs_avg = [CoverageSet('cov_avg'  + str(i) , regions) for i in range(2)]
         if path_inputs:
             self.inputs = [CoverageSet('input' + str(i), regions) for i in range(len(path_inputs))]
             for i, c in enumerate(self.inputs):
-                c.coverage_from_bam(bam_file=path_inputs[i], extension_size=exts_inputs[i], rmdup=rmdup, binsize=binsize,\
-                                stepsize=stepsize, get_strand_info = strand_cov)
+                tasks.append((c, dict(bam_file=path_inputs[i], extension_size=exts_inputs[i], rmdup=rmdup,
+                                      binsize=binsize, stepsize=stepsize, get_strand_info=strand_cov)))
             self.input_avg = [CoverageSet('input_avg'  + str(i), regions) for i in range(2)]
         else:
             self.inputs = []
@@ -57,11 +58,14 @@ class MultiCoverageSet(DualCoverageSet):
         if norm_regionset:
             self.norm_regions = [CoverageSet('norm_region' + str(i), norm_regionset) for i in range(dim)]
             for i, c in enumerate(self.norm_regions):
-                c.coverage_from_bam(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup, binsize=binsize,\
-                                    stepsize=stepsize, get_strand_info = strand_cov)
+                tasks.append((c, dict(bam_file=path_bamfiles[i], extension_size=exts[i], rmdup=rmdup,
+                                      binsize=binsize, stepsize=stepsize, get_strand_info=strand_cov)))
             self.input_avg = [CoverageSet('input_avg'  + str(i), regions) for i in range(2)]
         else:
             self.norm_regions = None
+
+        # All replicates, inputs and normalization regions share one pool of processes
+        CoverageSet.coverage_from_bam_parallel(tasks, n_jobs)
     
     def _get_covs(self, DCS, i):
         """For a multivariant Coverageset, return coverage cov1 and cov2 at position i"""
@@ -171,7 +175,7 @@ class MultiCoverageSet(DualCoverageSet):
                  verbose, debug, no_gc_content, rmdup, path_bamfiles, exts, path_inputs, exts_inputs, \
                  factors_inputs, chrom_sizes_dict, scaling_factors_ip, save_wig, strand_cov, housekeeping_genes,\
                  tracker, end, counter, gc_content_cov=None, avg_gc_content=None, gc_hist=None, output_bw=True,\
-                 folder_report=None, report=None, save_input=False, m_threshold=80, a_threshold=95):
+                 folder_report=None, report=None, save_input=False, m_threshold=80, a_threshold=95, n_jobs=1):
         """Compute CoverageSets, GC-content and normalize input-DNA and IP-channel"""
         self.genomicRegions = regions
         self.binsize = binsize
@@ -195,7 +199,7 @@ class MultiCoverageSet(DualCoverageSet):
         VERBOSE = verbose
         
         #make data nice
-        self._help_init(path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, sum(dims), regions, norm_regionset, strand_cov = strand_cov)
+        self._help_init(path_bamfiles, exts, rmdup, binsize, stepsize, path_inputs, exts_inputs, sum(dims), regions, norm_regionset, strand_cov = strand_cov, n_jobs=n_jobs)
         if self.count_positive_signal() < 1:
             self.no_data = True
             return None
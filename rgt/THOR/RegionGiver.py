@@ -25,6 +25,7 @@ import sys
 
 from ..GenomicRegion import GenomicRegion
 from ..GenomicRegionSet import GenomicRegionSet
+from ..Util import ChromosomeSizes
 
 class RegionGiver:
     regionset = GenomicRegionSet('')
@@ -45,14 +46,11 @@ class RegionGiver:
                         self.chrom_sizes_dict[c] = e
         else:
             print("Call DPs on whole genome.", file=sys.stderr)
-            with open(chrom_sizes) as f:
-                for line in f:
-                    line = line.strip()
-                    line = line.split('\t')
-                    chrom, end = line[0], int(line[1])
+            table = ChromosomeSizes.load(chrom_sizes)
+            for chrom, end in zip(table.names, table.sizes.tolist()):
             #if chrom in contained_chrom:
-                    self.regionset.add(GenomicRegion(chrom=chrom, initial=0, final=end))
-                    self.chrom_sizes_dict[chrom] = end
+                self.regionset.add(GenomicRegion(chrom=chrom, initial=0, final=end))
+                self.chrom_sizes_dict[chrom] = end
         
         if not self.regionset.sequences:
             print('something wrong here', file=sys.stderr)
@@ -30,7 +30,8 @@ from ..GenomicRegionSet import GenomicRegionSet
 from ..THOR.get_extension_size import get_extension_size
 from ..THOR.get_fast_gen_pvalue import get_log_pvalue_new
 from .input_parser import input_parser
-from ..Util import which, npath
+from ..Util import npath
+from ..BigWig import merge as merge_bigwig
 from .. import __version__
 
 # External
@@ -51,25 +52,13 @@ def merge_output(bamfiles, dims, options, no_bw_files, chrom_sizes):
         rep = i if i < dims[0] else i - dims[0]
         sig = 1 if i < dims[0] else 2
 
-        temp_bed = npath(options.name + '-s%s-rep%s_temp.bed' % (sig, rep))
-
         files = [options.name + '-' + str(j) + '-s%s-rep%s.bw' %(sig, rep) for j in no_bw_files]
         if len(no_bw_files) > len(bamfiles):
-            files = filter(lambda x: isfile(x), files)
-            t = ['bigWigMerge'] + files + [temp_bed]
-            c = " ".join(t)
-            os.system(c)
-
-            os.system("LC_COLLATE=C sort -k1,1 -k2,2n " + temp_bed + ' > ' + temp_bed +'.sort')
-
-            t = ['bedGraphToBigWig', temp_bed + '.sort', chrom_sizes, options.name + '-s%s-rep%s.bw' % (sig, rep)]
-            c = " ".join(t)
-            os.system(c)
+            files = [f for f in files if isfile(f)]
+            merge_bigwig(files, options.name + '-s%s-rep%s.bw' % (sig, rep), chrom_sizes)
 
             for f in files:
                 os.remove(f)
-            os.remove(temp_bed)
-            os.remove(temp_bed + ".sort")
         else:
             ftarget = [options.name + '-s%s-rep%s.bw' %(sig, rep) for j in no_bw_files]
             for i in range(len(ftarget)):
@@ -420,7 +409,7 @@ def initialize(name, dims, genome_path, regions, stepsize, binsize, bamfiles, ex
                inputs, exts_inputs, factors_inputs, chrom_sizes, verbose, no_gc_content, \
                tracker, debug, norm_regions, scaling_factors_ip, save_wig, housekeeping_genes, \
                test, report, chrom_sizes_dict, counter, end, gc_content_cov=None, avg_gc_content=None, \
-               gc_hist=None, output_bw=True, save_input=False, m_threshold=80, a_threshold=95, rmdup=False):
+               gc_hist=None, output_bw=True, save_input=False, m_threshold=80, a_threshold=95, rmdup=False, n_jobs=1):
     """Initialize the MultiCoverageSet"""
     regionset = regions
     regionset.sequences.sort()
@@ -443,7 +432,7 @@ def initialize(name, dims, genome_path, regions, stepsize, binsize, bamfiles, ex
                                      tracker=tracker, gc_content_cov=gc_content_cov, avg_gc_content=avg_gc_content,
                                      gc_hist=gc_hist, end=end, counter=counter, output_bw=output_bw,
                                      folder_report=FOLDER_REPORT, report=report, save_input=save_input,
-                                     m_threshold=m_threshold, a_threshold=a_threshold)
+                                     m_threshold=m_threshold, a_threshold=a_threshold, n_jobs=n_jobs)
     return multi_cov_set
 
 
@@ -537,6 +526,9 @@ def handle_input():
                      help="Define the A threshold of percentile for training TMM. [default: %default]")
     group.add_option("--rmdup", default=False, dest="rmdup", action="store_true",
                      help="Remove the duplicate reads [default: %default]")
+    group.add_option("--n-jobs", default=1, dest="n_jobs", type="int",
+                     help="Number of processes computing the coverage of the BAM files (-1: one per processor). "
+                          "[default: %default]")
     parser.add_option_group(group)
 
     (options, args) = parser.parse_args()
@@ -599,10 +591,6 @@ def handle_input():
         d = str(datetime.now()).replace("-", "_").replace(":", "_").replace(" ", "_").replace(".", "_").split("_")
         options.name = "THOR-exp" + "-" + "_".join(d[:len(d) - 1])
 
-    if not which("wigToBigWig") or not which("bedGraphToBigWig") or not which("bigWigMerge"):
-        print("Warning: wigToBigWig, bigWigMerge or bedGraphToBigWig not found! Signal will not be stored!",
-              file=sys.stderr)
-
     if options.outputdir:
         options.outputdir = npath(options.outputdir)
         if isdir(options.outputdir) and sum(
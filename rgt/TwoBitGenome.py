@@ -0,0 +1,423 @@
+"""
+TwoBitGenome
+===================
+TwoBitGenome reads genome sequences from a packed copy of a FASTA file instead of parsing the FASTA file with
+pysam.Fastafile for every region. The copy (FASTA file + CACHE_SUFFIX) is built once, next to the FASTA file, and is
+rebuilt whenever the FASTA file changes. It stores per chromosome:
+
+    - the bases as 2-bit codes (A=0, C=1, G=2, T=3), four bases per byte
+    - the runs of other characters (N and the other IUPAC codes) with their character
+    - the runs of lowercase (soft-masked) bases
+
+The file is memory-mapped, so opening it is cheap and all processes share the pages of the operating system cache.
+fetch returns the same strings as pysam.Fastafile.fetch (case and IUPAC codes included) and fetch_many reads a batch
+of regions at once, as strings or as arrays of base codes.
+
+"""
+
+###############################################################################
+# Libraries
+###############################################################################
+
+# Python
+from __future__ import print_function
+from __future__ import division
+import os
+import mmap
+import json
+import struct
+import hashlib
+import tempfile
+import numpy
+
+# Internal
+from .GenomicRegionArray import GenomicRegionArray, CHROMOSOMES
+from .Util import file_stamp, replace_file
+
+###############################################################################
+# Constants
+###############################################################################
+
+CACHE_SUFFIX = ".rgt2bit"
+CACHE_VERSION = 1
+MAGIC = b"RGT2BIT\x01"
+
+# Base codes of fetch_many(as_codes=True); every character but A, C, G and T (in any case) is N_CODE
+BASES = b"ACGT"
+N_CODE = 4
+
+# Number of bases decoded at once; bounds the temporary memory of fetch and fetch_many
+BATCH_SIZE = 1 << 22
+
+# fetch decodes ranges of at most SHORT_SIZE bases which overlap at most SHORT_RUNS runs of other characters and of
+# lowercase bases run by run instead of in a batch
+SHORT_SIZE = 1 << 16
+SHORT_RUNS = 32
+
+_UNPACK_SHIFTS = numpy.array([6, 4, 2, 0], dtype=numpy.uint8)
+_LETTERS = numpy.frombuffer(BASES, dtype=numpy.uint8)
+_CODES = numpy.full(256, 255, dtype=numpy.uint8)
+for _code, _base in enumerate(BASES):
+    _CODES[_base] = _code
+    _CODES[_base | 0x20] = _code
+
+
+###############################################################################
+# Building
+###############################################################################
+
+def _fasta_key(fasta):
+    """Return the key of a packed genome: format version, size and modification time of the FASTA file."""
+    return [CACHE_VERSION] + list(file_stamp(fasta))
+
+
+def _runs(mask):
+    """Return the initial and final positions of the runs of True in the boolean array."""
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([False], mask, [False])).view(numpy.int8)))
+    return edges[0::2].astype(numpy.int64), edges[1::2].astype(numpy.int64)
+
+
+def _pack(sequence):
+    """Return the packed arrays of a chromosome sequence (bytes of the FASTA file, without line breaks)."""
+    raw = numpy.frombuffer(sequence, dtype=numpy.uint8)
+    codes = _CODES[raw]
+    other = codes == 255
+
+    # Runs of equal characters which are not A, C, G or T, in upper case
+    upper = raw & 0xDF
+    change = numpy.ones(len(raw) + 1, dtype=bool)
+    change[1:-1] = upper[1:] != upper[:-1]
+    bounded = numpy.concatenate(([False], other, [False]))
+    block_starts = numpy.flatnonzero(bounded[1:] & (change | ~bounded[:-1])).astype(numpy.int64)
+    block_ends = numpy.flatnonzero(bounded[:-1] & (change | ~bounded[1:])).astype(numpy.int64)
+    block_chars = upper[block_starts]
+
+    lower_starts, lower_ends = _runs((raw >= ord("a")) & (raw <= ord("z")))
+
+    codes[other] = 0
+    padded = numpy.zeros(-(-len(codes) // 4) * 4, dtype=numpy.uint8)
+    padded[:len(codes)] = codes
+    padded = padded.reshape(-1, 4)
+    packed = (padded[:, 0] << 6) | (padded[:, 1] << 4) | (padded[:, 2] << 2) | padded[:, 3]
+    return [("packed", packed), ("block_starts", block_starts), ("block_ends", block_ends),
+            ("block_chars", block_chars), ("lower_starts", lower_starts), ("lower_ends", lower_ends)]
+
+
+def _read_fasta(fasta):
+    """Yield the name and the sequence (bytes) of every chromosome of the FASTA file."""
+    name, lines = None, []
+    with open(fasta, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                if name is not None:
+                    yield name, b"".join(lines)
+                name, lines = line[1:].split()[0].decode(), []
+            else:
+                lines.append(line.strip())
+    if name is not None:
+        yield name, b"".join(lines)
+
+
+def build(fasta, path):
+    """Write the packed genome of the FASTA file to path.
+
+    The file starts with MAGIC, followed by the arrays of all chromosomes (8-byte aligned) and a JSON footer with
+    the chromosome names, lengths and array offsets. The last 8 bytes are the offset of the footer.
+    """
+    chroms = []
+    temp = "%s.%d.tmp" % (path, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(MAGIC)
+        for name, sequence in _read_fasta(fasta):
+            chrom = {"name": name, "length": len(sequence)}
+            for column, values in _pack(sequence):
+                f.write(b"\0" * (-f.tell() % 8))
+                chrom[column] = [f.tell(), len(values)]
+                f.write(values.tobytes())
+            chroms.append(chrom)
+        footer = f.tell()
+        f.write(json.dumps({"key": _fasta_key(fasta), "chroms": chroms}).encode())
+        f.write(struct.pack("<Q", footer))
+    replace_file(temp, path)
+
+
+def cache_path(fasta):
+    """Return the path of the packed genome of the FASTA file: next to it, or in the temporary directory if its
+    directory is not writable."""
+    fasta = os.path.abspath(fasta)
+    if os.access(os.path.dirname(fasta), os.W_OK):
+        return fasta + CACHE_SUFFIX
+    digest = hashlib.md5(fasta.encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), "rgt_" + digest + "_" + os.path.basename(fasta) + CACHE_SUFFIX)
+
+
+def _cover(initials, finals, length):
+    """Return a boolean array of the given length which is True inside the disjoint ranges."""
+    empty = initials == finals
+    if empty.any():
+        initials, finals = initials[~empty], finals[~empty]
+    delta = numpy.zeros(length + 1, dtype=numpy.int8)
+    delta[initials] = 1
+    delta[finals] -= 1
+    return numpy.cumsum(delta[:-1], dtype=numpy.int8).view(bool)
+
+
+###############################################################################
+# Class
+###############################################################################
+
+class TwoBitGenome:
+    """
+    Represent the sequences of a FASTA file, read from its packed copy. Use TwoBitGenome.load or
+    GenomeData.get_genome_sequence to open every genome only once per process.
+
+    *Keyword arguments:*
+
+        - fasta -- Path of the FASTA file. Its packed copy is built (or rebuilt) if needed.
+
+    *Variables:*
+
+        - self.references -- Tuple of chromosome names, in the order of the FASTA file.
+        - self.lengths -- Tuple of chromosome lengths.
+
+    """
+
+    # Opened TwoBitGenomes by absolute file name, with the stamp of the FASTA file
+    _loaded = {}
+
+    def __init__(self, fasta):
+        self.filename = os.path.abspath(fasta)
+        self.path = cache_path(self.filename)
+        key = _fasta_key(self.filename)
+        footer = self._open()
+        if footer is None or footer["key"] != key:
+            build(self.filename, self.path)
+            footer = self._open()
+
+        self._chroms = {}
+        for chrom in footer["chroms"]:
+            columns = {"length": chrom["length"]}
+            for column, dtype in [("packed", numpy.uint8), ("block_starts", numpy.int64),
+                                  ("block_ends", numpy.int64), ("block_chars", numpy.uint8),
+                                  ("lower_starts", numpy.int64), ("lower_ends", numpy.int64)]:
+                offset, count = chrom[column]
+                columns[column] = numpy.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+            self._chroms[chrom["name"]] = columns
+        self.references = tuple(chrom["name"] for chrom in footer["chroms"])
+        self.lengths = tuple(chrom["length"] for chrom in footer["chroms"])
+
+    def _open(self):
+        """Map the packed genome and return its footer, or None if there is no valid packed genome."""
+        try:
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._map[:len(MAGIC)] != MAGIC:
+                return None
+            footer = struct.unpack("<Q", self._map[-8:])[0]
+            return json.loads(self._map[footer:-8].decode())
+        except (IOError, OSError, ValueError, struct.error):
+            return None
+
+    @staticmethod
+    def load(fasta):
+        """Return the TwoBitGenome of the FASTA file, opening it only once per process (and again if it changes)."""
+        fasta = os.path.abspath(fasta)
+        stamp = file_stamp(fasta)
+        if stamp is None:
+            raise IOError("No such file: " + fasta)
+        cached = TwoBitGenome._loaded.get(fasta)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, TwoBitGenome(fasta))
+            TwoBitGenome._loaded[fasta] = cached
+        return cached[1]
+
+    def __len__(self):
+        return len(self.references)
+
+    def __contains__(self, reference):
+        return reference in self._chroms
+
+    @property
+    def nreferences(self):
+        return len(self.references)
+
+    def get_reference_length(self, reference):
+        """Returns the length of the chromosome (KeyError if it is unknown)."""
+        return self._chrom(reference)["length"]
+
+    def _chrom(self, reference):
+        try:
+            return self._chroms[reference]
+        except KeyError:
+            raise KeyError("sequence '%s' not present" % reference)
+
+    def fetch(self, reference, start=None, end=None):
+        """Return the sequence of the chromosome between start and end (0-based, end excluded) like
+        pysam.Fastafile.fetch: end is clipped to the chromosome length and the whole chromosome is returned
+        without start and end.
+        """
+        chrom = self._chrom(reference)
+        start, end = self._clip(chrom, 0 if start is None else start, chrom["length"] if end is None else end)
+        if end - start <= SHORT_SIZE:
+            sequence = self._short(chrom, start, end)
+            if sequence is not None:
+                return sequence
+        return self._decode(chrom, numpy.array([start]), numpy.array([end]), False).tobytes().decode()
+
+    @staticmethod
+    def _short(chrom, start, end):
+        """Return the sequence of a short range with a few runs, or None if the range overlaps too many runs."""
+        overlaps = []
+        for column in ["block", "lower"]:
+            run_starts, run_ends = chrom[column + "_starts"], chrom[column + "_ends"]
+            i0 = int(run_ends.searchsorted(start, "right"))
+            i1 = int(run_starts.searchsorted(end, "left"))
+            if i1 - i0 > SHORT_RUNS:
+                return None
+            overlaps.append((i0, zip(run_starts[i0:i1].tolist(), run_ends[i0:i1].tolist())))
+
+        b0 = start >> 2
+        values = _LETTERS[((chrom["packed"][b0:(end + 3) >> 2, None] >> _UNPACK_SHIFTS) & 3).ravel()[start - 4 * b0:
+                                                                                                     end - 4 * b0]]
+        i0, runs = overlaps[0]
+        for i, (run_start, run_end) in enumerate(runs, i0):
+            values[max(run_start, start) - start:min(run_end, end) - start] = chrom["block_chars"][i]
+        for run_start, run_end in overlaps[1][1]:
+            values[max(run_start, start) - start:min(run_end, end) - start] |= 0x20
+        return values.tobytes().decode()
+
+    @staticmethod
+    def _clip(chrom, start, end):
+        if start < 0:
+            raise ValueError("start out of range (%i)" % start)
+        if start > end:
+            raise ValueError("invalid coordinates: start (%i) > stop (%i)" % (start, end))
+        end = min(end, chrom["length"])
+        return min(start, end), end
+
+    def fetch_many(self, regions, as_codes=False, skip_invalid=False):
+        """Return the sequences of a batch of regions, in the order of the regions.
+
+        *Keyword arguments:*
+
+            - regions -- GenomicRegionSet, GenomicRegionArray or iterable of GenomicRegions or (chromosome, initial,
+              final) tuples.
+            - as_codes -- Return arrays (numpy.uint8) of base codes (A=0, C=1, G=2, T=3, other=N_CODE) instead of
+              strings.
+            - skip_invalid -- Return None for regions which fetch would reject (unknown chromosome, negative
+              initial or initial > final) instead of raising its error.
+
+        *Return:*
+
+            - List with a string or an array per region.
+        """
+        names, initials, finals = self._columns(regions)
+        result = [None] * len(initials)
+        if not result:
+            return result
+        order = numpy.argsort(names, kind="stable")
+        blocks = numpy.flatnonzero(numpy.concatenate(([True], names[order][1:] != names[order][:-1], [True])))
+        for b0, b1 in zip(blocks[:-1], blocks[1:]):
+            indices = order[b0:b1]
+            chrom = self._chroms.get(names[indices[0]])
+            starts, ends = initials[indices], finals[indices]
+            valid = (starts >= 0) & (starts <= ends) if chrom is not None else numpy.zeros(len(indices), dtype=bool)
+            if not valid.all():
+                if not skip_invalid:
+                    i = indices[~valid][0]
+                    chrom = self._chrom(names[i])
+                    self._clip(chrom, initials[i], finals[i])
+                indices, starts, ends = indices[valid], starts[valid], ends[valid]
+                if chrom is None:
+                    continue
+            ends = numpy.minimum(ends, chrom["length"])
+            starts = numpy.minimum(starts, ends)
+            output = self._decode(chrom, starts, ends, as_codes)
+            offsets = numpy.concatenate(([0], numpy.cumsum(ends - starts))).tolist()
+            if as_codes:
+                for j, i in enumerate(indices.tolist()):
+                    result[i] = output[offsets[j]:offsets[j + 1]]
+            else:
+                output = output.tobytes()
+                for j, i in enumerate(indices.tolist()):
+                    result[i] = output[offsets[j]:offsets[j + 1]].decode()
+        return result
+
+    @staticmethod
+    def _columns(regions):
+        """Return the chromosome names (object array) and the initial and final positions of the regions."""
+        if hasattr(regions, "as_array"):
+            regions = regions.as_array()
+        if isinstance(regions, GenomicRegionArray):
+            names = numpy.array(CHROMOSOMES.decode(regions.chroms), dtype=object)
+            return names, regions.initials.astype(numpy.int64), regions.finals.astype(numpy.int64)
+        regions = [(r.chrom, r.initial, r.final) if hasattr(r, "chrom") else tuple(r) for r in regions]
+        names = numpy.empty(len(regions), dtype=object)
+        names[:] = [r[0] for r in regions]
+        return (names, numpy.array([r[1] for r in regions], dtype=numpy.int64),
+                numpy.array([r[2] for r in regions], dtype=numpy.int64))
+
+    @staticmethod
+    def _decode(chrom, starts, ends, as_codes):
+        """Return the concatenated sequences (uint8 array of letters or codes) of the valid, clipped ranges of the
+        chromosome."""
+        # Ranges longer than BATCH_SIZE are split into pieces, which are then decoded in batches of about BATCH_SIZE
+        # bases; the concatenation of the pieces is the one of the ranges
+        lengths = ends - starts
+        counts = numpy.maximum(-(-lengths // BATCH_SIZE), 1)
+        ranges = numpy.repeat(numpy.arange(len(starts)), counts)
+        pieces = numpy.arange(len(ranges)) - (numpy.cumsum(counts) - counts)[ranges]
+        piece_starts = starts[ranges] + BATCH_SIZE * pieces
+        piece_ends = numpy.minimum(piece_starts + BATCH_SIZE, ends[ranges])
+        offsets = numpy.concatenate(([0], numpy.cumsum(piece_ends - piece_starts)))
+        batches = numpy.flatnonzero(numpy.diff(numpy.concatenate(([-1], offsets[:-1] // BATCH_SIZE, [-1]))))
+
+        output = numpy.empty(offsets[-1], dtype=numpy.uint8)
+        for b0, b1 in zip(batches[:-1].tolist(), batches[1:].tolist()):
+            output[offsets[b0]:offsets[b1]] = TwoBitGenome._batch(chrom, piece_starts[b0:b1], piece_ends[b0:b1],
+                                                                  as_codes)
+        return output
+
+    @staticmethod
+    def _batch(chrom, starts, ends, as_codes):
+        """Return the concatenated letters or codes of a batch of ranges of the chromosome."""
+        lengths = ends - starts
+        offsets = numpy.concatenate(([0], numpy.cumsum(lengths)))
+        total = offsets[-1]
+
+        # Unpack the bytes of every range and keep the bases inside the range
+        byte_starts, byte_ends = starts >> 2, (ends + 3) >> 2
+        if len(starts) == 1:
+            packed = chrom["packed"][byte_starts[0]:byte_ends[0]]
+            codes = ((packed[:, None] >> _UNPACK_SHIFTS) & 3).ravel()[starts[0] & 3:(starts[0] & 3) + total]
+        else:
+            byte_counts = byte_ends - byte_starts
+            byte_offsets = numpy.cumsum(byte_counts) - byte_counts
+            indices = numpy.arange(byte_counts.sum()) + numpy.repeat(byte_starts - byte_offsets, byte_counts)
+            codes = ((chrom["packed"][indices][:, None] >> _UNPACK_SHIFTS) & 3).ravel()
+            codes = codes[_cover(4 * byte_offsets + (starts & 3), 4 * byte_offsets + (starts & 3) + lengths,
+                                 len(codes))]
+        values = codes if as_codes else _LETTERS[codes]
+
+        for column in ["block"] if as_codes else ["block", "lower"]:
+            run_starts, run_ends = chrom[column + "_starts"], chrom[column + "_ends"]
+            # Pairs of a range and a run overlapping it, with the run clipped to the range in output coordinates
+            first = numpy.searchsorted(run_ends, starts, side="right")
+            counts = numpy.maximum(numpy.searchsorted(run_starts, ends, side="left") - first, 0)
+            if not counts.any():
+                continue
+            ranges = numpy.repeat(numpy.arange(len(starts)), counts)
+            runs = first[ranges] + numpy.arange(len(ranges)) - (numpy.cumsum(counts) - counts)[ranges]
+            shifts = offsets[:-1][ranges] - starts[ranges]
+            initials = numpy.maximum(run_starts[runs], starts[ranges]) + shifts
+            finals = numpy.minimum(run_ends[runs], ends[ranges]) + shifts
+            inside = _cover(initials, finals, total)
+            if column == "lower":
+                values[inside] |= 0x20
+            elif as_codes:
+                values[inside] = N_CODE
+            else:
+                # The clipped runs are sorted and do not overlap
+                positions = numpy.flatnonzero(inside)
+                values[positions] = chrom["block_chars"][runs[numpy.searchsorted(initials, positions, "right") - 1]]
+        return values
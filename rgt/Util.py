@@ -12,6 +12,7 @@ import sys
 import shutil
 import re
 import codecs
+import numpy
 from configparser import ConfigParser
 import traceback
 from optparse import OptionParser, BadOptionError, AmbiguousOptionError
@@ -47,6 +48,51 @@ def get_rgtdata_path():
     return os.path.expanduser(os.getenv("RGTDATA", os.path.join(os.getenv("HOME"), "rgtdata")))
 
 
+def file_stamp(filename):
+    """Return the size and modification time of a file (None if it does not exist), to detect changed files."""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def replace_file(source, destination):
+    """Rename source to destination, replacing destination if it exists (as os.replace, which Python 2 lacks)."""
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+    else:
+        # os.rename only replaces an existing file on POSIX systems
+        if os.name == "nt" and os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
+
+
+# Parsed configuration files by file name, with the stamps of data.config and data.config.user
+_CONFIGS = {}
+
+
+def read_config(data_config_file_name):
+    """Return the ConfigParser of data.config overwritten by data.config.user.
+
+    The files are parsed once per process and again only when one of them changes. The returned ConfigParser is
+    shared and must not be modified.
+    """
+    stamp = (file_stamp(data_config_file_name), file_stamp(data_config_file_name + ".user"))
+    cached = _CONFIGS.get(data_config_file_name)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    # Parsing config file
+    config = ConfigParser()
+    config.read_file(codecs.open(data_config_file_name, "r", "utf8"))
+
+    # Overwriting config using user options
+    config.read_file(codecs.open(data_config_file_name + ".user", "r", "utf8"))
+    _CONFIGS[data_config_file_name] = (stamp, config)
+    return config
+
+
 class ConfigurationFile:
     """
     Represent the data path configuration file (data.config). It serves as a superclass to classes that will contain
@@ -63,14 +109,8 @@ class ConfigurationFile:
         # Reading config file directory
         data_config_file_name = os.path.join(get_rgtdata_path(), "data.config")
 
-        # Parsing config file
-        self.config = ConfigParser()
-        # self.config.read(data_config_file_name)
-        self.config.read_file(codecs.open(data_config_file_name, "r", "utf8"))
-
-        # Overwriting config using user options
-        # self.config.read(data_config_file_name + ".user")
-        self.config.read_file(codecs.open(data_config_file_name + ".user", "r", "utf8"))
+        # Parsing config file and overwriting it using user options (shared within the process)
+        self.config = read_config(data_config_file_name)
 
         # Reading data directory
         self.data_dir = os.path.split(data_config_file_name)[0]
@@ -108,10 +148,20 @@ class GenomeData(ConfigurationFile):
         """Returns the current path to the genome fasta file."""
         return self.genome
 
+    def get_genome_sequence(self):
+        """Returns the TwoBitGenome of the current genome fasta file (shared within the process)."""
+        # Imported here, as TwoBitGenome uses the file helpers of this module
+        from .TwoBitGenome import TwoBitGenome
+        return TwoBitGenome.load(self.genome)
+
     def get_chromosome_sizes(self):
         """Returns the current path to the chromosome sizes text file."""
         return self.chromosome_sizes
 
+    def get_chromosome_sizes_table(self):
+        """Returns the ChromosomeSizes of the current chromosome sizes text file (shared within the process)."""
+        return ChromosomeSizes.load(self.chromosome_sizes)
+
     def get_gene_regions(self):
         """Returns the current path to the gene_regions BED file."""
         return self.genes_gencode
@@ -146,6 +196,78 @@ class GenomeData(ConfigurationFile):
             print("*** There is no repeat masker data for " + self.organism)
 
 
+class ChromosomeSizes:
+    """
+    Represent a chromosome sizes text file (one "chromosome<TAB>size" line per chromosome). The chromosomes keep the
+    order of the file. Use ChromosomeSizes.load or GenomeData.get_chromosome_sizes_table to parse every file only
+    once per process.
+
+    *Variables:*
+
+        - self.names -- List of chromosome names.
+        - self.sizes -- Array (numpy.int64) of chromosome sizes.
+        - self.total -- Total length of all chromosomes.
+
+    """
+
+    # Loaded ChromosomeSizes by absolute file name, with the stamp of the file
+    _loaded = {}
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.names = []
+        sizes = []
+        with open(filename) as f:
+            for line in f:
+                line = line.strip().split("\t")
+                if len(line) < 2:
+                    continue
+                self.names.append(line[0])
+                sizes.append(int(line[1]))
+        self.sizes = numpy.array(sizes, dtype=numpy.int64)
+        self.total = int(self.sizes.sum())
+        self._sizes = dict(zip(self.names, sizes))
+
+    @staticmethod
+    def load(filename):
+        """Return the ChromosomeSizes of the file, parsing it only once per process (and again if it changes)."""
+        filename = os.path.abspath(filename)
+        stamp = file_stamp(filename)
+        cached = ChromosomeSizes._loaded.get(filename)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, ChromosomeSizes(filename))
+            ChromosomeSizes._loaded[filename] = cached
+        return cached[1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, chrom):
+        return chrom in self._sizes
+
+    def get_size(self, chrom):
+        """Returns the size of the chromosome (KeyError if it is unknown)."""
+        return self._sizes[chrom]
+
+    def as_dict(self):
+        """Returns a new dictionary from chromosome names to sizes."""
+        return dict(self._sizes)
+
+    def select(self, chrom_X=True, chrom_Y=False, chrom_M=False):
+        """Returns a boolean array selecting the chromosomes without "random" or "_" in their names and, on
+        request, the X, Y and mitochondrial chromosomes.
+
+        *Keyword arguments:*
+
+            - chrom_X -- Include chromosome X
+            - chrom_Y -- Include chromosome Y
+            - chrom_M -- Include mitochondrial chromosome
+        """
+        return numpy.array([not ("random" in c or "_" in c or (not chrom_X and "chrX" in c) or
+                                 (not chrom_Y and "chrY" in c) or (not chrom_M and "chrM" in c))
+                            for c in self.names], dtype=bool)
+
+
 class MotifData(ConfigurationFile):
     """Represent motif (PWM) data. Inherits ConfigurationFile."""
 
@@ -6,16 +6,14 @@ some other extra codes
 
 from .GenomicRegion import GenomicRegion
 from .GenomicRegionSet import GenomicRegionSet
+from .Util import ChromosomeSizes
 
 
 def get_chrom_sizes_as_genomicregionset(chrom_size_path):
     regionset = GenomicRegionSet('')
-    with open(chrom_size_path) as f:
-        for line in f:
-            line = line.strip()
-            line = line.split('\t')
-            chrom, end = line[0], int(line[1])
-            regionset.add(GenomicRegion(chrom=chrom, initial=0, final=end))
+    table = ChromosomeSizes.load(chrom_size_path)
+    for chrom, end in zip(table.names, table.sizes.tolist()):
+        regionset.add(GenomicRegion(chrom=chrom, initial=0, final=end))
 
     return regionset
 
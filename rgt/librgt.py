@@ -0,0 +1,146 @@
+"""
+librgt
+===================
+librgt binds the C library of RGT (c/librgt.c) to GenomicRegionArrays. The library is loaded and its functions are
+declared once per process; the columns of the arrays are handed to C without any copy (chromosomes as integer ranks,
+positions as 64 bit integers) and the results are returned as numpy arrays.
+
+The functions mirror the sweep kernels of GenomicRegionArray, with the same arguments and results, so that both can
+be used interchangeably. If the library is missing or outdated, library() returns None and the caller should use the
+kernels of GenomicRegionArray.
+
+"""
+
+###############################################################################
+# Libraries
+###############################################################################
+
+# Python
+from __future__ import print_function
+import ctypes
+import numpy
+from numpy.ctypeslib import ndpointer
+
+# Internal
+from .Util import LibraryPath
+from .GenomicRegionArray import CHROMOSOMES, overlap_targets, merge
+
+###############################################################################
+# Binding
+###############################################################################
+
+_INT64 = ndpointer(dtype=numpy.int64, flags="C_CONTIGUOUS")
+_BOOL = ndpointer(dtype=numpy.bool_, flags="C_CONTIGUOUS")
+# chromosomes, initials, finals and size of an array
+_ARRAY = [_INT64, _INT64, _INT64, ctypes.c_int64]
+
+_library = None
+_loaded = False
+
+
+def library():
+    """Return the loaded C library, or None if it is not available."""
+    global _library, _loaded
+    if not _loaded:
+        _loaded = True
+        try:
+            lib = ctypes.cdll.LoadLibrary(LibraryPath().get_c_rgt())
+
+            lib.intersectGenomicRegionArraysOverlap.argtypes = _ARRAY + _ARRAY + [_INT64, _INT64, _INT64,
+                                                                                  ctypes.c_int64]
+            lib.intersectGenomicRegionArraysOverlap.restype = ctypes.c_int64
+
+            lib.totalCoverageIntersectGenomicRegionArrays.argtypes = _ARRAY + _ARRAY
+            lib.totalCoverageIntersectGenomicRegionArrays.restype = ctypes.c_int64
+
+            lib.overlapGenomicRegionArrays.argtypes = _ARRAY + _ARRAY + [_BOOL]
+            lib.overlapGenomicRegionArrays.restype = None
+
+            lib.includedGenomicRegionArrays.argtypes = _ARRAY + _ARRAY + [_BOOL]
+            lib.includedGenomicRegionArrays.restype = ctypes.c_int
+
+            lib.coveredLengthsGenomicRegionArrays.argtypes = _ARRAY + _ARRAY + [_INT64]
+            lib.coveredLengthsGenomicRegionArrays.restype = None
+        except Exception:
+            # No configuration, no library or a library built before these functions existed
+            lib = None
+        _library = lib
+    return _library
+
+
+def _columns(array, ranks):
+    """Return the arguments describing the array for the C functions."""
+    return [numpy.ascontiguousarray(ranks[array.chroms]), numpy.ascontiguousarray(array.initials),
+            numpy.ascontiguousarray(array.finals), len(array)]
+
+
+###############################################################################
+# Functions
+###############################################################################
+
+def intersect_overlap(a, b, ranks=None):
+    """Return the overlapping parts of two sorted and merged arrays, with the attributes of a.
+
+    *Return:*
+
+        - owner -- Index of the region of a every resulting region comes from
+        - initials, finals -- Coordinates of the resulting regions
+    """
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    args = _columns(a, ranks) + _columns(b, ranks)
+    capacity = len(a) + len(b)
+    while True:
+        owner = numpy.empty(capacity, dtype=numpy.int64)
+        initials = numpy.empty(capacity, dtype=numpy.int64)
+        finals = numpy.empty(capacity, dtype=numpy.int64)
+        size = library().intersectGenomicRegionArraysOverlap(*(args + [owner, initials, finals, capacity]))
+        if size <= capacity:
+            return owner[:size], initials[:size], finals[:size]
+        capacity = size
+
+
+def total_intersect_coverage(a, b, ranks=None):
+    """Return the total coverage of the overlapping parts of two sorted and merged arrays."""
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    return library().totalCoverageIntersectGenomicRegionArrays(*(_columns(a, ranks) + _columns(b, ranks)))
+
+
+def overlap_mask(a, b, ranks=None):
+    """Return a boolean mask of the regions of the sorted array a which overlap any region of the sorted array b."""
+    mask = numpy.zeros(len(a), dtype=bool)
+    if len(a) == 0 or len(b) == 0:
+        return mask
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    b = overlap_targets(b, ranks)
+    library().overlapGenomicRegionArrays(*(_columns(a, ranks) + _columns(b, ranks) + [mask]))
+    return mask
+
+
+def inclusion_mask(a, b, ranks=None):
+    """Return a boolean mask of the regions of the sorted array a which are completely included by one region of the
+    sorted array b."""
+    mask = numpy.zeros(len(a), dtype=bool)
+    if len(a) == 0 or len(b) == 0:
+        return mask
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    if library().includedGenomicRegionArrays(*(_columns(a, ranks) + _columns(b, ranks) + [mask])) != 0:
+        raise MemoryError("librgt could not allocate its working memory.")
+    return mask
+
+
+def covered_lengths(a, b, ranks=None):
+    """Return the number of positions of every region of the sorted array a covered by the regions of the sorted
+    array b."""
+    covered = numpy.zeros(len(a), dtype=numpy.int64)
+    if len(a) == 0 or len(b) == 0:
+        return covered
+    if ranks is None:
+        ranks = CHROMOSOMES.ranks()
+    # Zero-length regions of b do not cover any position
+    b = merge(b.take(b.finals > b.initials), ranks)
+    library().coveredLengthsGenomicRegionArrays(*(_columns(a, ranks) + _columns(b, ranks) + [covered]))
+    return covered
@@ -42,6 +42,9 @@ def options(parser):
                         help="Only use the motifs contained within this file (one for each line).")
     parser.add_argument("--input-matrix", type=str, metavar="PATH",
                         help="If an experimental matrix is provided, the input arguments will be ignored.")
+    parser.add_argument("--cache", action="store_true", default=False,
+                        help="Keep the regions of the experimental matrix in cache files next to the BED files "
+                             "(file + '.rgtidx'), which speeds up the next runs on the same files.")
     parser.add_argument("--multiple-test-alpha", type=float, metavar="FLOAT", default=0.05,
                         help="Alpha value for multiple test.")
     parser.add_argument("--motif-dbs", type=str, metavar="PATH", nargs="+",
@@ -218,7 +221,7 @@ def main(args):
     if args.input_matrix:
         try:
             exp_matrix = ExperimentalMatrix()
-            exp_matrix.read(args.input_matrix)
+            exp_matrix.read(args.input_matrix, cache=args.cache)
 
             # if the matrix is present, the (empty) dictionary is overwritten
             genomic_regions_dict = exp_matrix.objectsDict
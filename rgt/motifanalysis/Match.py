@@ -23,7 +23,6 @@ from .Motif import Motif, ThresholdTable
 from .Util import bed_to_bb
 
 # External
-from pysam import Fastafile
 from MOODS import tools, scan
 
 
@@ -63,6 +62,9 @@ def options(parser):
                              "overlapping input regions are NOT affected by this.")
     parser.add_argument("--rmdup", action="store_true", default=False,
                         help="Remove any duplicate region from the input BED files.")
+    parser.add_argument("--cache", action="store_true", default=False,
+                        help="Keep the input regions in cache files next to the BED files (file + '.rgtidx'), "
+                             "which speeds up the next runs on the same files.")
 
     # Promoter-matching args
     group = parser.add_argument_group("Promoter-regions matching",
@@ -158,7 +160,7 @@ def main(args):
     if args.input_matrix:
         try:
             exp_matrix = ExperimentalMatrix()
-            exp_matrix.read(args.input_matrix)
+            exp_matrix.read(args.input_matrix, cache=args.cache)
 
             # if the matrix is present, the (empty) dictionary is overwritten
             genomic_regions_dict = exp_matrix.objectsDict
@@ -173,7 +175,7 @@ def main(args):
             name, _ = os.path.splitext(os.path.basename(input_filename))
 
             regions = GenomicRegionSet(name)
-            regions.read(npath(input_filename))
+            regions.read(npath(input_filename), cache=args.cache)
 
             genomic_regions_dict[name] = regions
 
@@ -368,8 +370,8 @@ def main(args):
     # Motif Matching
     ###################################################################################################
 
-    # Creating genome file
-    genome_file = Fastafile(genome_data.get_genome())
+    # Packed genome, shared within the process
+    genome_file = genome_data.get_genome_sequence()
 
     print()
 
@@ -387,11 +389,12 @@ def main(args):
         if os.path.isfile(output_bed_file):
             os.remove(output_bed_file)
 
-        # Iterating on genomic region set
-        for genomic_region in grs:
+        # Reading the sequences of all regions at once
+        regions = list(grs)
+        sequences = genome_file.fetch_many(regions)
 
-            # Reading sequence associated to genomic_region
-            sequence = str(genome_file.fetch(genomic_region.chrom, genomic_region.initial, genomic_region.final))
+        # Iterating on genomic region set
+        for genomic_region, sequence in zip(regions, sequences):
 
             grs_tmp = match_multiple(scanner, motif_list, sequence, genomic_region)
 
@@ -8,7 +8,8 @@ from ..GenomicRegionSet import GenomicRegionSet
 
 class BindingSite(GenomicRegion):
     """Describes a binding region on DNA or RNA including the information regarding to this region."""
-    __slots__ = ['name', 'score', 'errors_bp', 'motif', 'orientation', 'seq' ]
+    # name and orientation are slots of GenomicRegion
+    __slots__ = ['score', 'errors_bp', 'motif', 'seq', 'guanine_rate']
 
     def __init__(self, chrom, initial, final, name=None, score=None, errors_bp=None, motif=None, 
                  strand=None, orientation=None, guanine_rate=None, seq=None):
@@ -27,6 +27,7 @@ from ..viz.plotTools import output_array
 from ..GenomicRegion import GenomicRegion
 from .RNADNABindingSet import RNADNABindingSet
 from ..GenomicRegionSet import GenomicRegionSet
+from ..TwoBitGenome import TwoBitGenome
 from ..motifanalysis.Statistics import multiple_test_correction
 from ..Util import SequenceType, Html, ConfigurationFile, GenomeData, LibraryPath
 
@@ -540,13 +541,12 @@ def save_sequence(dir, filename, regions, genome_path):
     """
     Fetch sequence into FASTA file according to the given BED file
     """
-    genome = pysam.Fastafile(genome_path)
-    # print(regions)
+    regions = [region for region in regions if "_" not in region.chrom]
+    sequences = TwoBitGenome.load(genome_path).fetch_many([(r.chrom, max(0, r.initial), r.final) for r in regions])
     with open(os.path.join(dir, filename), 'w') as output:
-        for region in regions:
-            if "_" not in region.chrom:
-                print(">"+ region.toString(), file=output)
-                print(genome.fetch(region.chrom, max(0, region.initial), region.final), file=output)
+        for region, sequence in zip(regions, sequences):
+            print(">"+ region.toString(), file=output)
+            print(sequence, file=output)
 
 
 def find_triplex(rna_fasta, dna_region, temp, organism, l, e, dna_fine_posi, genome_path, prefix="", remove_temp=False, 
@@ -52,6 +52,7 @@ def main():
     helpcol = "Group the data in columns by reads(needs 'factor' column), regions(needs 'factor' column), another name of column (for example, 'cell')in the header of experimental matrix, or None. (default: %(default)s)"
     helprow = "Group the data in rows by reads(needs 'factor' column), regions(needs 'factor' column), another name of column (for example, 'cell')in the header of experimental matrix, or None. (default: %(default)s)"
     helpmp = "Define the number of cores for parallel computation. (default: %(default)s)"
+    helpcache = "Keep the parsed regions in cache files next to the BED files (file + '.rgtidx'), which speeds up the next runs on the same files. (default: %(default)s)"
 
     version_message = "viz - Regulatory Analysis Toolbox (RGT). Version: " + str(__version__)
     parser = argparse.ArgumentParser(description='Provides various Statistical analysis methods and plotting tools for ExperimentalMatrix.\
@@ -121,6 +122,7 @@ def main():
                                    help='Define the cutoff of the proportion. (default: %(default)s)')
     parser_projection.add_argument('-load', action="store_false", default=True,
                                    help='Load the BED files later during processing, which saves memory usage when dealing with large number of BED files.')
+    parser_projection.add_argument('-cache', action="store_true", help=helpcache)
 
     ################### Intersect Test ##########################################
     parser_intersect = subparsers.add_parser('intersect',
@@ -152,6 +154,7 @@ def main():
                                   help='Define the width of single panel. (default: %(default)s)')
     parser_intersect.add_argument('-ph', metavar='  ', type=int, default=3,
                                   help='Define the height of single panel. (default: %(default)s)')
+    parser_intersect.add_argument('-cache', action="store_true", help=helpcache)
 
     ################### Jaccard test ##########################################
 
@@ -178,6 +181,7 @@ def main():
                                 help='Define the width of single panel. (default: %(default)s)')
     parser_jaccard.add_argument('-ph', metavar='  ', type=int, default=3,
                                 help='Define the height of single panel. (default: %(default)s)')
+    parser_jaccard.add_argument('-cache', action="store_true", help=helpcache)
 
     ################### Combinatorial Test ##########################################
     parser_combinatorial = subparsers.add_parser('combinatorial',
@@ -211,6 +215,7 @@ def main():
                                       help='Define the width of single panel. (default: %(default)s)')
     parser_combinatorial.add_argument('-ph', metavar='  ', type=int, default=3,
                                       help='Define the height of single panel. (default: %(default)s)')
+    parser_combinatorial.add_argument('-cache', action="store_true", help=helpcache)
 
     ################### Boxplot ##########################################
 
@@ -242,6 +247,7 @@ def main():
                                 help='Show the figure in the screen. (default: %(default)s)')
     parser_boxplot.add_argument('-table', action="store_true",
                                 help='Store the tables of the figure in text format. (default: %(default)s)')
+    parser_boxplot.add_argument('-cache', action="store_true", help=helpcache)
 
     ################### Lineplot ##########################################
     parser_lineplot = subparsers.add_parser('lineplot', help='Generate lineplot with various modes.')
@@ -305,6 +311,7 @@ def main():
                                  help='Extend the window outside of the given regions and compress the given region into fixed internal. (default: %(default)s)')
     parser_lineplot.add_argument('-add_region_number', action="store_true", default=False,
                                  help="Add the number of regions in the axis label. (default: %(default)s)")
+    parser_lineplot.add_argument('-cache', action="store_true", help=helpcache)
 
     ################### Heatmap ##########################################
     parser_heatmap = subparsers.add_parser('heatmap', help='Generate heatmap with various modes.')
@@ -494,7 +501,7 @@ def main():
             print2(parameter, "\tOutput directory: " + os.path.basename(args.o))
             print2(parameter, "\tExperiment title: " + args.t)
 
-            projection = Projection(args.r, args.q, load_bed=args.load)
+            projection = Projection(args.r, args.q, load_bed=args.load, cache=args.cache)
             projection.group_refque(args.g)
             projection.colors(args.c, args.color)
 
@@ -540,7 +547,7 @@ def main():
             print2(parameter, "\tExperiment title: " + args.t)
 
             # Fetching reference and query EM
-            inter = Intersect(args.r, args.q, mode_count=args.m, organism=args.organism)
+            inter = Intersect(args.r, args.q, mode_count=args.m, organism=args.organism, cache=args.cache)
 
             # Grouping
             inter.group_refque(args.g)
@@ -600,7 +607,7 @@ def main():
             
             """
             print("\n############## Jaccard Test ###############")
-            jaccard = Jaccard(args.r, args.q)
+            jaccard = Jaccard(args.r, args.q, cache=args.cache)
             jaccard.group_refque(args.g)
             jaccard.colors(args.c, args.color)
 
@@ -632,7 +639,7 @@ def main():
             print("\n############ Combinatorial Test ############")
             # Fetching reference and query EM
             # comb = Combinatorial(args.r,args.q, mode_count=args.m, organism=args.organism)
-            inter = Intersect(args.r, args.q, mode_count=args.m, organism=args.organism)
+            inter = Intersect(args.r, args.q, mode_count=args.m, organism=args.organism, cache=args.cache)
             # Setting background
             inter.background(args.bg)
             # Grouping
@@ -684,7 +691,7 @@ def main():
         ################### Boxplot ##########################################
         if args.mode == 'boxplot':
             print("\n################# Boxplot #################")
-            boxplot = Boxplot(args.input, fields=[args.g, args.s, args.c], title=args.t, df=args.df)
+            boxplot = Boxplot(args.input, fields=[args.g, args.s, args.c], title=args.t, df=args.df, cache=args.cache)
 
             print2(parameter, "\nStep 1/5: Combining all regions")
             boxplot.combine_allregions()
@@ -768,7 +775,7 @@ def main():
                                 bs=args.bs, ss=args.ss, df=args.df, dft=args.dft,
                                 fields=[args.g, args.col, args.row, args.c],
                                 test=args.test, sense=args.sense, strand=args.strand, flipnegative=args.flip_negative,
-                                outside=args.extend_outside, add_number=args.add_region_number)
+                                outside=args.extend_outside, add_number=args.add_region_number, cache=args.cache)
             # Processing the regions by given parameters
             print2(parameter, "Step 1/3: Processing regions by given parameters")
             lineplot.relocate_bed()
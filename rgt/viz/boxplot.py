@@ -35,11 +35,11 @@ class Boxplot:
         figs: a list of figure(s)
     """
 
-    def __init__(self, EMpath, fields, title="boxplot", df=False):
+    def __init__(self, EMpath, fields, title="boxplot", df=False, cache=False):
         # Read the Experimental Matrix
         self.title = title
         self.exps = ExperimentalMatrix()
-        self.exps.read(EMpath)
+        self.exps.read(EMpath, cache=cache)
         for f in self.exps.fields:
             if f not in ['name', 'type', 'file', "reads", "regions", "factors"]:
                 self.exps.match_ms_tags(f)
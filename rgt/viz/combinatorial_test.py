@@ -2,7 +2,6 @@ import sys
 import copy
 import itertools
 from collections import OrderedDict
-from ..Util import OverlapType
 from ..GenomicRegionSet import GenomicRegionSet
 from ..ExperimentalMatrix import ExperimentalMatrix
 
@@ -39,19 +38,26 @@ class Combinatorial:
             print("** Please define grouping column '-g'")
             sys.exit(1)
 
-    def posi2set(self, regions, p):
-        all_len = range(len(regions))
-        inter_r = copy.deepcopy(regions[p[0]])
-
-        for i in all_len:
-            # print("inter_r: "+inter_r.name)
-            if i in p[1:]:
-                inter_r = inter_r.intersect(regions[i], mode=OverlapType.OVERLAP)
-            elif i == p[0]:
-                pass
-            else:
-                inter_r = inter_r.subtract(regions[i], whole_region=False)
-        # print("inter_r: "+inter_r.name)
+    def posi2set(self, regions, p, combinations=None):
+        """Return the regions covered by exactly the sets at the positions p of regions, i.e. the intersection of
+        these sets minus the other ones, as a GenomicRegionSet named "first - other - ...".
+
+        The combinations of GenomicRegionSet.combinations(regions) can be passed to sweep the sets only once.
+        The name lists the other sets as subtracting them one after the other would: a set is left out if it is empty
+        or if nothing was left to subtract it from.
+        """
+        if combinations is None:
+            combinations = GenomicRegionSet.combinations(regions)
+        mask = sum(1 << i for i in p)
+        names = [regions[p[0]].name]
+        done = 1 << p[0]
+        for i, r in enumerate(regions):
+            if i not in p and len(r) > 0 and any(m & done == mask & done for m in combinations):
+                names.append(r.name)
+            done |= 1 << i
+        inter_r = GenomicRegionSet(" - ".join(names))
+        if mask in combinations:
+            inter_r.load_array(combinations[mask].as_array(), sorted=True)
         return inter_r
 
     def combinatorial(self, background=None):
@@ -71,6 +77,8 @@ class Combinatorial:
             new_refs[ty] = []
             new_refsp[ty] = []
 
+            # All combinations of the sets in a single sweep
+            combinations = GenomicRegionSet.combinations(self.groupedreference[ty])
             for i in range(1, n):
                 new_refsp[ty].append(itertools.combinations(range(n), i))
             for posi in new_refsp[ty]:
@@ -78,11 +86,11 @@ class Combinatorial:
 
                 for p in posi:
                     # print("   " + str(p))
-                    pr = self.posi2set(self.groupedreference[ty], p)
+                    pr = self.posi2set(self.groupedreference[ty], p, combinations)
                     new_refs[ty].append(pr)
                     ref_names.append(pr.name)
                     self.comb_ref_infor[pr.name] = p2sign(p, n)
-            all_int = self.posi2set(self.groupedreference[ty], range(n))
+            all_int = self.posi2set(self.groupedreference[ty], range(n), combinations)
             new_refs[ty].append(all_int)
             ref_names.append(all_int.name)
             self.comb_ref_infor[all_int.name] = p2sign(range(n), n)
@@ -17,19 +17,26 @@ from .shared_function import *
 ###########################################################################################
 
 
-def posi2set(regions, p):
-    alln = range(len(regions))
-    inter_r = copy.deepcopy(regions[p[0]])
-
-    for i in alln:
-        # print("inter_r: "+inter_r.name)
-        if i in p[1:]:
-            inter_r = inter_r.intersect(regions[i], mode=OverlapType.OVERLAP)
-        elif i == p[0]:
-            pass
-        else:
-            inter_r = inter_r.subtract(regions[i], whole_region=False)
-    # print("inter_r: "+inter_r.name)
+def posi2set(regions, p, combinations=None):
+    """Return the regions covered by exactly the sets at the positions p of regions, i.e. the intersection of these
+    sets minus the other ones, as a GenomicRegionSet named "first - other - ...".
+
+    The combinations of GenomicRegionSet.combinations(regions) can be passed to sweep the sets only once.
+    The name lists the other sets as subtracting them one after the other would: a set is left out if it is empty
+    or if nothing was left to subtract it from.
+    """
+    if combinations is None:
+        combinations = GenomicRegionSet.combinations(regions)
+    mask = sum(1 << i for i in p)
+    names = [regions[p[0]].name]
+    done = 1 << p[0]
+    for i, r in enumerate(regions):
+        if i not in p and len(r) > 0 and any(m & done == mask & done for m in combinations):
+            names.append(r.name)
+        done |= 1 << i
+    inter_r = GenomicRegionSet(" - ".join(names))
+    if mask in combinations:
+        inter_r.load_array(combinations[mask].as_array(), sorted=True)
     return inter_r
 
 
@@ -42,13 +49,13 @@ def posi2region(regions, p):
 
 
 class Intersect:
-    def __init__(self, reference_path, query_path, mode_count, organism):
+    def __init__(self, reference_path, query_path, mode_count, organism, cache=False):
         self.rEM, self.qEM = ExperimentalMatrix(), ExperimentalMatrix()
-        self.rEM.read(reference_path)
+        self.rEM.read(reference_path, cache=cache)
         self.rEM.remove_empty_regionset()
         self.references = self.rEM.get_regionsets()
         self.referencenames = self.rEM.get_regionsnames()
-        self.qEM.read(query_path)
+        self.qEM.read(query_path, cache=cache)
         self.qEM.remove_empty_regionset()
         self.query = self.qEM.get_regionsets()
         self.querynames = self.qEM.get_regionsnames()
@@ -149,7 +156,13 @@ class Intersect:
             if frequency:
                 self.frequency[ty] = OrderedDict()
 
-            for r in self.groupedreference[ty]:
+            # All pairs of references and queries are compared in a single sweep, unless a threshold is given,
+            # which intersect_count (as used for the randomized counts) applies
+            references, queries = self.groupedreference[ty], self.groupedquery[ty]
+            if not threshold:
+                matrix = GenomicRegionSet.overlap_matrix(list(references) + list(queries), metric=self.mode_count)
+
+            for i, r in enumerate(references):
                 if r.total_coverage() == 0 and len(r) > 0:
                     self.nalist.append(r.name)
                     continue
@@ -161,40 +174,28 @@ class Intersect:
                         rlen = len(r)
                     self.rlen[ty][r.name] = rlen
 
-                    mp_input = []
-                    for q in self.groupedquery[ty]:
+                    for j, q in enumerate(queries, len(references)):
                         if r.name == q.name:
                             continue
-                        else:
-                            mp_input.append([q, self.nalist, self.mode_count, self.qlen, threshold,
-                                             self.counts, frequency, self.frequency, ty, r])
-                    # q, nalist, mode_count, qlen_dict, threshold, counts, frequency, self_frequency, ty, r
-                    pool = multiprocessing.Pool(processes=multiprocessing.cpu_count() - 1)
-                    mp_output = pool.map(mp_count_intersect, mp_input)
-                    pool.close()
-                    pool.join()
-
-                    # qname, nalist, qlen_dict[ty][q.name], counts[ty][r.name][q.name], self_frequency[ty][q.name].append(c[2])
-                    for output in mp_output:
-                        if output[1]:
-                            self.nalist.append(output[1])
-                        else:
-                            self.qlen[ty][output[0]] = output[2]
-                            self.counts[ty][r.name][output[0]] = output[3]
-                            # print(r.name)
-                            # print(output[0])
-                            # print(output[3])
-                            try:
-                                self.frequency[ty][output[0]][r.name] = output[3][2]
-                            except:
-                                self.frequency[ty][output[0]] = {}
-                                self.frequency[ty][output[0]][r.name] = output[3][2]
-                                # print2(self.parameter, "{0}\t{1}\t{2}\t{3}\t{4}".format(r.name,rlen, q.name, qlen, c[2]))
-                                # print(self.nalist)
-                                # print(self.qlen)
-                                # print(self.counts)
-                                # print(self.frequency)
-                                # sys.stdout.flush()
+                        elif q.total_coverage() == 0 and len(q) > 0:
+                            self.nalist.append(q.name)
+                            continue
+                        if self.mode_count == "bp":
+                            self.qlen[ty][q.name] = q.total_coverage()
+                        elif self.mode_count == "count":
+                            self.qlen[ty][q.name] = len(q)
+                        if threshold:
+                            c = r.intersect_count(q, mode_count=self.mode_count, threshold=threshold)
+                        elif self.mode_count == "bp":
+                            # A-B, B-A, intersection, as GenomicRegionSet.intersect_count
+                            c = (matrix[i, i] - matrix[i, j], matrix[j, j] - matrix[i, j], matrix[i, j])
+                        elif self.mode_count == "count":
+                            c = (matrix[i, i] - matrix[i, j], matrix[j, j] - matrix[j, i], matrix[i, j])
+                        self.counts[ty][r.name][q.name] = c
+                        if frequency:
+                            if q.name not in self.frequency[ty]:
+                                self.frequency[ty][q.name] = {}
+                            self.frequency[ty][q.name][r.name] = c[2]
 
     def barplot(self, logt=False, percentage=False):
         f, axs = plt.subplots(len(self.counts.keys()), 1)
@@ -647,6 +648,8 @@ class Intersect:
             new_refs[ty] = []
             new_refsp[ty] = []
 
+            # All combinations of the sets in a single sweep
+            combinations = GenomicRegionSet.combinations(self.groupedreference[ty])
             for i in range(1, n):
                 new_refsp[ty].append(itertools.combinations(range(n), i))
             for posi in new_refsp[ty]:
@@ -655,11 +658,11 @@ class Intersect:
 
                 for p in posi:
                     # print("   " + str(p))
-                    pr = posi2set(self.groupedreference[ty], p)
+                    pr = posi2set(self.groupedreference[ty], p, combinations)
                     new_refs[ty].append(pr)
                     ref_names.append(pr.name)
                     self.comb_ref_infor[pr.name] = p2sign(p, n)
-            all_int = posi2set(self.groupedreference[ty], range(n))
+            all_int = posi2set(self.groupedreference[ty], range(n), combinations)
             new_refs[ty].append(all_int)
             ref_names.append(all_int.name)
             self.comb_ref_infor[all_int.name] = p2sign(range(n), n)
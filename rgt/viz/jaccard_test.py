@@ -14,10 +14,10 @@ from .shared_function import *
 ###########################################################################################
 
 class Jaccard:
-    def __init__(self, reference_path, query_path):
+    def __init__(self, reference_path, query_path, cache=False):
         self.rEM, self.qEM = ExperimentalMatrix(), ExperimentalMatrix()
-        self.rEM.read(reference_path)
-        self.qEM.read(query_path)
+        self.rEM.read(reference_path, cache=cache)
+        self.qEM.read(query_path, cache=cache)
         self.references = self.rEM.get_regionsets()
         self.referencenames = self.rEM.get_regionsnames()
         self.query = self.qEM.get_regionsets()
@@ -47,6 +47,9 @@ class Jaccard:
             self.jlist[ty] = OrderedDict()
             self.realj[ty] = OrderedDict()
             self.plist[ty] = OrderedDict()
+            # The real jaccard indices of all pairs, in a single sweep
+            nref = len(self.groupedreference[ty])
+            jaccard = GenomicRegionSet.overlap_matrix(list(self.groupedreference[ty]) + list(self.groupedquery[ty]))
             for i, r in enumerate(self.groupedreference[ty]):
                 if r.total_coverage() == 0 and len(r) > 0:
                     self.nalist.append(r.name)
@@ -69,10 +72,9 @@ class Jaccard:
                             if q.name not in self.qlen.keys():
                                 self.qlen[q.name] = len(q)
                             self.jlist[ty][r.name][q.name] = []
-                            self.realj[ty][r.name][q.name] = q.jaccard(r)
-                            for k in range(runtime):
-                                random = q.random_regions(organism=organism, multiply_factor=1, overlap_result=True,
-                                                          overlap_input=True, chrom_M=False)
+                            self.realj[ty][r.name][q.name] = float(jaccard[nref + j, i])
+                            for random in q.random_shuffles(organism=organism, n=runtime, multiply_factor=1,
+                                                            overlap_result=True, overlap_input=True, chrom_M=False):
                                 self.jlist[ty][r.name][q.name].append(r.jaccard(random))
                             # How many randomizations have higher jaccard index than the real index?
                             p = len([x for x in self.jlist[ty][r.name][q.name] if
@@ -27,12 +27,12 @@ from shared_function import gen_tags, tag_from_r, print2, MyPool, compute_covera
 
 class Lineplot:
     def __init__(self, em_path, title, annotation, organism, center, extend, rs, bs, ss,
-                 df, dft, fields, test, sense, strand, flipnegative, outside, add_number):
+                 df, dft, fields, test, sense, strand, flipnegative, outside, add_number, cache=False):
 
         # Read the Experimental Matrix
         self.title = title
         self.exps = ExperimentalMatrix()
-        self.exps.read(em_path, test=test, add_region_len=add_number)
+        self.exps.read(em_path, test=test, add_region_len=add_number, cache=cache)
         for f in self.exps.fields:
             if f not in ['name', 'type', 'file', "reads", "regions", "factors"]:
                 self.exps.match_ms_tags(f, test=test)
@@ -22,16 +22,16 @@ from .shared_function import output_array, group_refque, color_groupded_region,
 
 
 class Projection:
-    def __init__(self, reference_path, query_path, load_bed=True):
+    def __init__(self, reference_path, query_path, load_bed=True, cache=False):
         # Reference
         self.rEM = ExperimentalMatrix()
-        self.rEM.read(reference_path,load_bed=load_bed)
+        self.rEM.read(reference_path, load_bed=load_bed, cache=cache)
         # self.rEM.remove_empty_regionset()
         self.references = self.rEM.get_regionsets()
         self.referencenames = self.rEM.get_regionsnames()
         # Query
         self.qEM = ExperimentalMatrix()
-        self.qEM.read(query_path)
+        self.qEM.read(query_path, cache=cache)
         # self.qEM.remove_empty_regionset()
         self.query = self.qEM.get_regionsets()
         self.querynames = self.qEM.get_regionsnames()
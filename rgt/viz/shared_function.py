@@ -416,11 +416,12 @@ def compute_coverage(inputs):
             cov.coverage_from_bigwig(bigwig_file=read_file, stepsize=ss)
         else:
             if not sense and not strand:
-                cov.coverage_from_bam(bam_file=read_file, extension_size=rs, binsize=bs, stepsize=ss)
+                cov.coverage_from_bam(bam_file=read_file, extension_size=rs, binsize=bs, stepsize=ss, single_pass="auto")
                 if normRPM: cov.normRPM()
             else:  # Sense specific
                 cov.coverage_from_bam(bam_file=read_file, extension_size=rs, binsize=bs, stepsize=ss,
-                                      get_sense_info=sense, get_strand_info=strand, paired_reads=True)
+                                      get_sense_info=sense, get_strand_info=strand, paired_reads=True,
+                                      single_pass="auto")
                 cov.array_transpose()
                 if normRPM: cov.normRPM()
 
@@ -446,11 +447,11 @@ def compute_coverage(inputs):
             else:
                 flap = CoverageSet("for flap", processed_bedsF)
                 if not sense:
-                    flap.coverage_from_bam(read_file, extension_size=rs, binsize=bs, stepsize=ss)
+                    flap.coverage_from_bam(read_file, extension_size=rs, binsize=bs, stepsize=ss, single_pass="auto")
                     if normRPM: flap.normRPM()
                 else:  # Sense specific
                     flap.coverage_from_bam(bam_file=read_file, extension_size=rs, binsize=bs,
-                                           stepsize=ss, get_sense_info=True, paired_reads=True)
+                                           stepsize=ss, get_sense_info=True, paired_reads=True, single_pass="auto")
                     flap.array_transpose(flip=True)
                     if normRPM: flap.normRPM()
                 ffcoverage = numpy.fliplr(flap.coverage)
@@ -741,7 +742,7 @@ def list_all_index(path):
         for filename in fnmatch.filter(filenames, 'index.html'):
             if root.split('/')[-2] == parentdir:
                 link_d[root.split('/')[-1]] = "../" + root.split('/')[-1] + "/index.html"
-    link_d = OrderedDict(sorted(link_d.items(), key=lambda (key, value): key))
+    link_d = OrderedDict(sorted(link_d.items(), key=lambda item: item[0]))
 
     ###
 
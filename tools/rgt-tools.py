@@ -128,6 +128,16 @@ if __name__ == "__main__":
     parser_bedmerge.add_argument('-b', action="store_true", help="BED12 format")
 
 
+    ############### BED sort  ############################################
+    # python rgt-tools.py
+    parser_bedsort = subparsers.add_parser('bed_sort', help="[BED] Sort regions by position with bounded memory")
+    parser_bedsort.add_argument('-i', metavar='input', type=str, help="Input BED or bedGraph file")
+    parser_bedsort.add_argument('-o', metavar='output', type=str, help="Output file")
+    parser_bedsort.add_argument('-n', metavar='lines', type=int, default=500000,
+                                help="Number of lines sorted in memory at a time")
+    parser_bedsort.add_argument('-t', metavar='temp', type=str, default=None,
+                                help="Directory of the temporary files (default: the directory of the output)")
+
     ############### BED merge by name ############################################
     # python rgt-tools.py
     parser_bedmn = subparsers.add_parser('bed_merge_by_name', help="[BED] Merge regions by name")
@@ -675,10 +685,24 @@ if __name__ == "__main__":
     ############### BED merge  ########################################
     elif args.mode == "bed_merge":
         print(tag + ": [BED] Merge regions")
-        bed1 = GenomicRegionSet("input")
-        bed1.read(args.i, io=GRSFileIO.Bed12 if args.b else GRSFileIO.Bed)
-        bed1.merge(strand_specific=args.s)
-        bed1.write(args.o, io=GRSFileIO.Bed12 if args.b else GRSFileIO.Bed)
+        if args.b or args.s:
+            bed1 = GenomicRegionSet("input")
+            bed1.read(args.i, io=GRSFileIO.Bed12 if args.b else GRSFileIO.Bed)
+            bed1.merge(strand_specific=args.s)
+            bed1.write(args.o, io=GRSFileIO.Bed12 if args.b else GRSFileIO.Bed)
+        else:
+            # Sort on disk and merge the sorted file chunk by chunk
+            GenomicRegionSet.sort_file(args.i, args.o + ".sort")
+            with open(args.o, "w") as f:
+                for chunk in GenomicRegionSet.iter_merged(GenomicRegionSet.iter_file(args.o + ".sort")):
+                    for r in chunk.regions():
+                        print(r, file=f)
+            os.remove(args.o + ".sort")
+
+    ############### BED sort #################################################
+    elif args.mode == "bed_sort":
+        print(tag + ": [BED] Sort regions")
+        GenomicRegionSet.sort_file(args.i, args.o, chunk_size=args.n, temp_dir=args.t)
 
     ############### BED merge by name ########################################
     elif args.mode == "bed_merge_by_name":
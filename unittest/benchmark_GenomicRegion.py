@@ -0,0 +1,81 @@
+"""
+Memory benchmark of GenomicRegion objects.
+
+Every scenario builds n regions like the ones of motif matching (chromosome, position, motif name, strand and score)
+in a fresh process and reports its peak resident memory per region:
+
+    - dict -- regions with an attribute dictionary and a string per chromosome name (the former GenomicRegion)
+    - slots -- GenomicRegion
+    - set -- a GenomicRegionSet read from a BED file and iterated, i.e. GenomicRegions built from the columns
+
+Usage: python unittest/benchmark_GenomicRegion.py [n]
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import resource
+import tempfile
+import subprocess
+
+N = 1000000
+
+
+class DictRegion:
+    def __init__(self, chrom, initial, final, name=None, orientation=None, data=None, proximity=None):
+        self.chrom = str(chrom)
+        self.initial = initial
+        self.final = final
+        self.name = name
+        self.orientation = orientation
+        self.data = data
+        self.proximity = proximity
+
+
+def regions(cls, n):
+    chroms = ["chr" + str(i % 20 + 1) for i in range(20)]
+    # "".join builds a new chromosome string per region, as a parser does
+    return [cls("".join(["chr", chroms[i % 20][3:]]), i, i + 12, name="MA0139.1.CTCF", orientation="+-"[i % 2],
+                data=str(i % 1000)) for i in range(n)]
+
+
+def run(scenario, n):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if scenario == "dict":
+        result = regions(DictRegion, n)
+    elif scenario == "slots":
+        from rgt.GenomicRegion import GenomicRegion
+        result = regions(GenomicRegion, n)
+    else:
+        from rgt.GenomicRegionSet import GenomicRegionSet
+        result = GenomicRegionSet("mpbs")
+        result.read(sys.argv[3])
+        list(result)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    # ru_maxrss is in kilobytes on Linux
+    print(peak * 1024 / n)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else N
+    handle, bed = tempfile.mkstemp(suffix=".bed")
+    with os.fdopen(handle, "w") as f:
+        for i in range(n):
+            print("chr%d\t%d\t%d\tMA0139.1.CTCF\t%d\t%s" % (i % 20 + 1, i, i + 12, i % 1000, "+-"[i % 2]), file=f)
+    try:
+        for scenario in ["dict", "slots", "set"]:
+            output = subprocess.check_output([sys.executable, __file__, str(n), scenario, bed],
+                                             env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(
+                                                 os.path.abspath(__file__)))))
+            print("%-6s %8.1f bytes per region" % (scenario, float(output)))
+    finally:
+        os.remove(bed)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        run(sys.argv[2], int(sys.argv[1]))
+    else:
+        main()
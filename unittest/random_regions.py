@@ -0,0 +1,23 @@
+from __future__ import division
+from __future__ import print_function
+
+import random
+
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+"""Random region sets shared by the unit tests"""
+
+
+def random_set(n, seed, name="random", zero_length=False):
+    """Return a GenomicRegionSet <name> of <n> random regions (with random names and orientations) generated from
+    <seed>. With <zero_length> about half of the regions have zero length."""
+    rng = random.Random(seed)
+    regions = GenomicRegionSet(name)
+    for _ in range(n):
+        initial = rng.randint(0, 300)
+        length = rng.randint(1, 40)
+        final = initial + (rng.choice([0, length]) if zero_length else length)
+        regions.add(GenomicRegion(chrom=rng.choice(["chr1", "chr2", "chr10", "chrX"]), initial=initial, final=final,
+                                  name=rng.choice(["a", "b"]), orientation=rng.choice(["+", "-"])))
+    return regions
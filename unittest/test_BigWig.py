@@ -0,0 +1,120 @@
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import pyBigWig
+
+from rgt import BigWig
+from rgt.BigWig import BigWigWriter
+
+"""Unit Test"""
+
+
+class TestBigWig(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.chrom_file = os.path.join(self.dir, "chrom.sizes")
+        with open(self.chrom_file, "w") as f:
+            print("chr2\t500", file=f)
+            print("chr1\t1000", file=f)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, filename):
+        bw = pyBigWig.open(filename)
+        intervals = dict((chrom, bw.intervals(chrom)) for chrom in bw.chroms())
+        bw.close()
+        return intervals
+
+    def test_collapse(self):
+        starts, ends, values = BigWig.collapse(numpy.array([0, 10, 20, 40, 50]), numpy.array([10, 20, 30, 50, 60]),
+                                               numpy.array([1., 1., 2., 2., 2.]))
+        self.assertEqual(starts.tolist(), [0, 20, 40])
+        self.assertEqual(ends.tolist(), [20, 30, 60])
+        self.assertEqual(values.tolist(), [1., 2., 2.])
+
+    def test_writer(self):
+        filename = os.path.join(self.dir, "signal.bw")
+        with BigWigWriter(filename, self.chrom_file) as writer:
+            # Chromosomes and entries in any order, clipped to the chromosome sizes
+            writer.add("chr1", [900, 100], [1100, 150], [3, 1])
+            writer.add("chrUn", [0], [10], [1])
+            writer.add_signal("chr2", 10, numpy.array([0, 0, 2, 2, numpy.nan, 5]))
+            writer.add_signal("chr1", 0, [1, 1, 1, 4], step=25, span=25)
+        self.assertEqual(self.read(filename), {
+            "chr2": ((10, 12, 0.), (12, 14, 2.), (15, 16, 5.)),
+            "chr1": ((0, 75, 1.), (75, 100, 4.), (100, 150, 1.), (900, 1000, 3.))})
+
+        # The entries of a per-base signal are joined when they are added
+        writer = BigWigWriter(filename, self.chrom_file)
+        writer.add_signal("chr1", 100, [1.] * 400 + [2.] * 100)
+        writer.add("chr1", [950, 10], [960, 20], [3, 3])
+        self.assertEqual([(s.tolist(), e.tolist(), v.tolist()) for s, e, v in writer._entries["chr1"]],
+                         [([100, 500], [500, 600], [1., 2.]), ([10, 950], [20, 960], [3., 3.])])
+        writer.close()
+        self.assertEqual(self.read(filename)["chr1"], ((10, 20, 3.), (100, 500, 1.), (500, 600, 2.), (950, 960, 3.)))
+
+        self.assertRaises(IOError, BigWigWriter, os.path.join(self.dir, "missing", "signal.bw"), self.chrom_file)
+
+    def test_merge(self):
+        files = [os.path.join(self.dir, "%i.bw" % i) for i in range(3)]
+        for i, (chrom, starts, ends, values) in enumerate([("chr1", [0, 50], [50, 100], [1, 2]),
+                                                           ("chr2", [0], [100], [1]),
+                                                           ("chr1", [25, 200], [75, 300], [2, 1])]):
+            with BigWigWriter(files[i], self.chrom_file) as writer:
+                writer.add(chrom, starts, ends, values)
+        filename = os.path.join(self.dir, "merged.bw")
+        BigWig.merge(files, filename, self.chrom_file)
+        self.assertEqual(self.read(filename), {
+            "chr2": ((0, 100, 1.),),
+            "chr1": ((0, 25, 1.), (25, 50, 3.), (50, 75, 4.), (75, 100, 2.), (200, 300, 1.))})
+
+    def test_reader(self):
+        filename = os.path.join(self.dir, "signal.bw")
+        rng = numpy.random.RandomState(4)
+        starts = numpy.sort(rng.choice(990, 200, replace=False))
+        ends = numpy.minimum(starts + rng.randint(1, 10, 200), numpy.append(starts[1:], 1000))
+        with BigWigWriter(filename, self.chrom_file) as writer:
+            writer.add("chr1", starts, ends, rng.rand(200) * 10)
+        regions, n_bins = [], []
+        for _ in range(300):
+            initial = rng.randint(0, 990)
+            final = initial + rng.randint(1, 300)
+            regions.append(("chr1", initial, min(final, 1000)))
+            n_bins.append(rng.randint(1, min(final, 1000) - initial + 1))
+        regions += [("chr1", 0, 1000), ("chr2", 0, 100), ("chrUn", 0, 10), ("chr1", 50, 40), ("chr1", 990, 1010)]
+        n_bins += [7, 3, 2, 2, 2]
+
+        bw = pyBigWig.open(filename)
+        reader = BigWig.BigWigReader.load(filename)
+        self.assertIs(BigWig.BigWigReader.load(filename), reader)
+        merge_gap, span_size = BigWig.MERGE_GAP, BigWig.SPAN_SIZE
+        try:
+            # Small spans and batches split the regions
+            for BigWig.MERGE_GAP, BigWig.SPAN_SIZE in [(merge_gap, span_size), (5, 64)]:
+                for type in ["mean", "max"]:
+                    for (chrom, initial, final), n, result in zip(regions, n_bins,
+                                                                  reader.stats(regions, n_bins, type=type)):
+                        try:
+                            expected = bw.stats(chrom, initial, final, type=type, nBins=n, exact=True)
+                        except RuntimeError:
+                            expected = [None] * n
+                        expected = numpy.array([numpy.nan if x is None else x for x in expected])
+                        self.assertTrue(numpy.allclose(result, expected, rtol=1e-12, atol=0, equal_nan=True))
+        finally:
+            BigWig.MERGE_GAP, BigWig.SPAN_SIZE = merge_gap, span_size
+        bw.close()
+
+        self.assertEqual([len(r) for r in reader.stats(regions[:3], 0)], [0, 0, 0])
+        self.assertRaises(ValueError, reader.stats, regions, 1, type="median")
+
+
+if __name__ == "__main__":
+    unittest.main()
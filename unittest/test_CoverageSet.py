@@ -0,0 +1,243 @@
+from __future__ import division
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import pyBigWig
+import pysam
+
+from rgt import CoverageSet as coverage
+from rgt.CoverageSet import CoverageSet
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+"""Unit Test"""
+
+
+def write_bam(filename, chrom_sizes, n, seed=0):
+    """Write a sorted, indexed BAM file with n random reads (some reverse, some spliced) on the chromosomes."""
+    rng = random.Random(seed)
+    header = {"HD": {"VN": "1.0", "SO": "coordinate"},
+              "SQ": [{"SN": chrom, "LN": size} for chrom, size in chrom_sizes]}
+    reads = []
+    for i in range(n):
+        ref = rng.randrange(len(chrom_sizes))
+        length = rng.choice([36, 50])
+        read = pysam.AlignedSegment()
+        read.query_name = "r%d" % i
+        read.query_sequence = "A" * length
+        read.flag = 16 if rng.random() < 0.5 else 0
+        read.reference_id = ref
+        # A hotspot with many duplicated positions
+        read.reference_start = rng.randint(500, 520) if rng.random() < 0.2 else \
+            rng.randint(0, chrom_sizes[ref][1] - 1000)
+        read.mapping_quality = 30
+        read.cigar = [(0, length)] if rng.random() < 0.9 else [(0, 20), (3, rng.randint(1, 300)), (0, length - 20)]
+        reads.append(read)
+    reads.sort(key=lambda r: (r.reference_id, r.reference_start))
+    with pysam.AlignmentFile(filename, "wb", header=header) as f:
+        for read in reads:
+            f.write(read)
+    pysam.index(filename)
+
+
+class TestCoverageSet(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.bam = os.path.join(self.dir, "reads.bam")
+        write_bam(self.bam, [("chr1", 30000), ("chr2", 10000)], 4000)
+        rng = random.Random(1)
+        self.regions = GenomicRegionSet("regions")
+        for i in range(30):
+            chrom = rng.choice(["chr1", "chr2"])
+            initial = rng.choice([0, 450, rng.randint(0, 9000)])
+            self.regions.add(GenomicRegion(chrom, initial, initial + rng.choice([0, 40, 50, 777, 5000]),
+                                           orientation=rng.choice(["+", "-"])))
+        self.regions.add(GenomicRegion("chr1", 0, 30000, orientation="+"))
+        self.regions.sort()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_coverage_from_bam(self):
+        for kwargs in [dict(extension_size=200, binsize=100, stepsize=50),
+                       dict(extension_size=0, binsize=60, stepsize=20, rmdup=True, get_strand_info=True),
+                       dict(extension_size=-45, binsize=100, stepsize=30, get_strand_info=True, no_gaps=True),
+                       dict(extension_size=10.5, binsize=37, stepsize=13, get_sense_info=True)]:
+            result = CoverageSet("vectorized", self.regions)
+            result.coverage_from_bam(self.bam, **kwargs)
+            # The sequential sliding window is the former implementation
+            expected = CoverageSet("sequential", self.regions)
+            with mock.patch.object(coverage, "window_counts", coverage._window_counts_loop):
+                expected.coverage_from_bam(self.bam, **kwargs)
+
+            self.assertGreater(expected.overall_cov.sum(), 0)
+            for name in ["coverage", "cov_strand_all"]:
+                for a, b in zip(getattr(result, name, []), getattr(expected, name, [])):
+                    self.assertEqual(a.dtype, b.dtype)
+                    self.assertTrue(numpy.array_equal(a, b), (name, kwargs))
+            self.assertTrue(numpy.array_equal(result.overall_cov, expected.overall_cov))
+
+    def test_single_pass(self):
+        regions = GenomicRegionSet("regions")
+        for region in self.regions:
+            regions.add(region)
+        regions.add(GenomicRegion("chrUn", 0, 1000))
+        for kwargs in [dict(extension_size=200, binsize=100, stepsize=50),
+                       dict(extension_size=-45, binsize=60, stepsize=20, rmdup=True, get_strand_info=True),
+                       dict(extension_size=100, binsize=100, stepsize=30, get_sense_info=True, no_gaps=True)]:
+            expected = CoverageSet("per region", regions)
+            expected.coverage_from_bam(self.bam, **kwargs)
+            # With "auto", the reads are fetched per region for sparse chromosomes (infinite fraction)
+            for single_pass, fraction in [(True, coverage.SINGLE_PASS_FRACTION), ("auto", 0), ("auto", numpy.inf)]:
+                result = CoverageSet("single pass", regions)
+                with mock.patch.object(coverage, "SINGLE_PASS_FRACTION", fraction):
+                    result.coverage_from_bam(self.bam, single_pass=single_pass, **kwargs)
+                for name in ["coverage", "cov_strand_all"]:
+                    self.assertEqual(len(getattr(result, name, [])), len(getattr(expected, name, [])))
+                    for a, b in zip(getattr(result, name, []), getattr(expected, name, [])):
+                        self.assertEqual(a.dtype, b.dtype)
+                        self.assertTrue(numpy.array_equal(a, b), (name, kwargs, single_pass, fraction))
+                self.assertTrue(numpy.array_equal(result.overall_cov, expected.overall_cov))
+
+        # Reads starting within a region of the mask file are ignored
+        mask = os.path.join(self.dir, "mask.bed")
+        with open(mask, "w") as f:
+            print("chr1\t0\t800", file=f)
+        region = GenomicRegionSet("hotspot")
+        region.add(GenomicRegion("chr1", 400, 700))
+        masked = CoverageSet("masked", region)
+        masked.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, mask_file=mask,
+                                 single_pass=True)
+        unmasked = CoverageSet("unmasked", region)
+        unmasked.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, single_pass=True)
+        self.assertGreater(unmasked.overall_cov[:4].sum(), 0)
+        self.assertEqual(masked.overall_cov[:4].sum(), 0)
+        with mock.patch.object(coverage, "SINGLE_PASS_FRACTION", numpy.inf):
+            masked.coverage_from_bam(self.bam, extension_size=0, binsize=100, stepsize=50, mask_file=mask,
+                                     single_pass="auto")
+        self.assertEqual(masked.overall_cov[:4].sum(), 0)
+
+        # Sparse regions are fetched one by one, dense ones are read with their chromosome
+        bam = pysam.Samfile(self.bam, "rb")
+        self.assertFalse(coverage._dense_regions(bam, "chr1", region, 100))
+        self.assertTrue(coverage._dense_regions(bam, "chr1", regions, 100))
+        self.assertTrue(coverage._dense_regions(bam, "chrUn", region, 100))
+        bam.close()
+
+    def test_coverage_from_bam_parallel(self):
+        bam = os.path.join(self.dir, "other.bam")
+        write_bam(bam, [("chr1", 30000), ("chr2", 10000)], 3000, seed=5)
+        mask = os.path.join(self.dir, "mask.bed")
+        with open(mask, "w") as f:
+            print("chr1\t0\t800", file=f)
+            print("chr2\t2000\t4000", file=f)
+        for kwargs in [dict(extension_size=200, binsize=100, stepsize=50),
+                       dict(extension_size=-45, binsize=60, stepsize=20, rmdup=True, get_strand_info=True),
+                       dict(extension_size=100, binsize=100, stepsize=30, get_sense_info=True, mask_file=mask),
+                       dict(extension_size=0, binsize=100, stepsize=50, get_strand_info=True, single_pass=True,
+                            mask_file=mask)]:
+            expected = []
+            for bam_file in [self.bam, bam]:
+                cs = CoverageSet(bam_file, self.regions)
+                cs.coverage_from_bam(bam_file, **kwargs)
+                expected.append(cs)
+            results = [CoverageSet(bam_file, self.regions) for bam_file in [self.bam, bam]]
+            CoverageSet.coverage_from_bam_parallel([(cs, dict(bam_file=cs.name, **kwargs)) for cs in results],
+                                                   n_jobs=3)
+            single = CoverageSet(self.bam, self.regions)
+            single.coverage_from_bam(self.bam, n_jobs=2, **kwargs)
+            results.append(single)
+            expected.append(expected[0])
+
+            for result, cs in zip(results, expected):
+                self.assertEqual(result.reads, cs.reads)
+                for name in ["coverage", "cov_strand_all"]:
+                    self.assertEqual(len(getattr(result, name, [])), len(getattr(cs, name, [])))
+                    for a, b in zip(getattr(result, name, []), getattr(cs, name, [])):
+                        self.assertEqual(a.dtype, b.dtype)
+                        self.assertTrue(numpy.array_equal(a, b), (name, kwargs))
+                self.assertTrue(numpy.array_equal(result.overall_cov, cs.overall_cov))
+
+    def test_write_bigwig(self):
+        chrom_file = os.path.join(self.dir, "chrom.sizes")
+        with open(chrom_file, "w") as f:
+            print("chr1\t30000", file=f)
+            print("chr2\t10000", file=f)
+        regions = GenomicRegionSet("chromosomes")
+        regions.add(GenomicRegion("chr1", 0, 30000))
+        regions.add(GenomicRegion("chr2", 2000, 10000))
+        cs = CoverageSet("coverage", regions)
+        cs.coverage_from_bam(self.bam, extension_size=100, binsize=100, stepsize=50)
+        filename = os.path.join(self.dir, "coverage.bw")
+        cs.write_bigwig(filename, chrom_file, save_wig=True)
+
+        bw = pyBigWig.open(filename)
+        # The WIG file has the same bins at 1-based positions
+        with open(filename + ".wig") as f:
+            for line in f:
+                if line.startswith("variableStep"):
+                    chrom = line.split()[1].split("=")[1]
+                else:
+                    position, value = line.split()
+                    start = int(position) - 1
+                    self.assertEqual(bw.values(chrom, start, start + 50), [float(value)] * 50)
+        for region, c in zip(regions, cs.coverage):
+            # Every bin covers stepsize positions around its center, clipped to the chromosome end
+            end = min(region.initial + 25 + len(c) * 50, bw.chroms(region.chrom))
+            values = bw.values(region.chrom, region.initial + 25, end, numpy=True)
+            self.assertTrue(numpy.array_equal(numpy.nan_to_num(values), numpy.repeat(c, 50)[:len(values)]))
+        # Equal bins form one span
+        self.assertLess(len(bw.intervals("chr1")), numpy.count_nonzero(cs.coverage[0]))
+        bw.close()
+
+    def test_coverage_from_bigwig(self):
+        chrom_file = os.path.join(self.dir, "chrom.sizes")
+        with open(chrom_file, "w") as f:
+            print("chr1\t30000", file=f)
+            print("chr2\t10000", file=f)
+        regions = GenomicRegionSet("chromosomes")
+        regions.add(GenomicRegion("chr1", 0, 30000))
+        regions.add(GenomicRegion("chr2", 0, 10000))
+        cs = CoverageSet("coverage", regions)
+        cs.coverage_from_bam(self.bam, extension_size=100, binsize=100, stepsize=50)
+        filename = os.path.join(self.dir, "coverage.bw")
+        cs.write_bigwig(filename, chrom_file)
+
+        result = CoverageSet("bigwig", self.regions)
+        result.coverage_from_bigwig(filename, stepsize=30)
+        bw = pyBigWig.open(filename)
+        for region, c in zip(self.regions, result.coverage):
+            n = len(region) // 30
+            expected = bw.stats(region.chrom, region.initial, region.final, nBins=n, exact=True) if n else []
+            self.assertTrue(numpy.allclose(c, [x if x else 0 for x in expected], rtol=1e-12, atol=0))
+        bw.close()
+
+    def test_window_counts(self):
+        rng = numpy.random.RandomState(2)
+        # Reads at the same position have the strand counts of the first read there
+        strand_table = rng.randint(0, 2, (300, 2))
+        for _ in range(500):
+            positions = rng.randint(0, 300, rng.randint(0, 60))
+            strands = strand_table[positions]
+            args = (positions, rng.randint(0, 100), rng.randint(0, 20), rng.randint(1, 100), rng.randint(1, 50),
+                    rng.choice([-50, 0, 10.5, 200]), rng.choice([0, 36]), strands)
+            counts, strand_counts = coverage.window_counts(*args)
+            expected_counts, expected_strands = coverage._window_counts_loop(*args)
+            self.assertTrue(numpy.array_equal(counts, expected_counts))
+            self.assertTrue(numpy.array_equal(strand_counts, expected_strands))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import division
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from rgt import ExternalSort
+from rgt.GenomicRegionSet import GenomicRegionSet, GRSFileIO
+
+"""Unit Test"""
+
+
+class TestExternalSort(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rng = random.Random(5)
+        self.lines = []
+        for i in range(1000):
+            initial = rng.randint(0, 100)
+            self.lines.append("\t".join([rng.choice(["chr1", "chr2", "chr10", "chrX"]), str(initial),
+                                         str(initial + rng.randint(0, 20)), str(i)]) + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def expected(self):
+        return sorted(self.lines, key=lambda l: (l.split("\t")[0], int(l.split("\t")[1]), int(l.split("\t")[2])))
+
+    def test_sort_lines(self):
+        for chunk_size, max_runs in [(10000, 128), (70, 128), (70, 3)]:
+            result = list(ExternalSort.sort_lines(["track name=x\n"] + self.lines, chunk_size=chunk_size,
+                                                  temp_dir=self.dir, max_runs=max_runs))
+            self.assertEqual(result, ["track name=x\n"] + self.expected())
+        # The temporary runs are removed
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_sort_file(self):
+        filename = os.path.join(self.dir, "input.bedGraph")
+        output = os.path.join(self.dir, "sorted.bedGraph")
+        with open(filename, "w") as f:
+            f.writelines(self.lines)
+        GenomicRegionSet.sort_file(filename, output, io=GRSFileIO.BedGraph, chunk_size=100)
+        with open(output) as f:
+            self.assertEqual(f.readlines(), self.expected())
+        self.assertEqual(sorted(os.listdir(self.dir)), ["input.bedGraph", "sorted.bedGraph"])
+
+        regions = GenomicRegionSet("sorted")
+        regions.read(filename, io=GRSFileIO.BedGraph)
+        streamed = [r.toString() + r.data for c in GenomicRegionSet.iter_file(output, io=GRSFileIO.BedGraph)
+                    for r in c.regions()]
+        self.assertEqual(streamed, [r.toString() + r.data for r in regions])
+
+
+if __name__ == "__main__":
+    unittest.main()
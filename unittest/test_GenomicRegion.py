@@ -109,3 +109,13 @@ class TestGenomicRegion(unittest.TestCase):
 
         r2 = GenomicRegion(chrom=1, initial=10, final=18)
         self.assertTrue(r >= r2)
+
+    def test_slots(self):
+        r = GenomicRegion(chrom="chr" + "1", initial=10, final=20, data="5")
+        r2 = GenomicRegion(chrom="".join(["ch", "r1"]), initial=30, final=40)
+        # The chromosome names are shared, no attribute dictionary is created
+        self.assertIs(r.chrom, r2.chrom)
+        self.assertEqual(r.__dict__, {})
+        # Other attributes can still be set
+        r.sequence = "ACGT"
+        self.assertEqual(r.__dict__, {"sequence": "ACGT"})
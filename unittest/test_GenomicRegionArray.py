@@ -0,0 +1,440 @@
+from __future__ import division
+from __future__ import print_function
+
+import gzip
+import os
+import random
+import tempfile
+import unittest
+
+import numpy
+
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet, GRSFileIO
+from rgt.GenomicRegionArray import GenomicRegionArray, CHROMOSOMES
+from rgt import GenomicRegionArray as kernels
+from rgt.Util import OverlapType
+
+from random_regions import random_set
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+"""Unit Test"""
+
+
+def region_set(regions):
+    regions_set = GenomicRegionSet("regions")
+    for r in regions:
+        regions_set.add(r)
+    return regions_set
+
+
+def positions(regions):
+    return set((r.chrom, p) for r in regions for p in range(r.initial, r.final))
+
+
+class TestGenomicRegionArray(unittest.TestCase):
+
+    def test_round_trip(self):
+        regions = [GenomicRegion("chr2", 10, 20, name="a", orientation="+", data="1\tx"),
+                   GenomicRegion("chr1", 5, 8)]
+        array = GenomicRegionArray.from_regions(regions)
+        self.assertEqual(len(array), 2)
+        self.assertEqual(array.chrom_names(), ["chr2", "chr1"])
+        back = array.regions()
+        self.assertEqual(back, regions)
+        self.assertEqual(back[0].name, "a")
+        self.assertEqual(back[0].data, "1\tx")
+        self.assertEqual(back[1].orientation, None)
+        self.assertEqual(array.region(1), regions[1])
+        self.assertEqual(array.coverage(), 13)
+
+    def test_sort_order(self):
+        array = GenomicRegionArray.from_columns(["chr2", "chr10", "chr1", "chr1"], [5, 1, 9, 3], [6, 2, 10, 4])
+        self.assertFalse(array.is_sorted())
+        ordered = array.take(array.sort_order())
+        self.assertTrue(ordered.is_sorted())
+        self.assertEqual(ordered.chrom_names(), ["chr1", "chr1", "chr10", "chr2"])
+        self.assertEqual(ordered.initials.tolist(), [3, 9, 1, 5])
+        # Registering a new chromosome keeps the lexicographic order of the older ones
+        CHROMOSOMES.code("chr0_new")
+        self.assertTrue(ordered.is_sorted())
+
+    def test_lazy_regions(self):
+        regions = GenomicRegionSet("lazy")
+        regions.load_array(GenomicRegionArray.from_columns(["chr1", "chr1"], [1, 5], [3, 9]), sorted=True)
+        merged = regions.merge(w_return=True)
+        self.assertIsNone(merged._sequences)
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged.total_coverage(), 6)
+        # Iteration builds the GenomicRegion objects once and keeps them
+        first = merged[0]
+        first.name = "changed"
+        self.assertEqual(merged[0].name, "changed")
+
+    def test_read_bed(self):
+        handle, path = tempfile.mkstemp(suffix=".bed")
+        with os.fdopen(handle, "w") as f:
+            f.write("track name=test\n")
+            f.write("chr2\t10\t20\tb\t0\t-\n")
+            f.write("chr1\t30\t20\ta\t5\t+\textra\n")
+            f.write("chr1\t7\t7\tzero\n")
+        try:
+            regions = GenomicRegionSet("bed")
+            regions.read(path)
+        finally:
+            os.remove(path)
+        self.assertTrue(regions.sorted)
+        self.assertEqual(len(regions), 2)
+        self.assertEqual(regions[0].toString(), "chr1:20-30")
+        self.assertEqual(regions[0].orientation, "+")
+        self.assertEqual(regions[0].data, "5\textra")
+        self.assertEqual(regions[1].name, "b")
+
+    def test_operations_against_regions(self):
+        for seed in range(40):
+            a = random_set(25, seed, zero_length=seed % 3 == 0)
+            b = random_set(20, seed + 1000, zero_length=seed % 4 == 0)
+            list_a, list_b = list(a), list(b)
+
+            expected = sorted([r for r in list_a if any(r.overlap(q) for q in list_b)])
+            self.assertEqual([r.toString() for r in a.intersect(b, mode=OverlapType.ORIGINAL)],
+                             [r.toString() for r in expected])
+
+            expected = [r for r in list_a if any(r.overlap(q) and q.initial <= r.initial and r.final <= q.final
+                                                 for q in list_b)]
+            self.assertEqual(len(a.intersect(b, mode=OverlapType.COMP_INCL)), len(expected))
+
+            self.assertEqual(a.counts_per_region(b).tolist(),
+                             [sum(1 for q in list_b if r.overlap(q)) for r in sorted(list_a)])
+            covered = positions(list_b)
+            self.assertEqual(a.coverage_per_region(b).tolist(),
+                             [len(positions([r]) & covered) / max(len(r), 1) for r in sorted(list_a)])
+
+            if seed % 3 and seed % 4:
+                self.assertEqual(positions(a.intersect(b)), positions(list_a) & positions(list_b))
+                self.assertEqual(positions(a.subtract(b)), positions(list_a) - positions(list_b))
+                merged = a.merge(w_return=True)
+                self.assertEqual(positions(merged), positions(list_a))
+                self.assertFalse(any(x.overlap(y) for x, y in zip(merged, merged[1:])))
+
+    def test_iter_file(self):
+        regions = random_set(300, 5)
+        regions.sort()
+        handle, path = tempfile.mkstemp(suffix=".bed.gz")
+        os.close(handle)
+        with gzip.open(path, "wt") as f:
+            f.write("track name=test\n")
+            for r in regions:
+                f.write("%s\t%d\t%d\t%s\t0\t%s\n" % (r.chrom, r.initial, r.final, r.name, r.orientation))
+        try:
+            chunks = list(GenomicRegionSet.iter_file(path, chunk_size=32))
+            self.assertEqual([len(c) for c in chunks], [31] + [32] * 8 + [13])
+            streamed = list(GenomicRegionSet.iter_file(path, chunk_size=32, as_regions=True))
+            self.assertEqual(streamed, list(regions))
+
+            reference = random_set(40, 6)
+            for mode in [OverlapType.OVERLAP, OverlapType.ORIGINAL, OverlapType.COMP_INCL]:
+                result = reference.iter_intersect(GenomicRegionSet.iter_file(path, chunk_size=32), mode=mode)
+                self.assertEqual([r.toString() for c in result for r in c.regions()],
+                                 [r.toString() for r in regions.intersect(reference, mode=mode)])
+
+            merged = GenomicRegionSet.iter_merged(GenomicRegionSet.iter_file(path, chunk_size=7))
+            self.assertEqual([r.toString() for c in merged for r in c.regions()],
+                             [r.toString() for r in regions.merge(w_return=True)])
+
+            # The reference is converted once for all chunks
+            with mock.patch.object(reference, "as_array", wraps=reference.as_array) as as_array:
+                counts = reference.counts_per_region_stream(GenomicRegionSet.iter_file(path, chunk_size=32))
+            self.assertEqual(as_array.call_count, 1)
+            self.assertEqual(counts.tolist(), reference.counts_per_region(regions).tolist())
+        finally:
+            os.remove(path)
+
+    def test_parse_columns(self):
+        lines = ["chr2\t10\t20\tb\t0\t-\n", "chr1\t30\t20\ta\t5\t+\textra\n"]
+        self.assertIsNone(GRSFileIO.Bed.parse_columns(lines))
+        lines[0] = "chr2\t10\t20\tb\t0\t-\tmore\n"
+        fast = GRSFileIO.Bed.parse_columns(lines)
+        slow, errors = GRSFileIO.Bed.parse_lines(lines, "test.bed")
+        self.assertEqual(errors, 0)
+        for column in ["chroms", "initials", "finals", "orientations", "names", "data"]:
+            self.assertEqual(getattr(fast, column).tolist(), getattr(slow, column).tolist())
+        self.assertEqual(fast.data.tolist(), ["0\tmore", "5\textra"])
+        # Irregular lines are left to the line-by-line parser
+        self.assertIsNone(GRSFileIO.Bed.parse_columns(["chr1\t1\t5\n", "chr1 2\t6\n"]))
+        self.assertIsNone(GRSFileIO.Bed.parse_columns(["chr1\t1\t5\tx\n", "chr1\t1\t5\n"]))
+        self.assertIsNone(GRSFileIO.Bed.parse_columns(["chr1\t1\t5\n", "chr1\tx\t5\n"]))
+        self.assertIsNone(GRSFileIO.Bed.parse_columns(["chr1\t5\t5\n"]))
+
+    def test_read_cache(self):
+        handle, path = tempfile.mkstemp(suffix=".bed")
+        with os.fdopen(handle, "w") as f:
+            f.write("chr2\t10\t20\tb\t0\t-\n")
+            f.write("chr1\t30\t20\ta\t5\t+\n")
+        try:
+            regions = GenomicRegionSet("bed")
+            regions.read(path, cache=True)
+            self.assertTrue(os.path.isfile(path + ".rgtidx"))
+            cached = GenomicRegionSet("cached")
+            cached.read(path, cache=True)
+            self.assertTrue(cached.sorted)
+            self.assertEqual([str(r) for r in cached], [str(r) for r in regions])
+
+            # A changed file is parsed again
+            with open(path, "a") as f:
+                f.write("chr3\t1\t2\n")
+            os.utime(path, (0, 0))
+            changed = GenomicRegionSet("changed")
+            changed.read(path, cache=True)
+            self.assertEqual(len(changed), 3)
+            self.assertIsNone(changed[2].name)
+
+            # A truncated cache file is removed and the file parsed again
+            with open(path + ".rgtidx", "rb") as f:
+                content = f.read()
+            with open(path + ".rgtidx", "wb") as f:
+                f.write(content[:len(content) // 2])
+            self.assertIsNone(kernels.load_cache(path, "Bed"))
+            self.assertFalse(os.path.isfile(path + ".rgtidx"))
+            with open(path + ".rgtidx", "wb") as f:
+                f.write(content[:len(content) // 2])
+            truncated = GenomicRegionSet("truncated")
+            truncated.read(path, cache=True)
+            self.assertEqual([str(r) for r in truncated], [str(r) for r in changed])
+            self.assertTrue(os.path.isfile(path + ".rgtidx"))
+            # Errors which do not come from the cache file are raised and keep the file
+            with mock.patch.object(kernels, "_unpack_strings", side_effect=TypeError):
+                self.assertRaises(TypeError, kernels.load_cache, path, "Bed")
+            self.assertTrue(os.path.isfile(path + ".rgtidx"))
+            # No temporary file is left behind
+            self.assertEqual([name for name in os.listdir(os.path.dirname(path))
+                              if name.startswith(os.path.basename(path) + ".rgtidx.")], [])
+        finally:
+            os.remove(path)
+            os.remove(path + ".rgtidx")
+
+    def test_iter_unsorted(self):
+        chunks = [GenomicRegionArray.from_columns(["chr1", "chr2"], [5, 1], [9, 4]),
+                  GenomicRegionArray.from_columns(["chr1"], [0], [3])]
+        with self.assertRaises(ValueError):
+            list(GenomicRegionSet.iter_merged(chunks))
+
+    def test_per_region_many(self):
+        reference = random_set(30, 1)
+        sets = [random_set(20, seed) for seed in range(2, 6)]
+        counts = reference.counts_per_region(sets)
+        coverage = reference.coverage_per_region(sets)
+        self.assertEqual(counts.shape, (4, 30))
+        for k, regions in enumerate(sets):
+            self.assertEqual(counts[k].tolist(), reference.counts_per_region(regions).tolist())
+            self.assertEqual(coverage[k].tolist(), reference.coverage_per_region(regions).tolist())
+
+    def test_overlap_matrix(self):
+        sets = [random_set(30, seed) for seed in range(6)]
+        jaccard = GenomicRegionSet.overlap_matrix(sets)
+        bp = GenomicRegionSet.overlap_matrix(sets, metric="bp")
+        counts = GenomicRegionSet.overlap_matrix(sets, metric="count")
+        for i, a in enumerate(sets):
+            self.assertEqual(bp[i, i], a.merge(w_return=True).total_coverage())
+            self.assertEqual(counts[i, i], len(a.merge(w_return=True)))
+            for j, b in enumerate(sets):
+                if i != j:
+                    self.assertAlmostEqual(jaccard[i, j], a.jaccard(b))
+                    self.assertEqual(bp[i, j], a.intersect_count(b, mode_count="bp")[2])
+                    self.assertEqual(counts[i, j], a.intersect_count(b)[2])
+
+    def test_keyed_intersect(self):
+        for seed in range(6):
+            a = random_set(60, seed, zero_length=True)
+            b = random_set(60, seed + 50, zero_length=True)
+            a.sort()
+            b.sort()
+            for strand, name in [(True, False), (False, True), (True, True)]:
+                def match(r, t):
+                    return r.overlap(t) and (not strand or r.orientation == t.orientation) and \
+                        (not name or r.name == t.name)
+
+                original = a.intersect(b, mode=OverlapType.ORIGINAL, strand_specific=strand, name_specific=name)
+                self.assertEqual([r.toString() + r.name for r in original],
+                                 [r.toString() + r.name for r in a if any(match(r, t) for t in b)])
+                included = a.intersect(b, mode=OverlapType.COMP_INCL, strand_specific=strand, name_specific=name)
+                self.assertEqual([r.toString() for r in included],
+                                 [r.toString() for r in a if any(
+                                     (not strand or r.orientation == t.orientation) and
+                                     (not name or r.name == t.name) and
+                                     len(region_set([r]).intersect(
+                                         region_set([t]), mode=OverlapType.COMP_INCL)) > 0
+                                     for t in b)])
+                overlap = a.intersect(b, strand_specific=strand, name_specific=name)
+                expected = set()
+                for key in set((r.orientation if strand else None, r.name if name else None) for r in a):
+                    def select(regions):
+                        return region_set(
+                            [r for r in regions if (r.orientation if strand else None, r.name if name else None)
+                             == key])
+                    expected |= positions(select(a).intersect(select(b)))
+                self.assertEqual(positions(overlap), expected)
+                self.assertTrue(all(overlap[i] <= overlap[i + 1] for i in range(len(overlap) - 1)))
+
+    def test_min_fraction(self):
+        a = random_set(80, 3)
+        b = random_set(40, 4)
+        a.sort()
+        b.sort()
+        covered = positions(b)
+        for fraction in [0, 0.3, 0.5, 1]:
+            original = a.intersect(b, mode=OverlapType.ORIGINAL, min_fraction=fraction)
+            self.assertEqual([r.toString() for r in original],
+                             [r.toString() for r in a if any(r.overlap(t) for t in b) and
+                              len(positions([r]) & covered) >= fraction * len(r)])
+        c_a, c_b, c_ab = a.intersect_count(b, threshold=50)
+        merged = a.merge(w_return=True)
+        self.assertEqual(c_ab, len([r for r in merged if len(positions([r]) & covered) >= 0.5 * len(r)]))
+        self.assertEqual(c_a + c_ab, len(merged))
+
+    def test_intersect_counts(self):
+        for seed in range(20):
+            a = random_set(random.Random(seed).randint(1, 50), seed, zero_length=seed % 3 == 0)
+            b = random_set(40, seed + 100, zero_length=seed % 2 == 0)
+            merged_a, merged_b = a.merge(w_return=True), b.merge(w_return=True)
+            for threshold in [False, 20, 50]:
+                fraction = threshold / 100. if threshold else 0
+                inter = merged_a.intersect(merged_b, mode=OverlapType.ORIGINAL, min_fraction=fraction)
+                inter2 = merged_b.intersect(merged_a, mode=OverlapType.ORIGINAL, min_fraction=fraction)
+                self.assertEqual(a.intersect_count(b, threshold=threshold),
+                                 (len(merged_a) - len(inter), len(merged_b) - len(inter2), len(inter)))
+                inter = merged_a.intersect(merged_b, min_fraction=fraction).total_coverage()
+                self.assertEqual(a.intersect_count(b, mode_count="bp", threshold=threshold),
+                                 (merged_a.total_coverage() - inter, merged_b.total_coverage() - inter, inter))
+
+    def test_n_jobs(self):
+        a = random_set(200, 1, zero_length=True)
+        b = random_set(150, 2, zero_length=True)
+        b.sort()
+
+        def strings(regions):
+            return [r.toString() + str(r.name) + str(r.orientation) + str(r.data) for r in regions]
+
+        for mode in [OverlapType.OVERLAP, OverlapType.ORIGINAL, OverlapType.COMP_INCL]:
+            self.assertEqual(strings(a.intersect(b, mode=mode, n_jobs=4)), strings(a.intersect(b, mode=mode)))
+        self.assertEqual(strings(a.subtract(b, n_jobs=4)), strings(a.subtract(b)))
+        self.assertEqual(strings(a.subtract(b, whole_region=True, n_jobs=4)),
+                         strings(a.subtract(b, whole_region=True)))
+        self.assertEqual(strings(a.merge(w_return=True, n_jobs=4)), strings(a.merge(w_return=True)))
+        self.assertEqual(strings(a.merge(w_return=True, namedistinct=True, strand_specific=True, n_jobs=4)),
+                         strings(a.merge(w_return=True, namedistinct=True, strand_specific=True)))
+        self.assertEqual(strings(a.cluster(15, n_jobs=4)), strings(a.cluster(15)))
+        self.assertEqual(a.counts_per_region(b, n_jobs=4).tolist(), a.counts_per_region(b).tolist())
+        self.assertEqual(a.coverage_per_region(b, n_jobs=4).tolist(), a.coverage_per_region(b).tolist())
+        self.assertEqual(kernels.map_chroms(kernels.nearest, a.as_array(), b.as_array(), n_jobs=-1,
+                                            offsets=("a", "b", None))[1].tolist(),
+                         kernels.nearest(a.as_array(), b.as_array())[1].tolist())
+
+    def test_nearest(self):
+        for seed in range(30):
+            a = random_set(40, seed, zero_length=True)
+            b = random_set(random.Random(seed).randint(0, 40), seed + 100, zero_length=True)
+            b.sort()
+            for top_n, max_distance, strand_specific in [(1, None, False), (3, 20, False), (None, None, False),
+                                                         (2, None, True), (None, 30, True)]:
+                expected = []
+                for i, r in enumerate(a):
+                    candidates = []
+                    for j, t in enumerate(b):
+                        d = r.distance(t)
+                        if d is None or (strand_specific and r.orientation != t.orientation):
+                            continue
+                        if max_distance is not None and d > max_distance:
+                            continue
+                        candidates.append((d, j, -d if d > 0 and t.final <= r.initial else d))
+                    candidates.sort()
+                    if top_n is None:
+                        left = [c for c in candidates if c[2] < 0][:1]
+                        right = [c for c in candidates if c[2] > 0][:1]
+                        candidates = sorted([c for c in candidates if c[0] == 0] + left + right)
+                    else:
+                        candidates = candidates[:top_n]
+                    expected += [(i, j, signed) for d, j, signed in candidates]
+                query, target, distance = kernels.nearest(a.as_array(), b.as_array(), top_n=top_n,
+                                                          max_distance=max_distance, strand_specific=strand_specific)
+                self.assertEqual(list(zip(query.tolist(), target.tolist(), distance.tolist())), expected)
+
+    def test_merge_cluster_kernels(self):
+        for seed in range(40):
+            regions = sorted(random_set(60, seed, zero_length=True))
+            array = GenomicRegionArray.from_regions(regions)
+            # Merge of consecutive regions with the same name and orientation
+            expected = []
+            for r in regions:
+                last = expected[-1] if expected else None
+                if last and last.chrom == r.chrom and r.initial < last.final and \
+                        (last.name, last.orientation) == (r.name, r.orientation):
+                    last.final = max(last.final, r.final)
+                else:
+                    expected.append(GenomicRegion(r.chrom, r.initial, r.final, r.name, r.orientation))
+            keys = kernels.region_keys([array], strand_specific=True, name_specific=True)[0]
+            self.assertEqual([r.toString() for r in kernels.merge(array, keys=keys).regions()],
+                             [r.toString() for r in expected])
+
+            for distance in [0, 1, 10]:
+                clusters = []
+                for r in regions:
+                    if clusters and r.extend(distance, distance, w_return=True).overlap(clusters[-1]):
+                        clusters[-1].final = max(clusters[-1].final, r.final)
+                    else:
+                        clusters.append(GenomicRegion(r.chrom, r.initial, r.final))
+                self.assertEqual([r.toString() for r in kernels.cluster(array, distance).regions()],
+                                 [r.toString() for r in clusters])
+
+        values = numpy.array([5, 1, 1 << 61, 3, 1 << 62, 0, 2], dtype=numpy.int64)
+        segments = numpy.array([True, False, True, True, False, True, False])
+        self.assertEqual(kernels._segmented_maximum(values, segments).tolist(),
+                         [5, 5, 1 << 61, 3, 1 << 62, 0, 2])
+
+    def test_coordinate_transforms(self):
+        regions = random_set(50, 3, zero_length=True)
+        list_regions = list(regions)
+        self.assertEqual([r.toString() for r in regions.extend_upstream(5, w_return=True)],
+                         [r.extend(5 if r.orientation == "+" else 0, 0 if r.orientation == "+" else 5,
+                                   w_return=True).toString() for r in list_regions])
+        self.assertEqual([(r.chrom, r.initial, r.final, r.name) for r in regions.flank(20)],
+                         [f for r in list_regions for f in [(r.chrom, max(0, r.initial - 20), r.initial, "upstream"),
+                                                            (r.chrom, r.final, r.final + 20, "downstream")]])
+        relocated = regions.relocate_regions("upstream", left_length=2, right_length=3)
+        self.assertEqual([(r.initial, r.final, r.name) for r in relocated],
+                         [(max(0, p - 2), p + 3, r.name) for r in list_regions
+                          for p in [r.final if r.orientation == "-" else r.initial]])
+        self.assertRaises(ValueError, regions.relocate_regions, "center")
+
+    def test_combinations(self):
+        for seed in range(20):
+            sets = [random_set(random.Random(seed * 3 + j).randint(1, 30), seed * 10 + j) for j in range(3)]
+            combinations = GenomicRegionSet.combinations(sets)
+            for mask in range(1, 8):
+                expected = [s for j, s in enumerate(sets) if mask >> j & 1][0]
+                for j, s in enumerate(sets):
+                    if mask >> j & 1:
+                        expected = expected.intersect(s) if s is not expected else expected
+                    else:
+                        expected = expected.subtract(s)
+                result = combinations.get(mask, [])
+                self.assertEqual([(r.toString(), r.name, r.orientation) for r in result],
+                                 [(r.toString(), r.name, r.orientation) for r in expected])
+
+            masks, counts, lengths = GenomicRegionSet.combination_counts(sets)
+            self.assertEqual(masks.tolist(), list(range(8)))
+            self.assertEqual(counts.tolist(), [len(combinations.get(m, [])) for m in range(8)])
+            self.assertEqual(lengths.tolist(), [combinations[m].total_coverage() if m in combinations else 0
+                                                for m in range(8)])
+            sparse = GenomicRegionSet.combination_counts(sets, sparse=True)
+            self.assertEqual(sparse[0].tolist(), sorted(combinations))
+            self.assertEqual(sparse[1].tolist(), counts[sparse[0]].tolist())
+            self.assertEqual(sparse[2].tolist(), lengths[sparse[0]].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
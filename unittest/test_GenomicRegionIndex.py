@@ -0,0 +1,85 @@
+from __future__ import division
+from __future__ import print_function
+
+import random
+import unittest
+
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionArray import GenomicRegionArray
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+"""Unit Test"""
+
+
+class TestGenomicRegionIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.regions = GenomicRegionSet("indexed")
+        for _ in range(500):
+            initial = rng.randint(0, 5000)
+            # A few very long regions force several components
+            length = rng.choice([rng.randint(0, 50), rng.randint(0, 50), rng.randint(500, 3000)])
+            self.regions.add(GenomicRegion(chrom=rng.choice(["chr1", "chr2"]), initial=initial,
+                                           final=initial + length))
+        self.queries = []
+        for _ in range(200):
+            initial = rng.randint(0, 5500)
+            self.queries.append(GenomicRegion(chrom=rng.choice(["chr1", "chr2", "chr3"]), initial=initial,
+                                              final=initial + rng.randint(0, 100)))
+
+    def test_query(self):
+        index = self.regions.index()
+        self.assertTrue(max(len(c[1]) for c in index.chroms.values()) > 1)
+        for q in self.queries:
+            expected = [i for i, r in enumerate(self.regions) if r.overlap(q)]
+            self.assertEqual(index.query(q.chrom, q.initial, q.final).tolist(), expected)
+            self.assertEqual(index.count(q.chrom, q.initial, q.final), len(expected))
+            self.assertEqual(index.any(q.chrom, q.initial, q.final), bool(expected))
+
+    def test_region_queries(self):
+        for q in self.queries[:50]:
+            covered = self.regions.covered_by_aregion(q)
+            self.assertEqual([r.toString() for r in covered],
+                             [r.toString() for r in self.regions if r.overlap(q)])
+            self.assertEqual(self.regions.include(q), any(r.overlap(q) for r in self.regions))
+            query = GenomicRegionSet("query")
+            query.add(q)
+            self.assertEqual(self.regions.count_by_region(q), len(self.regions.intersect(query)))
+
+    def test_any_chrom(self):
+        self.assertEqual(self.regions.any_chrom("chr2"), [r for r in self.regions if r.chrom == "chr2"])
+        self.assertEqual(self.regions.any_chrom("chr2", len_min=40),
+                         [r for r in self.regions if r.chrom == "chr2" and len(r) >= 40])
+        self.assertEqual(self.regions.any_chrom("chr3"), [])
+
+    def test_invalidation(self):
+        q = GenomicRegion("chr9", 10, 20)
+        self.assertFalse(self.regions.include(q))
+        self.regions.add(GenomicRegion("chr9", 15, 30))
+        self.assertTrue(self.regions.include(q))
+        self.regions.sort()
+        self.assertEqual(len(self.regions.covered_by_aregion(q)), 1)
+        self.regions.merge()
+        self.assertEqual(self.regions.index().count("chr9", 0, 100), 1)
+
+        # Regions added to or removed from the list of GenomicRegions directly
+        self.regions.sequences += [GenomicRegion("chr9", 50, 60)]
+        self.assertEqual(self.regions.index().count("chr9", 0, 100), 2)
+        self.assertEqual(self.regions.any_chrom("chr9"), [r for r in self.regions if r.chrom == "chr9"])
+        del self.regions.sequences[-1]
+        self.assertEqual(len(self.regions.covered_by_aregion(GenomicRegion("chr9", 40, 70))), 0)
+        del self.regions.sequences[:]
+        self.assertFalse(self.regions.include(q))
+        self.assertEqual(self.regions.any_chrom("chr1"), [])
+
+        # The index of column-wise regions is kept when they become GenomicRegion objects
+        regions = GenomicRegionSet("columns")
+        regions.load_array(GenomicRegionArray.from_columns(["chr1", "chr1"], [1, 5], [3, 9]), sorted=True)
+        index = regions.index()
+        self.assertEqual(len(regions.sequences), 2)
+        self.assertIs(regions.index(), index)
+
+
+if __name__ == "__main__":
+    unittest.main()
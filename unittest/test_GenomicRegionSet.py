@@ -454,6 +454,34 @@ class TestGenomicRegionSet(unittest.TestCase):
                          [])
         result = self.setA.closest(self.setB)
         self.assertEqual(len(result), 0)
+        """
+        A : ------      ---------               -------
+        B :        ----           -----  ------
+        R :        ----                  ------
+        """
+        self.region_sets([['chr1', 1, 5], ['chr1', 11, 20], ['chr1', 35, 38]],
+                         [['chr1', 7, 9], ['chr1', 23, 25], ['chr1', 27, 31]])
+        result, distances = self.setA.closest(self.setB, return_list=True)
+        self.assertEqual([(r.initial, r.final) for r in result], [(7, 9), (7, 9), (27, 31)])
+        self.assertEqual(distances.tolist(), [2, 2, 4])
+        result = self.setA.closest(self.setB, max_dis=3)
+        self.assertEqual(len(result), 2)
+        result, distances = self.setA.closest(self.setB, return_list=True, top_N=2)
+        self.assertEqual([(r.initial, r.final) for r in result["chr1:11-20"]], [(7, 9), (23, 25)])
+        self.assertEqual(distances["chr1:11-20"].tolist(), [2, 3])
+        self.assertEqual(self.setA.get_distance(self.setB, thresh_dist=4),
+                         [[None, "+2", None], [None, "-2", None], [None, "+3", None]])
+        # The closest end before a region, the closest start after it, or all overlapping regions only
+        regions = GenomicRegionSet("regions")
+        for initial, final, name in [(30, 33, "a"), (37, 40, "b"), (47, 49, "c")]:
+            regions.add(GenomicRegion(chrom="chr1", initial=initial, final=final, name=name))
+        targets = GenomicRegionSet("targets")
+        for initial, final, name in [(0, 10, "x"), (11, 12, "y"), (35, 43, "z"), (45, 51, "v"), (48, 53, "w")]:
+            targets.add(GenomicRegion(chrom="chr1", initial=initial, final=final, name=name))
+        self.assertEqual(regions.get_distance(targets),
+                         [["a", "-18", "y"], ["a", "+2", "z"], ["b", "0", "z"], ["c", "0", "v"], ["c", "0", "w"]])
+        self.assertEqual(regions.get_distance(targets, ignore_overlap=True, thresh_dist=10),
+                         [["a", "+2", "z"], ["b", "+5", "v"], ["c", "-4", "z"]])
         # """
         # One empty set
         # A :   -----
@@ -1034,6 +1062,84 @@ class TestGenomicRegionSet(unittest.TestCase):
         result = self.setA.cluster(26)
         self.assertEqual(len(result), 1)
 
+    def test_combine(self):
+        """
+        Two sorted sets are combined into a sorted set.
+        """
+        self.region_sets([['chr1', 1, 10], ['chr2', 5, 8]],
+                         [['chr1', 5, 15], ['chr1', 20, 25]])
+        self.setA.sort()
+        self.setB.sort()
+        result = self.setA.combine(self.setB, output=True)
+        self.assertTrue(result.sorted)
+        self.assertEqual([r.toString() for r in result],
+                         ["chr1:1-10", "chr1:5-15", "chr1:20-25", "chr2:5-8"])
+        self.assertEqual(len(self.setA), 2)
+        # Column-wise sets are combined by the same linear merge
+        a = self.setA.merge(w_return=True)
+        a.combine(self.setB.merge(w_return=True), change_name=False)
+        self.assertTrue(a.sorted)
+        self.assertEqual([r.toString() for r in a], [r.toString() for r in result])
+        # Unsorted sets are only concatenated
+        self.region_sets([['chr2', 1, 10]],
+                         [['chr1', 5, 15]])
+        self.setA.combine(self.setB)
+        self.assertFalse(self.setA.sorted)
+        self.assertEqual([r.chrom for r in self.setA], ["chr2", "chr1"])
+
+    def test_no_aliasing(self):
+        """
+        Results of merge, cluster and subtract do not share GenomicRegion objects with the input.
+        """
+        self.region_sets([['chr1', 1, 10], ['chr1', 5, 15]],
+                         [])
+        regions = list(self.setA)
+        for result in [self.setA.merge(w_return=True), self.setA.cluster(10), self.setA.subtract(self.setB)]:
+            result[0].initial = 100
+            self.assertEqual([r.initial for r in regions], [1, 5])
+        self.region_sets([['chr1', 1, 10]],
+                         [])
+        result = self.setA.merge(w_return=True)
+        self.assertIsNot(result, self.setA)
+        result[0].final = 100
+        self.assertEqual(self.setA[0].final, 10)
+
+    def test_in_place_keeps_regions(self):
+        """
+        extend and merge in place change the GenomicRegion objects themselves; copies keep their class and attributes.
+        """
+        from rgt.tdf.BindingSiteSet import BindingSite, BindingSiteSet
+        sites = BindingSiteSet("sites")
+        sites.add(BindingSite("chr1", 10, 20, score=7))
+        sites.add(BindingSite("chr1", 30, 40, score=3))
+        regions = list(sites)
+        sites.extend(2, 2)
+        sites.extend_upstream(1)
+        # Regions without orientation are extended upstream as "-"
+        self.assertEqual([r.initial for r in regions], [8, 28])
+        self.assertEqual([r.final for r in regions], [23, 43])
+        self.assertEqual([type(r) for r in sites], [BindingSite, BindingSite])
+        self.assertEqual([r.score for r in sites], [7, 3])
+
+        self.region_sets([['chr1', 1, 10], ['chr1', 5, 15], ['chr1', 20, 30]],
+                         [])
+        for r in self.setA:
+            r.sequence = "ACGT"
+        regions = list(self.setA)
+        self.setA.merge()
+        self.assertEqual(len(self.setA), 2)
+        self.assertIs(self.setA[0], regions[0])
+        self.assertIs(self.setA[1], regions[2])
+        self.assertEqual((regions[0].initial, regions[0].final), (1, 15))
+        self.setA.extend(1, 1)
+        self.assertEqual([r.sequence for r in self.setA], ["ACGT", "ACGT"])
+
+        copied = sites.subtract(GenomicRegionSet("empty"))
+        self.assertEqual([type(r) for r in copied], [BindingSite, BindingSite])
+        self.assertEqual([r.score for r in copied], [7, 3])
+        copied[0].initial = 0
+        self.assertEqual(sites[0].initial, 8)
+
     def test_flank(self):
         """
         A :        -----
@@ -1086,6 +1192,46 @@ class TestGenomicRegionSet(unittest.TestCase):
         result = GenomicRegionSet("hg19")
         result.get_genome_data(organism="hg19", chrom_M=True)
         self.assertEqual(len(result), 24)
+        """The chromosome sizes are parsed once and shared"""
+        table = GenomeData("hg19").get_chromosome_sizes_table()
+        self.assertIs(GenomeData("hg19").get_chromosome_sizes_table(), table)
+        self.assertEqual(result.total_coverage(), table.sizes[table.select(chrom_M=True)].sum())
+        self.assertEqual(table.get_size("chr1"), 249250621)
+        self.assertEqual(table.total, sum(table.as_dict().values()))
+
+    def test_gene_association(self):
+        genes, names = gene_index("hg19")
+        self.assertIs(gene_index("hg19")[0], genes)
+        i = names.index("AC079779.5")
+        # Minus strand gene chr2:305111-314367, extended by the promoter downstream of its final
+        self.assertEqual((genes.initials[i], genes.finals[i]), (305111, 315367))
+        self.region_sets([['chr2', 302915, 303608], ['chr2', 306000, 306100]], [])
+        result = self.setA.gene_association("hg19", show_dis=True)
+        self.assertEqual([r.name for r in result], ['AC079779.4(-1400):AC079779.5(+1503)', 'AC079779.5'])
+        gene_set = GeneSet("genes")
+        gene_set.genes = ["ac079779.4"]
+        result = self.setA.gene_association("hg19", gene_set=gene_set, show_dis=True)
+        self.assertEqual(result[0].name, 'AC079779.4(-1400)')
+
+        # Checked by hand against the gene regions of hg19 (promoters of 1000 bp, upstream of the strand):
+        # RP11-34P13.9 chr1:160446-161525 +, RP11-34P13.13 chr1:141474-173862 -, AP006222.2 chr1:227615-267253 -,
+        # RP4-669L17.8 chr1:326096-328112 +, RP4-669L17.10 chr1:317720-453948 +, CICP7 chr1:329431-332236 -
+        self.region_sets([['chr1', 175000, 176000], ['chr1', 212802, 215557], ['chr1', 212802, 215557],
+                          ['chr1', 330000, 330500]], [])
+        result = self.setA.gene_association("hg19", show_dis=True)
+        self.assertEqual([r.name for r in result],
+                         # The closest end before the region, not the last gene starting before it
+                         ['RP11-34P13.13(-138):AP006222.2(+51615)',
+                          # Equal regions have equal associations
+                          'RP11-34P13.13(-37940):AP006222.2(+12058)', 'RP11-34P13.13(-37940):AP006222.2(+12058)',
+                          # All overlapping genes
+                          'RP4-669L17.10:CICP7'])
+        self.assertEqual([r.proximity for r in result], ['138:51615', '37940:12058', '37940:12058', 0])
+        result = self.setA.gene_association("hg19", thresh_dist=12059)
+        self.assertEqual([r.name for r in result], ['RP11-34P13.13(-)', 'AP006222.2(+)', 'AP006222.2(+)',
+                                                     'RP4-669L17.10:CICP7'])
+        result = self.setA.gene_association("hg19", thresh_dist=12058)
+        self.assertEqual([r.name for r in result][1:3], ['.', '.'])
 
     def test_random_regions(self):
 
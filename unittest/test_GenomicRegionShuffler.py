@@ -0,0 +1,50 @@
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt.GenomicRegionShuffler import GenomicRegionShuffler
+
+"""Unit Test"""
+
+
+class TestGenomicRegionShuffler(unittest.TestCase):
+
+    def setUp(self):
+        self.space = GenomicRegionSet("space")
+        for chrom, initial, final in [("chr1", 0, 1000), ("chr1", 500, 1200), ("chr1", 2000, 2100),
+                                      ("chr2", 100, 400)]:
+            self.space.add(GenomicRegion(chrom, initial, final))
+        self.lengths = [50, 100, 10, 80] * 5
+
+    def inside(self, regions):
+        return all(any(s.chrom == r.chrom and s.initial <= r.initial and r.final <= s.final
+                       for s in self.space) for r in regions)
+
+    def test_shuffle(self):
+        shuffler = GenomicRegionShuffler(self.space.as_array(), seed=1)
+        self.assertEqual(len(shuffler), 1200 + 100 + 300)
+        shuffles = list(shuffler.shuffles(self.lengths, 10))
+        self.assertEqual(len(shuffles), 10)
+        for array in shuffles:
+            regions = array.regions()
+            self.assertEqual([len(r) for r in regions], self.lengths)
+            self.assertTrue(self.inside(regions))
+        other = GenomicRegionShuffler(self.space.as_array(), seed=1).shuffle(self.lengths * 10)
+        self.assertEqual(other.initials.tolist()[:len(self.lengths)], shuffles[0].initials.tolist())
+
+    def test_disjoint(self):
+        shuffler = GenomicRegionShuffler(self.space.as_array(), seed=2)
+        for _ in range(20):
+            regions = GenomicRegionSet("random")
+            regions.load_array(shuffler.shuffle([20, 40, 10, 30] * 3, overlap=False))
+            self.assertTrue(self.inside(regions))
+            self.assertEqual(len(regions.merge(w_return=True)), len(regions))
+        with self.assertRaises(ValueError):
+            shuffler.shuffle([200] * 10, overlap=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
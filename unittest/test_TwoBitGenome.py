@@ -0,0 +1,98 @@
+from __future__ import division
+from __future__ import print_function
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from pysam import Fastafile
+
+from rgt import TwoBitGenome as packing
+from rgt.TwoBitGenome import TwoBitGenome
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+
+"""Unit Test"""
+
+
+class TestTwoBitGenome(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fasta = os.path.join(self.dir, "genome.fa")
+        rng = random.Random(3)
+        with open(self.fasta, "w") as f:
+            for i, length in enumerate([7, 3001, 12345]):
+                sequence = ""
+                while len(sequence) < length:
+                    sequence += rng.choice("ACGTACGTacgtNnRy") * rng.randint(1, 40)
+                print(">chr%d description" % (i + 1), file=f)
+                for j in range(0, length, 60):
+                    print(sequence[j:min(j + 60, length)], file=f)
+        self.regions = []
+        for i in range(500):
+            chrom = rng.choice(["chr1", "chr2", "chr3"])
+            initial = rng.randint(0, 13000)
+            self.regions.append((chrom, initial, initial + rng.choice([0, 1, 3, 50, 700, 20000])))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_fetch(self):
+        genome = TwoBitGenome.load(self.fasta)
+        reference = Fastafile(self.fasta)
+        self.assertTrue(os.path.isfile(self.fasta + packing.CACHE_SUFFIX))
+        self.assertEqual(list(genome.references), list(reference.references))
+        self.assertEqual(list(genome.lengths), list(reference.lengths))
+        for chrom in genome.references:
+            self.assertEqual(genome.fetch(chrom), reference.fetch(chrom))
+        for region in self.regions:
+            self.assertEqual(genome.fetch(*region), reference.fetch(*region))
+
+        # Same errors as pysam
+        self.assertRaises(KeyError, genome.fetch, "chrX", 1, 2)
+        self.assertRaises(ValueError, genome.fetch, "chr1", -1, 2)
+        self.assertRaises(ValueError, genome.fetch, "chr1", 5, 2)
+
+        # Opened once per process, rebuilt when the FASTA file changes
+        self.assertIs(TwoBitGenome.load(self.fasta), genome)
+        with open(self.fasta, "a") as f:
+            print(">chr4\nACGT", file=f)
+        changed = TwoBitGenome.load(self.fasta)
+        self.assertIsNot(changed, genome)
+        self.assertEqual(changed.fetch("chr4", 1, 3), "CG")
+
+    def test_fetch_many(self):
+        genome = TwoBitGenome.load(self.fasta)
+        reference = Fastafile(self.fasta)
+        expected = [reference.fetch(*region) for region in self.regions]
+        self.assertEqual(genome.fetch_many(self.regions), expected)
+
+        # Small batches split the regions
+        batch_size = packing.BATCH_SIZE
+        packing.BATCH_SIZE = 1000
+        try:
+            self.assertEqual(genome.fetch_many(self.regions), expected)
+        finally:
+            packing.BATCH_SIZE = batch_size
+
+        codes = genome.fetch_many(self.regions, as_codes=True)
+        for sequence, code in zip(expected, codes):
+            self.assertEqual(code.tolist(), ["ACGT".find(c) if c in "ACGT" else packing.N_CODE
+                                             for c in sequence.upper()])
+
+        regions = GenomicRegionSet("regions")
+        for chrom, initial, final in self.regions[:50]:
+            regions.add(GenomicRegion(chrom, initial, final))
+        self.assertEqual(genome.fetch_many(regions), [reference.fetch(r.chrom, r.initial, r.final) for r in regions])
+
+        self.assertRaises(KeyError, genome.fetch_many, [("chrX", 1, 2)])
+        self.assertEqual(genome.fetch_many([("chrX", 1, 2), ("chr1", 5, 2), ("chr1", 2, 5)], skip_invalid=True),
+                         [None, None, reference.fetch("chr1", 2, 5)])
+        self.assertEqual(genome.fetch_many([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
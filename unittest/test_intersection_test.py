@@ -0,0 +1,39 @@
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from random_regions import random_set
+
+try:
+    from rgt.viz.intersection_test import Intersect
+except ImportError:
+    Intersect = None
+
+"""Unit Test"""
+
+
+@unittest.skipIf(Intersect is None, "the dependencies of rgt.viz are not installed")
+class TestIntersect(unittest.TestCase):
+
+    def test_count_intersect(self):
+        references = [random_set(40, i, name="r%i" % i) for i in range(2)]
+        queries = [random_set(30, i + 10, name="q%i" % i) for i in range(3)]
+        for mode_count in ["count", "bp"]:
+            for threshold in [False, 20, 50]:
+                intersect = Intersect.__new__(Intersect)
+                intersect.mode_count = mode_count
+                intersect.groupedreference = {"": references}
+                intersect.groupedquery = {"": queries}
+                intersect.count_intersect(threshold=threshold)
+                # The observed counts match the ones computed for the randomized sets
+                for r in references:
+                    for q in queries:
+                        self.assertEqual(tuple(intersect.counts[""][r.name][q.name]),
+                                         r.intersect_count(q, mode_count=mode_count, threshold=threshold))
+                        self.assertEqual(intersect.frequency[""][q.name][r.name],
+                                         r.intersect_count(q, mode_count=mode_count, threshold=threshold)[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
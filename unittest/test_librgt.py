@@ -0,0 +1,68 @@
+from __future__ import division
+from __future__ import print_function
+
+import random
+import unittest
+
+import numpy
+
+from rgt.GenomicRegion import GenomicRegion
+from rgt.GenomicRegionSet import GenomicRegionSet
+from rgt import GenomicRegionArray as kernels
+from rgt import librgt
+from rgt.Util import OverlapType
+
+from random_regions import random_set
+
+"""Unit Test"""
+
+
+@unittest.skipIf(librgt.library() is None, "librgt is not installed")
+class TestLibRGT(unittest.TestCase):
+
+    def test_kernels(self):
+        for seed in range(60):
+            a = random_set(random.Random(seed).randint(0, 40), seed, zero_length=True)
+            b = random_set(30, seed + 1000, zero_length=True)
+            a.sort()
+            b.sort()
+            a, b = a.as_array(), b.as_array()
+            merged_a, merged_b = kernels.merge(a), kernels.merge(b)
+
+            expected = kernels.intersect_overlap(merged_a, merged_b)
+            for x, y in zip(librgt.intersect_overlap(merged_a, merged_b), expected):
+                self.assertEqual(x.tolist(), y.tolist())
+            self.assertEqual(librgt.total_intersect_coverage(merged_a, merged_b),
+                             int(numpy.sum(expected[2] - expected[1])))
+            self.assertEqual(librgt.overlap_mask(a, b).tolist(), kernels.overlap_mask(a, b).tolist())
+            self.assertEqual(librgt.inclusion_mask(a, b).tolist(), kernels.inclusion_mask(a, b).tolist())
+            self.assertEqual(librgt.covered_lengths(a, b).tolist(), kernels.covered_lengths(a, b).tolist())
+
+    def test_zero_length_targets(self):
+        a = GenomicRegionSet("a")
+        a.add(GenomicRegion("chr1", 0, 100))
+        b = GenomicRegionSet("b")
+        for i in range(10):
+            b.add(GenomicRegion("chr1", 10 * i, 10 * i))
+        owner, initials, finals = librgt.intersect_overlap(a.as_array(), kernels.merge(b.as_array()))
+        self.assertEqual(owner.tolist(), [0] * 10)
+        self.assertEqual(initials.tolist(), list(range(0, 100, 10)))
+
+    def test_set_operations(self):
+        a = random_set(50, 1, zero_length=True)
+        b = random_set(50, 2, zero_length=True)
+        a.sort()
+        b.sort()
+        for mode in [OverlapType.OVERLAP, OverlapType.ORIGINAL, OverlapType.COMP_INCL]:
+            self.assertEqual([r.toString() for r in a.intersect_c(b, mode=mode)],
+                             [r.toString() for r in a.intersect_python(b, mode=mode)])
+        self.assertAlmostEqual(a.jaccard_c(b), a.jaccard_python(b))
+        for mode in [OverlapType.OVERLAP, OverlapType.ORIGINAL, OverlapType.COMP_INCL]:
+            self.assertEqual([r.toString() for r in a.intersect_c(b, mode=mode, strand_specific=True,
+                                                                  min_fraction=0.4)],
+                             [r.toString() for r in a.intersect_python(b, mode=mode, strand_specific=True,
+                                                                       min_fraction=0.4)])
+
+
+if __name__ == "__main__":
+    unittest.main()